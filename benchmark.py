@@ -0,0 +1,956 @@
+# -*- coding: utf-8 -*-
+"""
+benchmark.py — Medições de desempenho da camada de dados.
+
+Cada medição roda contra um banco temporário (variável BIBLIOTECA_DB), nunca
+contra o 'dados.db' de produção.
+
+Uso:
+    python benchmark.py conexao [--chamadas N]
+    python benchmark.py lista [--linhas 10000 100000 1000000]
+    python benchmark.py importacao [--linhas 1000000] [--lote 100 1000 10000]
+    python benchmark.py concorrencia [--processos 8] [--operacoes 500] [--livros 3]
+    python benchmark.py reconciliacao [--emprestimos 1000000] [--livros 10000]
+    python benchmark.py atrasos [--emprestimos 2000000] [--livros 10000]
+    python benchmark.py ordenacao [--livros 500000]
+    python benchmark.py linhas [--linhas 100000]
+    python benchmark.py painel [--emprestimos 5000000] [--livros 20000] [--usuarios 50000]
+    python benchmark.py partida [--repeticoes 5] [--livros 10000] [--orcamento 300]
+    python benchmark.py imagens [--repeticoes 5]
+    python benchmark.py assincrono [--tarefas 32] [--operacoes 50] [--livros 1000]
+    python benchmark.py http [--clientes 8] [--requisicoes 500] [--livros 10000]
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+
+def _banco_temporario() -> Path:
+    fd, nome = tempfile.mkstemp(prefix="bench_", suffix=".db")
+    os.close(fd)
+    os.unlink(nome)
+    return Path(nome)
+
+
+def _rodar_filho(args, env_extra):
+    """Roda este script num subprocesso com variáveis de ambiente próprias."""
+    env = dict(os.environ, **env_extra)
+    out = subprocess.run(
+        [sys.executable, __file__] + args, env=env, check=True,
+        capture_output=True, text=True,
+    )
+    return out.stdout.strip()
+
+
+def _medir(fn, n):
+    t0 = time.perf_counter()
+    for _ in range(n):
+        fn()
+    return n / (time.perf_counter() - t0)
+
+
+# =========================
+# conexao: pool x conexão nova por chamada
+# =========================
+def _conexao_filho(n):
+    import view
+    view.insert_user("Ana", "Silva", "Rua A", "ana@ex.com", "11999999999")
+    view.insert_book("Livro", "Autor", "Editora", 2020, "123", 5)
+    # .uncached: o cache de leitura responderia sem abrir conexão nenhuma
+    leitura = _medir(lambda: view.list_users.uncached(), n)
+    escrita = _medir(lambda: view.update_user(1, "Ana", "Silva", "Rua B", "ana@ex.com", "11999999999"), n)
+    print(f"{leitura:.0f} {escrita:.0f}")
+
+
+def bench_conexao(args):
+    db = _banco_temporario()
+    try:
+        print(f"{'modo':<22}{'list_users/s':>14}{'update_user/s':>15}")
+        for rotulo, tamanho in (("sem pool (antes)", "0"), ("pool", "4")):
+            saida = _rodar_filho(
+                ["_conexao_filho", "--chamadas", str(args.chamadas)],
+                {"BIBLIOTECA_DB": str(db), "BIBLIOTECA_POOL_SIZE": tamanho},
+            )
+            leitura, escrita = saida.split()
+            print(f"{rotulo:<22}{leitura:>14}{escrita:>15}")
+    finally:
+        for sufixo in ("", "-wal", "-shm"):
+            Path(str(db) + sufixo).unlink(missing_ok=True)
+
+
+# =========================
+# lista: refresh do VirtualTree x Treeview completo
+# =========================
+def _popular_livros(n):
+    """Insere n livros direto pelo SQLite (rápido) num banco já migrado."""
+    import view
+    with view._conn() as con:
+        con.executemany(
+            "INSERT INTO livros (titulo, autor, editora, ano_publicacao, isbn, quantidade, disponivel)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?)",
+            ((f"Livro {i}", f"Autor {i % 997}", "Editora", 2000, f"{i:013d}", 1, 1) for i in range(n)),
+        )
+
+
+def _tempo(fn):
+    t0 = time.perf_counter()
+    fn()
+    return (time.perf_counter() - t0) * 1000
+
+
+def _lista_filho(n):
+    import view
+    _popular_livros(n)
+    try:
+        import tkinter as tk
+        from tkinter import ttk
+        root = tk.Tk()
+    except Exception:
+        root = None
+
+    if root is None:
+        # sem display: mede só o lado dos dados (o que o VirtualTree pede ao banco)
+        from tela import QuerySource
+        src = QuerySource(view.list_books_page, view.count_books)
+        refresh = _tempo(lambda: src.replace(*src.load(0, 10)))
+        salto = _tempo(lambda: src.store(src.fetch_blocks(src.missing(n // 2, n // 2 + 10))))
+        print(f"{refresh:.1f} {salto:.1f} - sem-display")
+        return
+
+    from tela import QuerySource, VirtualTree, LivrosPage, Worker
+    cols = ("id", "title", "author", "publisher", "year", "isbn", "qty")
+    tree = ttk.Treeview(root, columns=cols, show="headings", height=10)
+    sb = ttk.Scrollbar(root, orient="vertical")
+    worker = Worker(root, poll_ms=1)
+    vt = VirtualTree(tree, sb, LivrosPage._row_values, worker)
+    src = QuerySource(view.list_books_page, view.count_books)
+
+    def esperar():
+        # a carga roda no Worker: processa eventos até ela terminar
+        while vt.loading:
+            root.update()
+        root.update_idletasks()
+
+    refresh = _tempo(lambda: (vt.set_source(src), esperar()))
+    salto = _tempo(lambda: (vt.scroll_to(n // 2), esperar()))
+    worker.shutdown()
+
+    completo = "-"
+    if n <= 100_000:
+        # jeito antigo: busca tudo e insere um item por linha
+        full = ttk.Treeview(root, columns=cols, show="headings", height=10)
+
+        def antigo():
+            for row in view.list_books():
+                full.insert("", "end", values=LivrosPage._row_values(row))
+            root.update_idletasks()
+
+        completo = f"{_tempo(antigo):.1f}"
+    root.destroy()
+    print(f"{refresh:.1f} {salto:.1f} {completo}")
+
+
+def bench_lista(args):
+    print(f"{'linhas':>10}{'refresh ms':>12}{'salto ms':>10}{'completo ms':>13}")
+    for n in args.linhas:
+        db = _banco_temporario()
+        try:
+            saida = _rodar_filho(["_lista_filho", "--linhas", str(n)], {"BIBLIOTECA_DB": str(db)})
+        finally:
+            for sufixo in ("", "-wal", "-shm"):
+                Path(str(db) + sufixo).unlink(missing_ok=True)
+        refresh, salto, completo, *nota = saida.split()
+        print(f"{n:>10}{refresh:>12}{salto:>10}{completo:>13}  {' '.join(nota)}")
+
+
+# =========================
+# importacao: linhas/s da importação em lote
+# =========================
+def _gerar_csv_livros(caminho, n):
+    """CSV de n livros; 1 em cada 100 tem ano inválido e deve ser recusado."""
+    import csv
+    with open(caminho, "w", newline="", encoding="utf-8") as f:
+        w = csv.writer(f)
+        w.writerow(["titulo", "autor", "editora", "ano", "isbn", "quantidade"])
+        for i in range(n):
+            ano = "19x0" if i % 100 == 99 else 1900 + i % 120
+            w.writerow([f"Livro {i}", f"Autor {i % 997}", "Editora", ano, f"{i:013d}", 1 + i % 3])
+
+
+def _importacao_filho(arquivo, lote):
+    import importar
+    rej = Path(arquivo + ".rejeitados.jsonl")
+    try:
+        r = importar.importar("livros", Path(arquivo), "csv", lote, rej)
+    finally:
+        rej.unlink(missing_ok=True)
+    print(f"{r['gravadas']} {r['recusadas']} {r['segundos']:.2f}")
+
+
+def bench_importacao(args):
+    fd, arquivo = tempfile.mkstemp(prefix="bench_", suffix=".csv")
+    os.close(fd)
+    try:
+        _gerar_csv_livros(arquivo, args.linhas)
+        print(f"{'lote':>8}{'gravadas':>10}{'recusadas':>11}{'segundos':>10}{'linhas/s':>11}")
+        for lote in args.lote:
+            db = _banco_temporario()
+            try:
+                saida = _rodar_filho(["_importacao_filho", arquivo, "--lote", str(lote)], {"BIBLIOTECA_DB": str(db)})
+            finally:
+                for sufixo in ("", "-wal", "-shm"):
+                    Path(str(db) + sufixo).unlink(missing_ok=True)
+            gravadas, recusadas, segundos = saida.split()
+            taxa = args.linhas / float(segundos)
+            print(f"{lote:>8}{gravadas:>10}{recusadas:>11}{segundos:>10}{taxa:>11.0f}")
+    finally:
+        os.unlink(arquivo)
+
+
+# =========================
+# concorrencia: várias mesas disputando os mesmos exemplares
+# =========================
+def _concorrencia_filho(n, livros, semente):
+    import random
+    import view
+    rnd = random.Random(semente)
+    abertos, emprestou, recusado = [], 0, 0
+    for _ in range(n):
+        if abertos and rnd.random() < 0.4:
+            view.close_loan(abertos.pop(rnd.randrange(len(abertos))), None)
+            continue
+        try:
+            abertos.append(view.insert_loan(1, rnd.randint(1, livros), None, None)[0])
+            emprestou += 1
+        except ValueError:
+            recusado += 1  # livro indisponível: esperado sob disputa
+    print(f"{emprestou} {recusado}")
+
+
+def bench_concorrencia(args):
+    db = _banco_temporario()
+    env = dict(os.environ, BIBLIOTECA_DB=str(db))
+    try:
+        # prepara o banco: um usuário e poucos livros com poucos exemplares
+        _rodar_filho(["_concorrencia_prepara", "--livros", str(args.livros)], {"BIBLIOTECA_DB": str(db)})
+
+        t0 = time.perf_counter()
+        filhos = [
+            subprocess.Popen(
+                [sys.executable, __file__, "_concorrencia_filho", "--operacoes", str(args.operacoes),
+                 "--livros", str(args.livros), "--semente", str(i)],
+                env=env, stdout=subprocess.PIPE, text=True,
+            )
+            for i in range(args.processos)
+        ]
+        emprestou = recusado = 0
+        for f in filhos:
+            saida, _ = f.communicate()
+            if f.returncode != 0:
+                raise SystemExit(f"processo filho falhou (código {f.returncode})")
+            e, r = map(int, saida.split())
+            emprestou, recusado = emprestou + e, recusado + r
+        segundos = time.perf_counter() - t0
+
+        import sqlite3
+        con = sqlite3.connect(db)
+        divergentes = con.execute("""
+            SELECT l.id, l.quantidade, l.disponivel,
+                   (SELECT COUNT(*) FROM emprestimos e WHERE e.id_livro = l.id AND e.status = 'open') AS abertos
+              FROM livros l
+             WHERE l.disponivel < 0 OR l.disponivel != l.quantidade - abertos
+        """).fetchall()
+        con.close()
+
+        print(f"{args.processos} processos, {emprestou} empréstimos, {recusado} recusados "
+              f"por falta de exemplar, {segundos:.1f}s")
+        if divergentes:
+            for livro, qtd, disp, abertos in divergentes:
+                print(f"DIVERGENTE livro {livro}: quantidade={qtd} disponivel={disp} abertos={abertos}")
+            raise SystemExit(1)
+        print("ok: disponivel nunca negativo e igual a quantidade - empréstimos abertos")
+    finally:
+        for sufixo in ("", "-wal", "-shm"):
+            Path(str(db) + sufixo).unlink(missing_ok=True)
+
+
+def _concorrencia_prepara(livros):
+    import view
+    view.insert_user("Mesa", "Teste", "Rua A", "mesa@ex.com", "11999999999")
+    for i in range(livros):
+        view.insert_book(f"Livro {i}", "Autor", "Editora", 2020, f"{i:013d}", 2)
+
+
+# =========================
+# reconciliacao: conferência de disponibilidade num histórico grande
+# =========================
+def _reconciliacao_filho(n, livros):
+    import view
+    _popular_livros(livros)
+    with view._conn() as con:
+        con.execute("INSERT INTO usuarios (nome, sobrenome, endereco, email, telefone) VALUES ('A', 'B', 'C', 'a@b.c', '1')")
+        con.execute("UPDATE livros SET quantidade = 1000")  # o gatilho leva disponivel junto
+        con.executemany(
+            "INSERT INTO emprestimos (id_livro, id_usuario, data_emprestimo, data_prevista, status)"
+            " VALUES (?, 1, '2024-01-01', '2024-01-08', ?)",
+            # 1 em cada 50 ainda aberto; os gatilhos mantêm disponivel
+            ((1 + i % livros, "open" if i % 50 == 0 else "closed") for i in range(n)),
+        )
+        # desvio proposital em 1% dos livros, por fora dos gatilhos
+        con.execute("UPDATE livros SET disponivel = disponivel + 1 WHERE id % 100 = 0")
+
+    conferir = _tempo(lambda: view.check_availability())
+    divergentes = len(view.check_availability())
+    corrigir = _tempo(lambda: view.check_availability(repair=True))
+    restantes = len(view.check_availability())
+    print(f"{conferir:.0f} {corrigir:.0f} {divergentes} {restantes}")
+
+
+def bench_reconciliacao(args):
+    db = _banco_temporario()
+    try:
+        saida = _rodar_filho(
+            ["_reconciliacao_filho", "--emprestimos", str(args.emprestimos), "--livros", str(args.livros)],
+            {"BIBLIOTECA_DB": str(db)},
+        )
+    finally:
+        for sufixo in ("", "-wal", "-shm"):
+            Path(str(db) + sufixo).unlink(missing_ok=True)
+    conferir, corrigir, divergentes, restantes = saida.split()
+    print(f"{args.emprestimos} empréstimos, {args.livros} livros")
+    print(f"conferência: {conferir} ms ({divergentes} divergentes)")
+    print(f"correção:    {corrigir} ms ({restantes} restantes)")
+
+
+# =========================
+# atrasos: varredura diária de atrasados num histórico grande
+# =========================
+def _atrasos_filho(n, livros):
+    import view
+    from datetime import date, timedelta
+    _popular_livros(livros)
+    hoje = date(2025, 1, 1)
+    with view._conn() as con:
+        con.execute("INSERT INTO usuarios (nome, sobrenome, endereco, email, telefone) VALUES ('A', 'B', 'C', 'a@b.c', '1')")
+        con.execute("UPDATE livros SET quantidade = 1000000")
+        # histórico de ~3 anos; 1 em cada 100 ainda aberto (parte deles vencida)
+        dias = [(hoje - timedelta(days=d)).isoformat() for d in range(1107)]
+        con.executemany(
+            "INSERT INTO emprestimos (id_livro, id_usuario, data_emprestimo, data_prevista, status)"
+            " VALUES (?, 1, ?, ?, ?)",
+            ((1 + i % livros, dias[i % 1100 + 7], dias[i % 1100], "open" if i % 100 == 0 else "closed")
+             for i in range(n)),
+        )
+    plano = view.check_query_plans()["list_overdue"]
+    view.list_overdue.uncached(hoje, 1)  # aquece o cache de páginas do SQLite
+    lista = _tempo(lambda: view.list_overdue.uncached(hoje, 1))
+    por_usuario = _tempo(lambda: view.overdue_by_user.uncached(hoje, 1))
+    por_livro = _tempo(lambda: view.overdue_by_book.uncached(hoje, 1))
+    atrasados = len(view.list_overdue(hoje, 1))
+    print(f"{atrasados} {lista:.0f} {por_usuario:.0f} {por_livro:.0f} {'ok' if plano is None else 'sem-indice'}")
+
+
+def bench_atrasos(args):
+    db = _banco_temporario()
+    try:
+        saida = _rodar_filho(
+            ["_atrasos_filho", "--emprestimos", str(args.emprestimos), "--livros", str(args.livros)],
+            {"BIBLIOTECA_DB": str(db)},
+        )
+    finally:
+        for sufixo in ("", "-wal", "-shm"):
+            Path(str(db) + sufixo).unlink(missing_ok=True)
+    atrasados, lista, por_usuario, por_livro, plano = saida.split()
+    print(f"{args.emprestimos} empréstimos, {atrasados} atrasados (plano: {plano})")
+    print(f"list_overdue:    {lista:>6} ms")
+    print(f"overdue_by_user: {por_usuario:>6} ms")
+    print(f"overdue_by_book: {por_livro:>6} ms")
+
+
+# =========================
+# ordenacao: lista de livros ordenada/filtrada pelo SQL x ordenada em Python
+# =========================
+def _ordenacao_filho(n):
+    import view
+    _popular_livros(n)
+    page, count = view.list_books_page.uncached, view.count_books.uncached
+    medidas = []
+
+    def medir(rotulo, fn):
+        fn()  # aquece o cache de páginas do SQLite
+        medidas.append((rotulo, _tempo(fn)))
+
+    medir("autor: 1ª página", lambda: page(None, 200, 0, sort="author", desc=False))
+    primeira = page(None, 200, 0, sort="author", desc=False)
+    medir("autor: página seguinte (chave)", lambda: page(primeira[-1][0], 200, 0, sort="author", desc=False))
+    medir("autor: salto ao meio (offset)", lambda: page(None, 200, n // 2, sort="author", desc=False))
+    medir("filtro autor 'Autor 12' + total", lambda: (
+        page(None, 200, 0, filters={"author": "Autor 12"}), count({"author": "Autor 12"})))
+    medir("ano desc: 1ª página", lambda: page(None, 200, 0, sort="year"))
+    medir("Python: list_books() + sorted()", lambda: sorted(
+        view.list_books.uncached(), key=lambda r: ((r[2] or "").lower(), r[0]))[:200])
+    planos = view.check_query_plans()
+    ok = all(planos[k] is None for k in planos if k.startswith("list_books_page"))
+    for rotulo, ms in medidas:
+        print(f"{rotulo}|{ms:.1f}")
+    print(f"plano|{'ok' if ok else 'sem-indice'}")
+
+
+def bench_ordenacao(args):
+    db = _banco_temporario()
+    try:
+        saida = _rodar_filho(["_ordenacao_filho", "--livros", str(args.livros)], {"BIBLIOTECA_DB": str(db)})
+    finally:
+        for sufixo in ("", "-wal", "-shm"):
+            Path(str(db) + sufixo).unlink(missing_ok=True)
+    linhas = [l.split("|") for l in saida.splitlines()]
+    print(f"{args.livros} livros (plano: {linhas[-1][1]})")
+    for rotulo, ms in linhas[:-1]:
+        print(f"{rotulo:<36}{ms:>9} ms")
+
+
+# =========================
+# linhas: sqlite3.Row + tupla remontada x namedtuple direto da row_factory
+# =========================
+def _linhas_filho(n):
+    import gc
+    import sqlite3
+    import statistics
+    import tracemalloc
+    import view
+    _popular_livros(n)
+    sql = view._SQL_LIST_BOOKS.format(where="", order="id DESC", limit="")
+
+    def remontada(con):
+        # como era antes: sqlite3.Row e uma tupla nova por linha, lida por nome de coluna
+        cur = con.cursor()
+        cur.row_factory = sqlite3.Row
+        return [(r["id"], r["titulo"], r["autor"], r["editora"], r["ano_publicacao"], r["isbn"],
+                 r["quantidade"], r["disponivel"], r["created_at"], r["updated_at"]) for r in cur.execute(sql)]
+
+    def direta(con):
+        return view._cursor(con, view.Book).execute(sql).fetchall()
+
+    def crua(con):
+        # piso: a tupla que o sqlite3 já monta, sem row_factory
+        cur = con.cursor()
+        cur.row_factory = None
+        return cur.execute(sql).fetchall()
+
+    with view._conn() as con:
+        for rotulo, fn in (("sqlite3.Row + tupla", remontada), ("namedtuple (row_factory)", direta),
+                           ("tupla crua (piso)", crua)):
+            fn(con)  # aquece o cache de páginas do SQLite
+            ms = statistics.median(_tempo(lambda: fn(con)) for _ in range(5))
+            gc.collect()
+            antes = sys.getallocatedblocks()
+            linhas = fn(con)
+            retidos = sys.getallocatedblocks() - antes
+            del linhas
+            gc.collect()
+            tracemalloc.start()
+            fn(con)
+            pico = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            print(f"{rotulo}|{ms:.1f}|{retidos / n:.2f}|{pico / 2**20:.1f}")
+
+
+def bench_linhas(args):
+    db = _banco_temporario()
+    try:
+        saida = _rodar_filho(["_linhas_filho", "--linhas", str(args.linhas)], {"BIBLIOTECA_DB": str(db)})
+    finally:
+        for sufixo in ("", "-wal", "-shm"):
+            Path(str(db) + sufixo).unlink(missing_ok=True)
+    print(f"{args.linhas} livros lidos com o SELECT de list_books")
+    print(f"{'':<28}{'ms':>9}{'retidos/linha':>15}{'pico MB':>10}")
+    for linha in saida.splitlines():
+        rotulo, ms, objetos, pico = linha.split("|")
+        print(f"{rotulo:<28}{ms:>9}{objetos:>15}{pico:>10}")
+
+
+# =========================
+# painel: resumos prontos x agregação sobre o histórico
+# =========================
+def _painel_filho(n, livros, usuarios):
+    import view
+    from datetime import date, timedelta
+    _popular_livros(livros)
+    hoje = date(2025, 1, 1)
+    with view._conn() as con:
+        con.executemany(
+            "INSERT INTO usuarios (nome, sobrenome, endereco, email, telefone) VALUES (?, 'S', 'R', 'u@ex.com', '1')",
+            ((f"U{i}",) for i in range(usuarios)),
+        )
+        con.execute("UPDATE livros SET quantidade = 1000")
+        # ~3 anos de histórico; os gatilhos alimentam as tabelas estat_* a cada linha
+        dias = [(hoje - timedelta(days=d)).isoformat() for d in range(1100)]
+        con.executemany(
+            "INSERT INTO emprestimos (id_livro, id_usuario, data_emprestimo, data_devolucao, data_prevista, status)"
+            " VALUES (?, ?, ?, ?, ?, ?)",
+            ((1 + (i * 7919) % livros, 1 + (i * 104729) % usuarios, dias[i % 1100],
+              None if i % 100 == 0 else dias[max(0, i % 1100 - 3)], dias[max(0, i % 1100 - 7)],
+              "open" if i % 100 == 0 else "closed")
+             for i in range(n)),
+        )
+
+    def painel():
+        view.top_books.uncached(10)
+        view.top_users.uncached(10)
+        view.loans_per_month.uncached(12, hoje)
+        view.loans_per_day.uncached(30, hoje)
+        view.utilization.uncached()
+
+    def varredura():
+        # o que o painel teria de fazer sem as tabelas de resumo
+        with view._conn() as con:
+            con.execute("SELECT id_livro, COUNT(*) AS n FROM emprestimos GROUP BY id_livro ORDER BY n DESC LIMIT 10").fetchall()
+            con.execute("SELECT id_usuario, COUNT(*) AS n FROM emprestimos GROUP BY id_usuario ORDER BY n DESC LIMIT 10").fetchall()
+            con.execute("SELECT substr(data_emprestimo, 1, 7) AS m, COUNT(*) FROM emprestimos"
+                        " WHERE data_emprestimo >= '2024-02-01' GROUP BY m").fetchall()
+            con.execute("SELECT data_emprestimo, COUNT(*) FROM emprestimos"
+                        " WHERE data_emprestimo >= '2024-12-03' GROUP BY data_emprestimo").fetchall()
+            con.execute("SELECT COUNT(*) FROM emprestimos WHERE status = 'open'").fetchone()
+
+    painel()  # aquece o cache de páginas do SQLite
+    resumo = min(_tempo(painel) for _ in range(5))
+    antes = min(_tempo(varredura) for _ in range(2))
+    insercao = _tempo(lambda: view.insert_loan(1, 1, hoje.isoformat(), None))
+    print(f"{resumo:.1f} {antes:.0f} {insercao:.2f}")
+
+
+def bench_painel(args):
+    db = _banco_temporario()
+    try:
+        saida = _rodar_filho(
+            ["_painel_filho", "--emprestimos", str(args.emprestimos), "--livros", str(args.livros),
+             "--usuarios", str(args.usuarios)],
+            {"BIBLIOTECA_DB": str(db)},
+        )
+    finally:
+        for sufixo in ("", "-wal", "-shm"):
+            Path(str(db) + sufixo).unlink(missing_ok=True)
+    resumo, antes, insercao = saida.split()
+    print(f"{args.emprestimos} empréstimos, {args.livros} livros, {args.usuarios} usuários")
+    print(f"refresh do painel (tabelas de resumo): {resumo:>8} ms")
+    print(f"mesmas consultas sobre emprestimos:    {antes:>8} ms")
+    print(f"insert_loan com os gatilhos:           {insercao:>8} ms")
+
+
+# =========================
+# partida: do import da interface ao primeiro quadro desenhado
+# =========================
+# Orçamento de partida (ms, import + App() + primeiro quadro, mediana)
+ORCAMENTO_PARTIDA_MS = 300
+
+
+def _partida_prepara(livros):
+    import view
+    view.schema_version()  # cria/migra o banco: a medição é a de uma partida comum
+    _popular_livros(livros)
+
+
+def _partida_filho():
+    t0 = time.perf_counter()
+    import tela
+    importacao = (time.perf_counter() - t0) * 1000
+    try:
+        app = tela.App()
+    except tela.tk.TclError:
+        print(f"{importacao:.1f} - - sem-display")
+        return
+    janela = (time.perf_counter() - t0) * 1000
+    app.update()  # processa o que está pendente: a janela é mapeada e desenhada
+    quadro = (time.perf_counter() - t0) * 1000
+    app.destroy()
+    print(f"{importacao:.1f} {janela:.1f} {quadro:.1f}")
+
+
+def bench_partida(args):
+    import statistics
+    db = _banco_temporario()
+    try:
+        _rodar_filho(["_partida_prepara", "--livros", str(args.livros)], {"BIBLIOTECA_DB": str(db)})
+        medidas = []
+        for _ in range(args.repeticoes):
+            saida = _rodar_filho(["_partida_filho"], {"BIBLIOTECA_DB": str(db)}).split()
+            medidas.append(saida)
+    finally:
+        for sufixo in ("", "-wal", "-shm"):
+            Path(str(db) + sufixo).unlink(missing_ok=True)
+
+    def mediana(i):
+        valores = [float(m[i]) for m in medidas if m[i] != "-"]
+        return statistics.median(valores) if valores else None
+
+    importacao, janela, quadro = mediana(0), mediana(1), mediana(2)
+    fmt = lambda v: f"{v:.1f}" if v is not None else "-"
+    print(f"{'import tela ms':>16}{'App() ms':>10}{'1º quadro ms':>14}   (mediana de {args.repeticoes})")
+    print(f"{fmt(importacao):>16}{fmt(janela):>10}{fmt(quadro):>14}")
+    total = quadro if quadro is not None else importacao
+    if quadro is None:
+        print("sem display: medido só o import (o orçamento vale para ele)")
+    if total > args.orcamento:
+        print(f"ACIMA do orçamento: {total:.1f} ms > {args.orcamento} ms")
+        raise SystemExit(1)
+    print(f"ok: {total:.1f} ms dentro do orçamento de {args.orcamento} ms")
+
+
+# =========================
+# imagens: ícones da partida com e sem o cache de variantes em disco
+# =========================
+# (arquivo, tamanho) de cada ícone que as páginas pedem
+_ICONES = [
+    ("logo.png", (46, 46)), ("add_usuario.png", (18, 18)), ("lixeira.png", (18, 18)),
+    ("limpar.png", (18, 18)), ("add_livro.png", (18, 18)), ("emprestimo.png", (20, 20)),
+    ("devolucao.png", (20, 20)),
+]
+
+
+def _imagens_filho():
+    import tela
+    try:
+        root = tela.tk.Tk()
+    except tela.tk.TclError:
+        # sem display não há PhotoImage: mede só o que o cache em disco evita
+        # (importar o PIL e redimensionar cada ícone com LANCZOS)
+        t0 = time.perf_counter()
+        from PIL import Image
+        for nome, size in _ICONES:
+            Image.open(tela.ASSETS_DIR / nome).resize(size, Image.LANCZOS)
+        print(f"{(time.perf_counter() - t0) * 1000:.1f} sem-display")
+        return
+    t0 = time.perf_counter()
+    for nome, size in _ICONES:
+        tela.load_image(tela.ASSETS_DIR / nome, size)
+    ms = (time.perf_counter() - t0) * 1000
+    print(f"{ms:.1f} {'sim' if 'PIL' in sys.modules else 'não'}")
+    root.destroy()
+
+
+def bench_imagens(args):
+    import shutil
+    import statistics
+    cache = tempfile.mkdtemp(prefix="bench_icones_")
+    env = {"BIBLIOTECA_CACHE_IMAGENS": cache}
+    try:
+        frio = _rodar_filho(["_imagens_filho"], env).split()
+        if frio[1] == "sem-display":
+            print(f"sem display: PIL + LANCZOS dos {len(_ICONES)} ícones custam {frio[0]} ms por partida;")
+            print("é o que a partida deixa de gastar quando as variantes já estão no cache em disco")
+            return
+        quentes = [_rodar_filho(["_imagens_filho"], env).split() for _ in range(args.repeticoes)]
+    finally:
+        shutil.rmtree(cache, ignore_errors=True)
+
+    quente = statistics.median(float(q[0]) for q in quentes)
+    print(f"{'cache':<26}{'ícones ms':>10}{'PIL importado':>15}")
+    print(f"{'vazio (1ª execução)':<26}{frio[0]:>10}{frio[1]:>15}")
+    print(f"{'em disco (mediana)':<26}{quente:>10.1f}{quentes[0][1]:>15}")
+    print(f"economia por partida: {float(frio[0]) - quente:.1f} ms")
+
+
+# =========================
+# assincrono: escritor único com commit em grupo x uma thread por mesa
+# =========================
+def _assincrono_filho(modo, tarefas, operacoes, livros):
+    import view
+    _popular_livros(livros)
+    view.insert_user("Quiosque", "Teste", "Rua A", "quiosque@ex.com", "11999999999")
+    with view._conn() as con:
+        con.execute("UPDATE livros SET quantidade = 1000")
+
+    # cada tarefa: empresta e devolve o mesmo livro, `operacoes` vezes
+    t0 = time.perf_counter()
+    if modo == "threads":
+        import threading
+
+        def tarefa(i):
+            for k in range(operacoes):
+                view.close_loan(view.insert_loan(1, (i * operacoes + k) % livros + 1, None, None)[0], None)
+
+        threads = [threading.Thread(target=tarefa, args=(i,)) for i in range(tarefas)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        grupos = ""
+    else:
+        import asyncio
+        import view_async
+
+        async def tarefa(i):
+            for k in range(operacoes):
+                loan = await view_async.insert_loan(1, (i * operacoes + k) % livros + 1, None, None)
+                await view_async.close_loan(loan[0], None)
+
+        async def todas():
+            await asyncio.gather(*(tarefa(i) for i in range(tarefas)))
+
+        asyncio.run(todas())
+        s = view_async.stats()
+        grupos = f"{s['writes'] / s['groups']:.1f}"
+        view_async.close()
+    segundos = time.perf_counter() - t0
+    print(f"{2 * tarefas * operacoes / segundos:.0f} {grupos or '-'}")
+
+
+def bench_assincrono(args):
+    print(f"{'modo':<34}{'escritas/s':>12}{'por commit':>12}")
+    for rotulo, modo in (("uma thread por mesa (view)", "threads"), ("view_async (commit em grupo)", "async")):
+        db = _banco_temporario()
+        try:
+            saida = _rodar_filho(
+                ["_assincrono_filho", "--modo", modo, "--tarefas", str(args.tarefas),
+                 "--operacoes", str(args.operacoes), "--livros", str(args.livros)],
+                {"BIBLIOTECA_DB": str(db)},
+            )
+            taxa, grupo = saida.split()
+            print(f"{rotulo:<34}{taxa:>12}{grupo:>12}")
+        finally:
+            for sufixo in ("", "-wal", "-shm"):
+                Path(str(db) + sufixo).unlink(missing_ok=True)
+
+
+# =========================
+# http: latência do servidor JSON sob carga
+# =========================
+def _percentil(valores, p):
+    valores = sorted(valores)
+    return valores[min(len(valores) - 1, int(len(valores) * p))]
+
+
+def bench_http(args):
+    import http.client
+    import json
+    import random
+    import threading
+
+    db = _banco_temporario()
+    env = dict(os.environ, BIBLIOTECA_DB=str(db))
+    subprocess.run([sys.executable, __file__, "_http_prepara", "--livros", str(args.livros)], env=env, check=True)
+    srv = subprocess.Popen(
+        [sys.executable, str(Path(__file__).with_name("servidor.py")), "--porta", "0"],
+        env=env, stdout=subprocess.PIPE, text=True,
+    )
+    try:
+        porta = int(srv.stdout.readline().rsplit(":", 1)[1])
+        tempos = {}
+        lock = threading.Lock()
+
+        def cliente(semente):
+            rnd = random.Random(semente)
+            con = http.client.HTTPConnection("127.0.0.1", porta)
+            etag = None
+            meus = []
+            for _ in range(args.requisicoes):
+                sorteio = rnd.random()
+                headers, body, metodo = {}, None, "GET"
+                if sorteio < 0.35:
+                    rota, url = "GET /livros (página)", f"/livros?limit=50&offset={rnd.randrange(0, args.livros, 50)}"
+                elif sorteio < 0.55:
+                    rota, url = "GET /livros/<id>", f"/livros/{rnd.randint(1, args.livros)}"
+                elif sorteio < 0.70:
+                    rota, url = "GET /busca/livros", f"/busca/livros?q=livro+{rnd.randint(1, 999)}"
+                elif sorteio < 0.85:
+                    rota, url = "GET /livros (If-None-Match)", "/livros?limit=50"
+                    if etag:
+                        headers["If-None-Match"] = etag
+                elif sorteio < 0.93 or not meus:
+                    rota, url, metodo = "POST /emprestimos", "/emprestimos", "POST"
+                    body = json.dumps({"user_id": 1, "book_id": rnd.randint(1, args.livros)})
+                else:
+                    rota, metodo = "POST devolucao", "POST"
+                    url, body = f"/emprestimos/{meus.pop()}/devolucao", "{}"
+                t0 = time.perf_counter()
+                con.request(metodo, url, body=body, headers=headers)
+                resp = con.getresponse()
+                dados = resp.read()
+                ms = (time.perf_counter() - t0) * 1000
+                if rota.startswith("GET /livros (If"):
+                    etag = resp.getheader("ETag") or etag
+                    if resp.status == 304:
+                        rota = "GET /livros (304)"
+                if rota == "POST /emprestimos" and resp.status == 201:
+                    meus.append(json.loads(dados)["id"])
+                with lock:
+                    tempos.setdefault(rota, []).append(ms)
+            con.close()
+
+        t0 = time.perf_counter()
+        threads = [threading.Thread(target=cliente, args=(i,)) for i in range(args.clientes)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        segundos = time.perf_counter() - t0
+
+        todos = [ms for lista in tempos.values() for ms in lista]
+        print(f"{args.clientes} clientes x {args.requisicoes} requisições: {len(todos) / segundos:.0f} req/s")
+        print(f"{'rota':<30}{'n':>7}{'p50 ms':>9}{'p99 ms':>9}")
+        for rota, lista in sorted(tempos.items()):
+            print(f"{rota:<30}{len(lista):>7}{_percentil(lista, 0.5):>9.2f}{_percentil(lista, 0.99):>9.2f}")
+        print(f"{'total':<30}{len(todos):>7}{_percentil(todos, 0.5):>9.2f}{_percentil(todos, 0.99):>9.2f}")
+    finally:
+        srv.terminate()
+        srv.wait()
+        for sufixo in ("", "-wal", "-shm"):
+            Path(str(db) + sufixo).unlink(missing_ok=True)
+
+
+def _http_prepara(livros):
+    import view
+    _popular_livros(livros)
+    view.insert_user("Quiosque", "Teste", "Rua A", "quiosque@ex.com", "11999999999")
+    with view._conn() as con:
+        con.execute("UPDATE livros SET quantidade = 1000")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks do sistema de livros")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+
+    p = sub.add_parser("conexao", help="chamadas/s com e sem pool de conexões")
+    p.add_argument("--chamadas", type=int, default=5000)
+    p.set_defaults(func=bench_conexao)
+
+    p = sub.add_parser("_conexao_filho")
+    p.add_argument("--chamadas", type=int, default=5000)
+    p.set_defaults(func=lambda a: _conexao_filho(a.chamadas))
+
+    p = sub.add_parser("lista", help="tempo de refresh da lista virtualizada")
+    p.add_argument("--linhas", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    p.set_defaults(func=bench_lista)
+
+    p = sub.add_parser("_lista_filho")
+    p.add_argument("--linhas", type=int, required=True)
+    p.set_defaults(func=lambda a: _lista_filho(a.linhas))
+
+    p = sub.add_parser("importacao", help="linhas/s da importação em lote (CSV de livros)")
+    p.add_argument("--linhas", type=int, default=1_000_000)
+    p.add_argument("--lote", type=int, nargs="+", default=[100, 1000, 10_000])
+    p.set_defaults(func=bench_importacao)
+
+    p = sub.add_parser("_importacao_filho")
+    p.add_argument("arquivo")
+    p.add_argument("--lote", type=int, required=True)
+    p.set_defaults(func=lambda a: _importacao_filho(a.arquivo, a.lote))
+
+    p = sub.add_parser("concorrencia", help="teste de estresse: vários processos emprestando os mesmos livros")
+    p.add_argument("--processos", type=int, default=8)
+    p.add_argument("--operacoes", type=int, default=500, help="operações por processo")
+    p.add_argument("--livros", type=int, default=3)
+    p.set_defaults(func=bench_concorrencia)
+
+    p = sub.add_parser("_concorrencia_prepara")
+    p.add_argument("--livros", type=int, required=True)
+    p.set_defaults(func=lambda a: _concorrencia_prepara(a.livros))
+
+    p = sub.add_parser("_concorrencia_filho")
+    p.add_argument("--operacoes", type=int, required=True)
+    p.add_argument("--livros", type=int, required=True)
+    p.add_argument("--semente", type=int, required=True)
+    p.set_defaults(func=lambda a: _concorrencia_filho(a.operacoes, a.livros, a.semente))
+
+    p = sub.add_parser("reconciliacao", help="tempo de conferir/corrigir a disponibilidade dos livros")
+    p.add_argument("--emprestimos", type=int, default=1_000_000)
+    p.add_argument("--livros", type=int, default=10_000)
+    p.set_defaults(func=bench_reconciliacao)
+
+    p = sub.add_parser("_reconciliacao_filho")
+    p.add_argument("--emprestimos", type=int, required=True)
+    p.add_argument("--livros", type=int, required=True)
+    p.set_defaults(func=lambda a: _reconciliacao_filho(a.emprestimos, a.livros))
+
+    p = sub.add_parser("atrasos", help="tempo da varredura de empréstimos atrasados")
+    p.add_argument("--emprestimos", type=int, default=2_000_000)
+    p.add_argument("--livros", type=int, default=10_000)
+    p.set_defaults(func=bench_atrasos)
+
+    p = sub.add_parser("_atrasos_filho")
+    p.add_argument("--emprestimos", type=int, required=True)
+    p.add_argument("--livros", type=int, required=True)
+    p.set_defaults(func=lambda a: _atrasos_filho(a.emprestimos, a.livros))
+
+    p = sub.add_parser("ordenacao", help="tempo da lista de livros ordenada/filtrada pelo SQL")
+    p.add_argument("--livros", type=int, default=500_000)
+    p.set_defaults(func=bench_ordenacao)
+
+    p = sub.add_parser("_ordenacao_filho")
+    p.add_argument("--livros", type=int, required=True)
+    p.set_defaults(func=lambda a: _ordenacao_filho(a.livros))
+
+    p = sub.add_parser("linhas", help="custo de montar as linhas das listas (tempo e objetos por linha)")
+    p.add_argument("--linhas", type=int, default=100_000)
+    p.set_defaults(func=bench_linhas)
+
+    p = sub.add_parser("_linhas_filho")
+    p.add_argument("--linhas", type=int, required=True)
+    p.set_defaults(func=lambda a: _linhas_filho(a.linhas))
+
+    p = sub.add_parser("painel", help="tempo de refresh do painel de estatísticas")
+    p.add_argument("--emprestimos", type=int, default=5_000_000)
+    p.add_argument("--livros", type=int, default=20_000)
+    p.add_argument("--usuarios", type=int, default=50_000)
+    p.set_defaults(func=bench_painel)
+
+    p = sub.add_parser("_painel_filho")
+    p.add_argument("--emprestimos", type=int, required=True)
+    p.add_argument("--livros", type=int, required=True)
+    p.add_argument("--usuarios", type=int, required=True)
+    p.set_defaults(func=lambda a: _painel_filho(a.emprestimos, a.livros, a.usuarios))
+
+    p = sub.add_parser("partida", help="tempo do import da interface até o primeiro quadro")
+    p.add_argument("--repeticoes", type=int, default=5)
+    p.add_argument("--livros", type=int, default=10_000)
+    p.add_argument("--orcamento", type=float, default=ORCAMENTO_PARTIDA_MS, help="ms; acima disso sai com código 1")
+    p.set_defaults(func=bench_partida)
+
+    p = sub.add_parser("_partida_prepara")
+    p.add_argument("--livros", type=int, required=True)
+    p.set_defaults(func=lambda a: _partida_prepara(a.livros))
+
+    p = sub.add_parser("_partida_filho")
+    p.set_defaults(func=lambda a: _partida_filho())
+
+    p = sub.add_parser("imagens", help="tempo dos ícones da partida com e sem cache em disco")
+    p.add_argument("--repeticoes", type=int, default=5)
+    p.set_defaults(func=bench_imagens)
+
+    p = sub.add_parser("_imagens_filho")
+    p.set_defaults(func=lambda a: _imagens_filho())
+
+    p = sub.add_parser("assincrono", help="escritas/s: view_async (commit em grupo) x threads no view")
+    p.add_argument("--tarefas", type=int, default=32, help="mesas/corrotinas simultâneas")
+    p.add_argument("--operacoes", type=int, default=50, help="empréstimos + devoluções por tarefa")
+    p.add_argument("--livros", type=int, default=1000)
+    p.set_defaults(func=bench_assincrono)
+
+    p = sub.add_parser("_assincrono_filho")
+    p.add_argument("--modo", choices=("threads", "async"), required=True)
+    p.add_argument("--tarefas", type=int, required=True)
+    p.add_argument("--operacoes", type=int, required=True)
+    p.add_argument("--livros", type=int, required=True)
+    p.set_defaults(func=lambda a: _assincrono_filho(a.modo, a.tarefas, a.operacoes, a.livros))
+
+    p = sub.add_parser("http", help="teste de carga do servidor JSON (p50/p99 por rota)")
+    p.add_argument("--clientes", type=int, default=8)
+    p.add_argument("--requisicoes", type=int, default=500, help="requisições por cliente")
+    p.add_argument("--livros", type=int, default=10_000)
+    p.set_defaults(func=bench_http)
+
+    p = sub.add_parser("_http_prepara")
+    p.add_argument("--livros", type=int, required=True)
+    p.set_defaults(func=lambda a: _http_prepara(a.livros))
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,41 +1,65 @@
-import sqlite3
-
-# conectar ao banco de dados ou criar um novo banco de dados caso nao existe
-con = sqlite3.connect('dados.db')
-
-# criar tabela de livros
-con.execute('''
-    CREATE TABLE IF NOT EXISTS livros(
-        id INTEGER PRIMARY KEY,
-        titulo TEXT,
-        autor TEXT,
-        editora TEXT,
-        ano_publicacao INTEGER,
-        isbn TEXT
-    )
-''')
-
-# criar tabela de usuarios
-con.execute('''
-    CREATE TABLE IF NOT EXISTS usuarios(
-        id INTEGER PRIMARY KEY,
-        nome TEXT,
-        sobrenome TEXT,
-        endereco TEXT,
-        email TEXT,
-        telefone TEXT
-    )
-''')
-
-# criar tabela de emprestimos
-con.execute('''
-    CREATE TABLE IF NOT EXISTS emprestimos(
-        id INTEGER PRIMARY KEY,
-        id_livro INTEGER,
-        id_usuario INTEGER,
-        data_emprestimo TEXT,
-        data_devolucao TEXT,
-        FOREIGN KEY(id_livro) REFERENCES livros(id),
-        FOREIGN KEY(id_usuario) REFERENCES usuarios(id)
-    )
-''')
+# -*- coding: utf-8 -*-
+"""
+dados.py — Administração do banco de dados.
+
+O esquema das tabelas livros, usuarios e emprestimos é definido apenas em
+view.py, em _MIGRACOES, para as duas cópias nunca divergirem; o primeiro
+acesso ao banco (ou view.migrate()) cria o banco ou atualiza um existente
+aplicando as migrações pendentes.
+
+Uso:
+    python dados.py                         cria/atualiza o banco e mostra a versão do esquema
+    python dados.py reconciliar [--corrigir]
+        confere livros.disponivel contra quantidade - empréstimos abertos;
+        com --corrigir, grava o valor certo nos livros divergentes
+    python dados.py estatisticas
+        recalcula as tabelas de resumo do painel a partir do histórico
+"""
+
+import argparse
+import sys
+import time
+
+import view
+
+
+def reconciliar(corrigir: bool) -> int:
+    t0 = time.perf_counter()
+    divergentes = view.check_availability(repair=corrigir)
+    segundos = time.perf_counter() - t0
+
+    for book_id, titulo, quantidade, disponivel, esperado in divergentes:
+        print(f"livro {book_id} ({titulo}): quantidade={quantidade} disponivel={disponivel} esperado={esperado}")
+    if not divergentes:
+        print(f"Nenhuma divergência ({segundos:.2f}s)")
+        return 0
+    if corrigir:
+        print(f"{len(divergentes)} livros corrigidos ({segundos:.2f}s)")
+        return 0
+    print(f"{len(divergentes)} livros divergentes ({segundos:.2f}s); rode com --corrigir para acertar")
+    return 1
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = ap.add_subparsers(dest="cmd")
+    p = sub.add_parser("reconciliar", help="confere (e corrige) a disponibilidade dos livros")
+    p.add_argument("--corrigir", action="store_true")
+    sub.add_parser("estatisticas", help="recalcula as tabelas de resumo do painel")
+    args = ap.parse_args(argv)
+
+    if args.cmd == "reconciliar":
+        return reconciliar(args.corrigir)
+    if args.cmd == "estatisticas":
+        t0 = time.perf_counter()
+        view.rebuild_stats()
+        print(f"Estatísticas recalculadas ({time.perf_counter() - t0:.2f}s)")
+        return 0
+
+    view.migrate()
+    print(f"Banco {view.DB_PATH} na versão {view.schema_version()} do esquema")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
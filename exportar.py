@@ -0,0 +1,117 @@
+# -*- coding: utf-8 -*-
+"""
+exportar.py — Exportação do histórico de empréstimos (com usuário e livro) para CSV ou JSONL.
+
+Lê o banco por view.iter_loans, que percorre o cursor em blocos, e grava cada
+linha assim que ela chega: a memória fica constante mesmo com milhões de
+empréstimos. Os empréstimos saem em ordem crescente de id, então uma
+exportação interrompida pode ser retomada com --retomar, que continua depois
+do último id já gravado no arquivo.
+
+Uso:
+    python exportar.py emprestimos.csv [--formato csv|jsonl] [--de AAAA-MM-DD] [--ate AAAA-MM-DD]
+                       [--status open|closed] [--apos-id N] [--retomar] [--lote N]
+"""
+
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+from pathlib import Path
+from typing import Optional
+
+import view
+
+COLUNAS = ("id", "user_id", "user_name", "book_id", "book_title",
+           "loan_date", "expected_date", "return_date", "status")
+
+
+def _ultima_linha(caminho: Path) -> Optional[str]:
+    """
+    Última linha completa do arquivo, lida de trás para frente. Uma linha final
+    sem quebra (exportação interrompida no meio da escrita) é cortada do arquivo.
+    """
+    with open(caminho, "rb+") as f:
+        f.seek(0, os.SEEK_END)
+        fim = f.tell()
+        pos, resto = fim, b""
+        while pos > 0:
+            passo = min(64 * 1024, pos)
+            pos -= passo
+            f.seek(pos)
+            resto = f.read(passo) + resto
+            if resto.count(b"\n") >= 2:
+                break
+        if not resto.endswith(b"\n"):
+            corte = resto.rfind(b"\n") + 1
+            f.truncate(pos + corte)
+            resto = resto[:corte]
+        linhas = resto.splitlines()
+        return linhas[-1].decode("utf-8") if linhas else None
+
+
+def ultimo_id(caminho: Path, formato: str) -> Optional[int]:
+    if not caminho.exists() or caminho.stat().st_size == 0:
+        return None
+    linha = _ultima_linha(caminho)
+    if not linha:
+        return None
+    try:
+        if formato == "jsonl":
+            return int(json.loads(linha)["id"])
+        return int(next(csv.reader([linha]))[0])
+    except (ValueError, KeyError, StopIteration):
+        return None  # só o cabeçalho
+
+
+def exportar(caminho: Path, formato: str, de=None, ate=None, status=None,
+             apos_id=None, retomar=False, lote=view.EXPORT_BATCH_SIZE):
+    if retomar:
+        apos_id = ultimo_id(caminho, formato) or apos_id
+    anexar = retomar and caminho.exists() and caminho.stat().st_size > 0
+
+    linhas = view.iter_loans(start=de, end=ate, status=status, after_id=apos_id, batch_size=lote)
+    n = 0
+    with open(caminho, "a" if anexar else "w", newline="", encoding="utf-8") as f:
+        if formato == "csv":
+            w = csv.writer(f)
+            if not anexar:
+                w.writerow(COLUNAS)
+            for row in linhas:
+                w.writerow(row)
+                n += 1
+        else:
+            for row in linhas:
+                f.write(json.dumps(dict(zip(COLUNAS, row)), ensure_ascii=False) + "\n")
+                n += 1
+    return n, apos_id
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("arquivo", type=Path)
+    ap.add_argument("--formato", choices=("csv", "jsonl"),
+                    help="padrão: pela extensão do arquivo (.jsonl/.ndjson = jsonl, senão csv)")
+    ap.add_argument("--de", help="data de empréstimo inicial (AAAA-MM-DD, inclusiva)")
+    ap.add_argument("--ate", help="data de empréstimo final (AAAA-MM-DD, inclusiva)")
+    ap.add_argument("--status", choices=("open", "closed"))
+    ap.add_argument("--apos-id", type=int, help="exporta só empréstimos com id maior que este")
+    ap.add_argument("--retomar", action="store_true", help="continua depois do último id já gravado no arquivo")
+    ap.add_argument("--lote", type=int, default=view.EXPORT_BATCH_SIZE, help="linhas por fetchmany")
+    args = ap.parse_args(argv)
+
+    formato = args.formato or ("jsonl" if args.arquivo.suffix.lower() in (".jsonl", ".ndjson") else "csv")
+
+    t0 = time.perf_counter()
+    n, apos_id = exportar(args.arquivo, formato, args.de, args.ate, args.status,
+                          args.apos_id, args.retomar, args.lote)
+    segundos = time.perf_counter() - t0
+    inicio = f" (após o id {apos_id})" if apos_id else ""
+    print(f"{n} empréstimos exportados{inicio} para {args.arquivo} em {segundos:.1f}s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
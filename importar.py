@@ -0,0 +1,132 @@
+# -*- coding: utf-8 -*-
+"""
+importar.py — Importação em lote de livros ou usuários a partir de CSV ou JSONL.
+
+O arquivo é lido como fluxo (uma linha por vez), validado com as mesmas regras
+dos formulários e gravado por view.bulk_insert_books / bulk_insert_users numa
+única transação. Linhas recusadas vão para um arquivo à parte (JSONL), com o
+número do registro, o motivo e os dados originais.
+
+Uso:
+    python importar.py livros arquivo.csv [--formato csv|jsonl] [--lote N] [--rejeitados arquivo]
+    python importar.py usuarios arquivo.jsonl
+
+Cabeçalhos aceitos (CSV) / chaves aceitas (JSONL), em português ou inglês:
+    livros:   titulo|title, autor|author, editora|publisher, ano|year, isbn, quantidade|quantity
+    usuarios: nome|first_name, sobrenome|last_name, endereco|address, email, telefone|phone
+"""
+
+import argparse
+import csv
+import json
+import sys
+import time
+from pathlib import Path
+from typing import Dict, Iterator
+
+import view
+
+# nome no arquivo -> chave usada por view.bulk_insert_*
+_ALIASES: Dict[str, Dict[str, str]] = {
+    "livros": {
+        "titulo": "title", "autor": "author", "editora": "publisher",
+        "ano": "year", "ano_publicacao": "year", "quantidade": "quantity",
+    },
+    "usuarios": {
+        "nome": "first_name", "sobrenome": "last_name", "endereco": "address",
+        "telefone": "phone",
+    },
+}
+
+
+def _normalizar(registro: Dict[str, object], aliases: Dict[str, str]) -> Dict[str, object]:
+    out = {}
+    for chave, valor in registro.items():
+        if chave is None:
+            continue  # colunas a mais numa linha do CSV
+        chave = chave.strip().lower()
+        out[aliases.get(chave, chave)] = valor
+    return out
+
+
+def ler_csv(caminho: Path, aliases: Dict[str, str]) -> Iterator[Dict[str, object]]:
+    with open(caminho, newline="", encoding="utf-8-sig") as f:
+        for registro in csv.DictReader(f):
+            yield _normalizar(registro, aliases)
+
+
+class _Recusada(str):
+    """Linha do JSONL que não vira registro: bulk_insert_* a recusa e ela vai, como texto, para os rejeitados."""
+
+    def __new__(cls, linha: str, motivo: str):
+        obj = super().__new__(cls, linha)
+        obj.motivo = motivo
+        return obj
+
+
+def ler_jsonl(caminho: Path, aliases: Dict[str, str]) -> Iterator[object]:
+    with open(caminho, encoding="utf-8") as f:
+        for linha in f:
+            linha = linha.strip()
+            if not linha:
+                continue
+            try:
+                registro = json.loads(linha)
+            except json.JSONDecodeError:
+                yield _Recusada(linha, "JSON inválido")
+                continue
+            if isinstance(registro, dict):
+                yield _normalizar(registro, aliases)
+            elif isinstance(registro, list):
+                yield registro
+            else:
+                # 5, null, true, "texto": JSON válido, mas não é registro
+                yield _Recusada(linha, "Registro não é objeto nem lista")
+
+
+def importar(tabela: str, caminho: Path, formato: str, lote: int, rejeitados: Path) -> Dict[str, float]:
+    aliases = _ALIASES[tabela]
+    linhas = ler_csv(caminho, aliases) if formato == "csv" else ler_jsonl(caminho, aliases)
+    inserir = view.bulk_insert_books if tabela == "livros" else view.bulk_insert_users
+
+    recusadas = 0
+    t0 = time.perf_counter()
+    with open(rejeitados, "w", encoding="utf-8") as out:
+        def rejeitar(n, motivo, dados):
+            nonlocal recusadas
+            recusadas += 1
+            if isinstance(dados, _Recusada):
+                motivo, dados = dados.motivo, str(dados)
+            out.write(json.dumps({"registro": n, "motivo": motivo, "dados": dados}, ensure_ascii=False) + "\n")
+
+        gravadas = inserir(linhas, batch_size=lote, on_reject=rejeitar)
+    segundos = time.perf_counter() - t0
+
+    if not recusadas:
+        rejeitados.unlink(missing_ok=True)
+    return {"gravadas": gravadas, "recusadas": recusadas, "segundos": segundos}
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("tabela", choices=sorted(_ALIASES))
+    ap.add_argument("arquivo", type=Path)
+    ap.add_argument("--formato", choices=("csv", "jsonl"),
+                    help="padrão: pela extensão do arquivo (.jsonl/.ndjson = jsonl, senão csv)")
+    ap.add_argument("--lote", type=int, default=view.BULK_BATCH_SIZE, help="linhas por executemany")
+    ap.add_argument("--rejeitados", type=Path, help="padrão: <arquivo>.rejeitados.jsonl")
+    args = ap.parse_args(argv)
+
+    formato = args.formato or ("jsonl" if args.arquivo.suffix.lower() in (".jsonl", ".ndjson") else "csv")
+    rejeitados = args.rejeitados or args.arquivo.with_name(args.arquivo.name + ".rejeitados.jsonl")
+
+    r = importar(args.tabela, args.arquivo, formato, args.lote, rejeitados)
+    taxa = r["gravadas"] / r["segundos"] if r["segundos"] else 0.0
+    print(f"{r['gravadas']} linhas gravadas em {r['segundos']:.1f}s ({taxa:.0f} linhas/s)")
+    if r["recusadas"]:
+        print(f"{r['recusadas']} linhas recusadas -> {rejeitados}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
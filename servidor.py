@@ -0,0 +1,384 @@
+# -*- coding: utf-8 -*-
+"""
+servidor.py — Serviço HTTP/JSON com as operações do view.py, para outras mesas e
+terminais de autoatendimento que não usam a interface Tkinter.
+
+Só biblioteca padrão (http.server, uma thread por requisição). Todas as threads
+usam o mesmo pool de conexões e o mesmo cache de leitura do view.
+
+Rotas (respostas em JSON; tuplas do view viram objetos com os nomes de campo):
+    GET  /livros | /usuarios | /emprestimos           lista paginada: ?after_id=&limit=&offset=
+                                                       (/emprestimos aceita ?open_only=1)
+         ?todos=1                                      lista inteira em streaming (ids crescentes)
+    GET  /livros/<id> | /usuarios/<id> | /emprestimos/<id>
+    GET  /busca/livros?q=... | /busca/usuarios?q=...  (&limit=&offset=)
+    GET  /atrasados?as_of=AAAA-MM-DD&min_days_late=1
+    GET  /historico?de=&ate=&status=&after_id=        histórico de empréstimos em streaming
+    GET  /mudancas/livros | /usuarios | /emprestimos  ?desde=<versão> (ou instante UTC ISO)
+                                                       {"version", "changed": [...], "deleted": [ids]}
+                                                       410 se desde é anterior às lápides descartadas
+    POST /emprestimos               {"user_id", "book_id", "loan_date"?}
+    POST /emprestimos/lote          {"user_id", "book_ids", "loan_date"?}
+    POST /emprestimos/<id>/devolucao   {"return_date"?}
+    POST /emprestimos/<id>/renovacao   {"renew_date"?}
+
+GETs respondem com ETag (PRAGMA data_version: muda a cada commit no banco);
+com If-None-Match igual, a resposta é 304 sem corpo.
+
+Uso:
+    python servidor.py [--host 127.0.0.1] [--porta 8080]
+"""
+
+import argparse
+import json
+import os
+import re
+import sys
+from datetime import date
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import view
+
+USER_FIELDS = ("id", "first_name", "last_name", "address", "email", "phone", "created_at", "updated_at")
+BOOK_FIELDS = ("id", "title", "author", "publisher", "year", "isbn", "quantity", "available",
+               "created_at", "updated_at")
+LOAN_FIELDS = ("id", "user_id", "user_name", "book_id", "book_title",
+               "loan_date", "expected_date", "return_date", "status")
+OVERDUE_FIELDS = ("id", "user_id", "user_name", "book_id", "book_title",
+                  "loan_date", "expected_date", "days_late")
+
+MAX_LIMIT = 1000
+STREAM_CHUNK = 64 * 1024  # bytes por pedaço da resposta em streaming
+
+# identifica esta execução: data_version só é comparável dentro da mesma conexão de vigia
+_ETAG_PREFIXO = f"{os.getpid():x}"
+
+
+def _obj(fields, row):
+    return None if row is None else dict(zip(fields, row))
+
+
+class HTTPErro(Exception):
+    def __init__(self, status, msg):
+        super().__init__(msg)
+        self.status = status
+
+
+def _int(params, nome, padrao=None):
+    valor = params.get(nome, [None])[0]
+    if valor in (None, ""):
+        return padrao
+    if not valor.isdigit():
+        raise HTTPErro(HTTPStatus.BAD_REQUEST, f"Parâmetro {nome} inválido")
+    return int(valor)
+
+
+def _str(params, nome, padrao=None):
+    return params.get(nome, [padrao])[0] or padrao
+
+
+# nome -> tabela de view.changes_since
+_FEEDS = {"livros": "books", "usuarios": "users", "emprestimos": "loans"}
+
+# nome -> (campos, list_*_page, get_*, iter_* para ?todos=1)
+_RECURSOS = {
+    "livros": (BOOK_FIELDS, view.list_books_page, view.get_book, view.iter_books),
+    "usuarios": (USER_FIELDS, view.list_users_page, view.get_user, view.iter_users),
+    "emprestimos": (LOAN_FIELDS, view.list_loans_page, view.get_loan, view.iter_loans),
+}
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive e respostas em chunks
+    server_version = "Biblioteca/1.0"
+    # cabeçalho e corpo saem em write() separados: sem isto o Nagle segura o
+    # corpo até o ACK atrasado do cliente (~40ms por requisição)
+    disable_nagle_algorithm = True
+
+    # ---- respostas ----
+    def _send_json(self, status, body, etag=None):
+        data = json.dumps(body, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        if etag:
+            self.send_header("ETag", etag)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _send_stream(self, rows, fields, etag=None):
+        """Lista JSON enviada aos pedaços (Transfer-Encoding: chunked), sem montar tudo na memória."""
+        self.send_response(HTTPStatus.OK)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Transfer-Encoding", "chunked")
+        if etag:
+            self.send_header("ETag", etag)
+        self.end_headers()
+        self._em_stream = True  # daqui em diante um erro não pode virar outra resposta
+
+        def chunk(data: bytes):
+            self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+
+        buf, tamanho, sep = [b"["], 1, b""
+        for row in rows:
+            item = sep + json.dumps(dict(zip(fields, row)), ensure_ascii=False).encode("utf-8")
+            buf.append(item)
+            tamanho += len(item)
+            sep = b","
+            if tamanho >= STREAM_CHUNK:
+                chunk(b"".join(buf))
+                buf, tamanho = [], 0
+        buf.append(b"]")
+        chunk(b"".join(buf))
+        self.wfile.write(b"0\r\n\r\n")
+
+    def _body(self):
+        n = int(self.headers.get("Content-Length") or 0)
+        self._corpo_lido = True
+        if not n:
+            return {}
+        try:
+            body = json.loads(self.rfile.read(n))
+        except ValueError:
+            raise HTTPErro(HTTPStatus.BAD_REQUEST, "JSON inválido")
+        if not isinstance(body, dict):
+            raise HTTPErro(HTTPStatus.BAD_REQUEST, "Esperado um objeto JSON")
+        return body
+
+    def _drenar_corpo(self):
+        """Lê o corpo que a rota não leu: sobras no socket quebrariam a próxima requisição (keep-alive)."""
+        if self._corpo_lido:
+            return
+        self._corpo_lido = True
+        n = int(self.headers.get("Content-Length") or 0)
+        while n > 0:
+            lido = self.rfile.read(min(n, STREAM_CHUNK))
+            if not lido:
+                break
+            n -= len(lido)
+
+    def _handle(self, rotas):
+        self._em_stream = False
+        self._corpo_lido = False
+        url = urlsplit(self.path)
+        params = parse_qs(url.query)
+        partes = [p for p in url.path.split("/") if p]
+        try:
+            for padrao, fn in rotas:
+                m = re.fullmatch(padrao, "/".join(partes))
+                if m:
+                    return fn(params, *m.groups())
+            raise HTTPErro(HTTPStatus.NOT_FOUND, "Rota inexistente")
+        except (BrokenPipeError, ConnectionResetError):
+            self.close_connection = True  # cliente desistiu no meio da resposta
+        except Exception as e:
+            if self._em_stream:
+                # cabeçalhos e parte da lista já saíram: fechar sem o chunk final
+                # avisa o cliente que ela veio incompleta
+                self.close_connection = True
+                self.log_error("streaming interrompido: %r", e)
+                return
+            self._drenar_corpo()
+            if isinstance(e, HTTPErro):
+                self._send_json(e.status, {"erro": str(e)})
+            elif isinstance(e, ValueError):
+                # regras de negócio do view (livro indisponível, usuário inexistente, ...)
+                status = HTTPStatus.NOT_FOUND if "inexistente" in str(e) else HTTPStatus.UNPROCESSABLE_ENTITY
+                self._send_json(status, {"erro": str(e)})
+            else:
+                # banco travado, erro de programação...: o cliente ainda recebe uma resposta
+                self.log_error("erro ao atender %s %s: %r", self.command, self.path, e)
+                self._send_json(HTTPStatus.INTERNAL_SERVER_ERROR, {"erro": "Erro interno do servidor"})
+
+    def log_message(self, fmt, *args):
+        if self.server.verbose:
+            super().log_message(fmt, *args)
+
+    # ---- GET ----
+    def do_GET(self):
+        self._handle([
+            (r"(livros|usuarios|emprestimos)", self._get_lista),
+            (r"(livros|usuarios|emprestimos)/(\d+)", self._get_item),
+            (r"busca/(livros|usuarios)", self._get_busca),
+            (r"atrasados", self._get_atrasados),
+            (r"historico", self._get_historico),
+            (r"mudancas/(livros|usuarios|emprestimos)", self._get_mudancas),
+        ])
+
+    def _etag(self, extra=""):
+        """
+        ETag da versão atual do banco; None se o cliente já tem essa versão (304 enviado).
+        extra: o que mais muda a resposta sem escrita no banco (ex.: a data de hoje).
+        """
+        etag = f'W/"{_ETAG_PREFIXO}-{view.data_version()}{"-" + extra if extra else ""}"'
+        if etag in [t.strip() for t in self.headers.get("If-None-Match", "").split(",")]:
+            self.send_response(HTTPStatus.NOT_MODIFIED)
+            self.send_header("ETag", etag)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return None
+        return etag
+
+    def _get_lista(self, params, recurso):
+        fields, page, _, todos = _RECURSOS[recurso]
+        open_only = _int(params, "open_only", 0) == 1
+        etag = self._etag()
+        if etag is None:
+            return
+        if _int(params, "todos", 0) == 1:
+            # cursor lido em blocos: a memória não cresce com a tabela
+            rows = todos(status="open" if open_only else None) if recurso == "emprestimos" else todos()
+            return self._send_stream(rows, fields, etag)
+
+        after_id = _int(params, "after_id")
+        limit = min(_int(params, "limit", view.PAGE_SIZE), MAX_LIMIT)
+        offset = _int(params, "offset", 0)
+        if recurso == "emprestimos":
+            rows = page(after_id, limit, open_only=open_only, offset=offset)
+        else:
+            rows = page(after_id, limit, offset)
+        self._send_json(HTTPStatus.OK, [_obj(fields, r) for r in rows], etag)
+
+    def _get_item(self, params, recurso, item_id):
+        fields, _, get, _ = _RECURSOS[recurso]
+        etag = self._etag()
+        if etag is None:
+            return
+        row = get(int(item_id))
+        if row is None:
+            raise HTTPErro(HTTPStatus.NOT_FOUND, "Registro inexistente")
+        self._send_json(HTTPStatus.OK, _obj(fields, row), etag)
+
+    def _get_busca(self, params, recurso):
+        fn, fields = (view.search_books, BOOK_FIELDS) if recurso == "livros" else (view.search_users, USER_FIELDS)
+        etag = self._etag()
+        if etag is None:
+            return
+        rows = fn(_str(params, "q", ""), min(_int(params, "limit", 50), MAX_LIMIT), _int(params, "offset", 0))
+        self._send_json(HTTPStatus.OK, [_obj(fields, r) for r in rows], etag)
+
+    def _get_atrasados(self, params):
+        # sem as_of a resposta depende de hoje: a data resolvida entra no ETag,
+        # senão depois da meia-noite o cliente receberia 304 com a lista de ontem
+        try:
+            as_of = date.fromisoformat(_str(params, "as_of") or date.today().isoformat())
+        except ValueError:
+            raise HTTPErro(HTTPStatus.BAD_REQUEST, "Parâmetro as_of inválido")
+        etag = self._etag(as_of.isoformat())
+        if etag is None:
+            return
+        rows = view.list_overdue(as_of, _int(params, "min_days_late", 1))
+        self._send_stream(rows, OVERDUE_FIELDS, etag)
+
+    def _get_historico(self, params):
+        status = _str(params, "status")
+        if status not in (None, "open", "closed"):
+            raise HTTPErro(HTTPStatus.BAD_REQUEST, "Parâmetro status inválido")
+        etag = self._etag()
+        if etag is None:
+            return
+        rows = view.iter_loans(start=_str(params, "de"), end=_str(params, "ate"), status=status,
+                               after_id=_int(params, "after_id"))
+        self._send_stream(rows, LOAN_FIELDS, etag)
+
+    def _get_mudancas(self, params, recurso):
+        # cliente guarda "version" e pede só o que mudou depois dela
+        desde = _str(params, "desde", "0")
+        etag = self._etag()
+        if etag is None:
+            return
+        try:
+            versao, rows, removidos = view.changes_since(_FEEDS[recurso], int(desde) if desde.isdigit() else desde)
+        except ValueError as e:
+            # lápides já descartadas (prune_changes): o cliente relê com desde=0
+            if "releia" in str(e):
+                raise HTTPErro(HTTPStatus.GONE, str(e))
+            raise HTTPErro(HTTPStatus.BAD_REQUEST, "Parâmetro desde inválido")
+        fields = _RECURSOS[recurso][0]
+        self._send_json(HTTPStatus.OK, {"version": versao, "changed": [_obj(fields, r) for r in rows],
+                                        "deleted": removidos}, etag)
+
+    # ---- POST ----
+    def do_POST(self):
+        self._handle([
+            (r"emprestimos", self._post_emprestimo),
+            (r"emprestimos/lote", self._post_lote),
+            (r"emprestimos/(\d+)/devolucao", self._post_devolucao),
+            (r"emprestimos/(\d+)/renovacao", self._post_renovacao),
+        ])
+
+    @staticmethod
+    def _campo_int(body, nome):
+        valor = body.get(nome)
+        if not isinstance(valor, int) or isinstance(valor, bool):
+            raise HTTPErro(HTTPStatus.BAD_REQUEST, f"Campo {nome} deve ser inteiro")
+        return valor
+
+    @staticmethod
+    def _campo_data(body, nome):
+        """Data opcional do corpo: ausente/null ou texto 'AAAA-MM-DD'."""
+        valor = body.get(nome)
+        if valor is None:
+            return None
+        try:
+            date.fromisoformat(valor)
+        except (TypeError, ValueError):
+            raise HTTPErro(HTTPStatus.BAD_REQUEST, f"Campo {nome} deve ser uma data AAAA-MM-DD")
+        return valor
+
+    def _post_emprestimo(self, params):
+        body = self._body()
+        loan = view.insert_loan(self._campo_int(body, "user_id"), self._campo_int(body, "book_id"),
+                                self._campo_data(body, "loan_date"), None)
+        self._send_json(HTTPStatus.CREATED, _obj(LOAN_FIELDS, loan))
+
+    def _post_lote(self, params):
+        body = self._body()
+        book_ids = body.get("book_ids")
+        if not isinstance(book_ids, list) or not all(isinstance(b, int) for b in book_ids):
+            raise HTTPErro(HTTPStatus.BAD_REQUEST, "Campo book_ids deve ser uma lista de inteiros")
+        resultados = view.insert_loans(self._campo_int(body, "user_id"), book_ids, self._campo_data(body, "loan_date"))
+        self._send_json(HTTPStatus.OK, [
+            {"book_id": b, "loan": _obj(LOAN_FIELDS, loan), "erro": erro}
+            for b, (loan, erro) in zip(book_ids, resultados)
+        ])
+
+    def _post_devolucao(self, params, loan_id):
+        body = self._body()
+        loan = view.close_loan(int(loan_id), self._campo_data(body, "return_date"))
+        self._send_json(HTTPStatus.OK, _obj(LOAN_FIELDS, loan))
+
+    def _post_renovacao(self, params, loan_id):
+        body = self._body()
+        loan = view.renew_loan(int(loan_id), self._campo_data(body, "renew_date"))
+        self._send_json(HTTPStatus.OK, _obj(LOAN_FIELDS, loan))
+
+
+class Servidor(ThreadingHTTPServer):
+    daemon_threads = True
+    verbose = False
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--porta", type=int, default=8080)
+    ap.add_argument("--verbose", action="store_true", help="registra cada requisição no terminal")
+    args = ap.parse_args(argv)
+
+    srv = Servidor((args.host, args.porta), Handler)
+    srv.verbose = args.verbose
+    print(f"Servindo {view.DB_PATH} em http://{args.host}:{srv.server_address[1]}", flush=True)
+    try:
+        srv.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        srv.server_close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
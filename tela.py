@@ -1,15 +1,22 @@
 
+import itertools
+import os
+import queue
+import re
+import sys
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from datetime import datetime, date
 
 import tkinter as tk
 from tkinter import messagebox
 from tkinter import ttk
-from PIL import Image, ImageTk
 
 HOJE = datetime.today()
 
 from view import *
+from validacao import validar_usuario, validar_livro
 
 # ====== Cores ======
 c01 = "#2e2d2b" 
@@ -19,19 +26,97 @@ c04 = "#8D6E63"
 c05 = "#e06336"  
 c06 = "#D7CCC8"  
 
-ASSETS_DIR = Path("imagem")
+ASSETS_DIR = Path(__file__).with_name("imagem")
+# Ícones já redimensionados, um PNG por (arquivo, tamanho, mtime): a partir da
+# segunda execução o Tk lê direto, sem PIL nem LANCZOS
+IMAGE_CACHE_DIR = Path(os.environ.get("BIBLIOTECA_CACHE_IMAGENS") or ASSETS_DIR / ".cache")
+
+# Busca: espera o operador parar de digitar antes de consultar
+SEARCH_DEBOUNCE_MS = 300
+SEARCH_LIMIT = 500
+# Filtros por coluna: idem, cada tecla adia a consulta
+FILTER_DEBOUNCE_MS = 300
 
 # ====== Utilidades de UI ======
-def load_image(path: Path, size=None):
-    if not path.exists():
-        return None
-    try:
-        img = Image.open(path)
+class ImageCache:
+    """
+    Ícones prontos para o Tk, guardados em dois níveis:
+
+    - memória: a mesma PhotoImage é reaproveitada por todas as páginas;
+    - disco (cache_dir): a variante redimensionada é gravada em PNG na primeira
+      vez e, nas próximas execuções, lida pelo próprio Tk (PIL nem é importado).
+
+    A chave inclui o mtime do original: trocar o ícone gera uma variante nova.
+    Se imagem/ (ou o arquivo) não existir, ou o cache não puder ser gravado,
+    get() devolve None / segue sem cache em disco, e a página aparece sem ícone.
+    """
+
+    def __init__(self, cache_dir: Path):
+        self.cache_dir = cache_dir
+        self._mem = {}
+        self.hits = self.disk_hits = self.misses = 0
+
+    def get(self, path: Path, size=None):
+        try:
+            mtime = path.stat().st_mtime_ns
+        except OSError:
+            return None
+        chave = (path, size, mtime)
+        if chave in self._mem:
+            self.hits += 1
+            return self._mem[chave]
+        try:
+            img = self._load(path, size, mtime)
+        except Exception:
+            img = None
+        self._mem[chave] = img
+        return img
+
+    def _variant(self, path: Path, size, mtime: int) -> Path:
+        return self.cache_dir / f"{path.stem}_{size[0]}x{size[1]}_{mtime}.png"
+
+    def _load(self, path: Path, size, mtime: int):
+        pronto = self._variant(path, size, mtime) if size else path
+        if pronto.exists():
+            try:
+                img = tk.PhotoImage(file=str(pronto))
+                if pronto != path:
+                    self.disk_hits += 1
+                return img
+            except tk.TclError:
+                pass  # formato que o Tk não lê (ou variante corrompida): refaz pelo PIL
+        self.misses += 1
+        # PIL só é importado quando falta uma variante, não em toda partida
+        from PIL import Image, ImageTk
+        pil = Image.open(path)
         if size:
-            img = img.resize(size, Image.LANCZOS)
-        return ImageTk.PhotoImage(img)
-    except Exception:
-        return None
+            pil = pil.resize(size, Image.LANCZOS)
+            self._save(pil, path, size, mtime)
+        return ImageTk.PhotoImage(pil)
+
+    def _save(self, pil, path: Path, size, mtime: int) -> None:
+        destino = self._variant(path, size, mtime)
+        tmp = destino.with_name(f"{destino.name}.{os.getpid()}.tmp")
+        try:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            pil.save(tmp, "PNG")
+            os.replace(tmp, destino)  # outra instância lendo nunca vê um PNG pela metade
+            # variantes do mesmo ícone/tamanho com mtime antigo
+            for velha in self.cache_dir.glob(f"{path.stem}_{size[0]}x{size[1]}_*.png"):
+                if velha != destino:
+                    velha.unlink(missing_ok=True)
+        except OSError:
+            tmp.unlink(missing_ok=True)  # sem permissão/espaço: segue só com a memória
+
+    def clear(self) -> None:
+        """Esquece as PhotoImage (pertencem à janela Tk que as criou)."""
+        self._mem.clear()
+
+_icones = ImageCache(IMAGE_CACHE_DIR)
+
+def load_image(path: Path, size=None):
+    """Ícone pronto para o Tk (ver ImageCache), ou None se não der para abrir."""
+    return _icones.get(path, size)
 
 def ask_yesno(title, msg):
     return messagebox.askyesno(title, msg)
@@ -45,12 +130,481 @@ def error(msg, title="Erro"):
 def warn(msg, title="Atenção"):
     messagebox.showwarning(title, msg)
 
-def email_valido(s: str) -> bool:
-    s = (s or "").strip()
-    return "@" in s and "." in s.split("@")[-1]
+def parse_ids(texto: str):
+    """'3, 5 9' -> [3, 5, 9]; None se houver algo que não seja número."""
+    partes = [p for p in re.split(r"[,;\s]+", texto or "") if p]
+    if not partes or not all(p.isdigit() for p in partes):
+        return None
+    return [int(p) for p in partes]
+
+def resumo_lote(resultados, ids, rotulo):
+    """Mensagem de um insert_loans/close_loans: recusas listadas por id."""
+    recusas = [f"{rotulo} {i}: {erro}" for i, (_, erro) in zip(ids, resultados) if erro]
+    return "\n".join(recusas)
+
+
+class Worker:
+    """
+    Roda as chamadas do view numa thread de trabalho e entrega o resultado na
+    thread do Tk (fila lida periodicamente com after()), para a janela nunca
+    congelar esperando o SQLite.
+
+    Cada pedido vai num "canal": um pedido novo no mesmo canal, ou cancel(),
+    descarta o resultado do anterior (ex.: o usuário trocou de página antes
+    da carga terminar).
+    """
+
+    def __init__(self, root, max_workers=2, poll_ms=25):
+        self.root = root
+        self.poll_ms = poll_ms
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="view")
+        self._results = queue.SimpleQueue()
+        self._current = {}  # canal -> (token, future)
+        self._tokens = itertools.count(1)
+        self._after = root.after(poll_ms, self._poll)
+
+    def submit(self, channel, fn, on_done, on_error=None):
+        self.cancel(channel)
+        token = next(self._tokens)
+        fut = self._executor.submit(fn)
+        self._current[channel] = (token, fut)
+        fut.add_done_callback(lambda f: self._results.put((channel, token, f, on_done, on_error)))
+
+    def busy(self, channel):
+        return channel in self._current
+
+    def cancel(self, channel):
+        cur = self._current.pop(channel, None)
+        if cur is not None:
+            cur[1].cancel()
+
+    def _poll(self):
+        while True:
+            try:
+                channel, token, fut, on_done, on_error = self._results.get_nowait()
+            except queue.Empty:
+                break
+            cur = self._current.get(channel)
+            if cur is None or cur[0] != token or fut.cancelled():
+                continue  # resultado obsoleto
+            del self._current[channel]
+            try:
+                exc = fut.exception()
+                if exc is None:
+                    on_done(fut.result())
+                elif on_error is not None:
+                    on_error(exc)
+                else:
+                    raise exc
+            except Exception:
+                self.root.report_callback_exception(*sys.exc_info())
+        self._after = self.root.after(self.poll_ms, self._poll)
+
+    def shutdown(self):
+        self.root.after_cancel(self._after)
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+class QuerySource:
+    """
+    Fonte de linhas para o VirtualTree a partir de uma função list_*_page do view.
+
+    Guarda blocos de `block` linhas (LRU, até `max_blocks`). O bloco seguinte a um
+    bloco já carregado é buscado por chave (after_id = id da última linha);
+    um salto direto (arrastar a barra) usa offset.
+
+    load() e fetch_blocks() rodam na thread de trabalho e não mexem no cache;
+    o resto roda na thread do Tk.
+
+    feed: tabela do view.changes_since ('users', 'books', 'loans'). Com ele, a
+    carga guarda a versão lida e VirtualTree.sync() pergunta só o que mudou.
+    """
+
+    # insert_row/remove_row podem só ajustar o total e reler a janela
+    incremental = True
+    # linhas alteradas podem ser trocadas no lugar (a posição não depende delas)
+    patchable = True
+
+    def __init__(self, fetch_page, count, key=lambda row: row[0], block=PAGE_SIZE, max_blocks=64,
+                 feed=None, keep=None):
+        self.fetch_page = fetch_page
+        self.count = count
+        self.key = key
+        self.block = block
+        self.max_blocks = max_blocks
+        self.feed = feed
+        self.keep = keep  # linha alterada ainda pertence à lista? (ex.: só abertos)
+        self.version = None
+        self.total = 0
+        self.generation = 0
+        self._blocks = OrderedDict()
+
+    # ---- thread de trabalho ----
+    def load(self, top, visible):
+        """Total + blocos da janela que começa em `top` (para um refresh completo) + versão do feed."""
+        # versão antes dos dados: o que mudar no meio aparece de novo no próximo sync
+        version = current_version(self.feed) if self.feed else None
+        total = self.count()
+        top = max(0, min(top, total - visible))
+        blocks = [(n, self.fetch_page(None, self.block, n * self.block)) for n in self.block_range(top, top + visible)]
+        return total, blocks, version
+
+    def fetch_blocks(self, requests):
+        out = []
+        for n, after_key in requests:
+            if after_key is None:
+                rows = self.fetch_page(None, self.block, n * self.block)
+            else:
+                rows = self.fetch_page(after_key, self.block, 0)
+            out.append((n, rows))
+        return out
+
+    # ---- thread do Tk ----
+    def replace(self, total, blocks, version=None):
+        self._blocks.clear()
+        self.generation += 1
+        self.total = total
+        self.version = version
+        self.store(blocks)
+
+    def store(self, blocks):
+        for n, rows in blocks:
+            self._blocks[n] = list(rows or [])
+            self._blocks.move_to_end(n)
+        while len(self._blocks) > self.max_blocks:
+            self._blocks.popitem(last=False)
+
+    def block_range(self, start, stop):
+        return range(start // self.block, (max(stop, start + 1) - 1) // self.block + 1)
+
+    def patch(self, key, row):
+        """Troca no cache a linha com essa chave; False se ela não está carregada."""
+        for rows in self._blocks.values():
+            for i, r in enumerate(rows):
+                if self.key(r) == key:
+                    rows[i] = row
+                    return True
+        return False
+
+    def find(self, key):
+        """Linha com essa chave se estiver no cache (sem ir ao banco), senão None."""
+        for rows in self._blocks.values():
+            for r in rows:
+                if self.key(r) == key:
+                    return r
+        return None
+
+    def invalidate(self, delta_total=0):
+        """Esquece os blocos (posições mudaram) sem reler o total do banco."""
+        self._blocks.clear()
+        self.generation += 1
+        self.total = max(0, self.total + delta_total)
+
+    def missing(self, start, stop):
+        """Pedidos (bloco, after_key) para os blocos da janela que faltam no cache."""
+        out = []
+        for n in self.block_range(start, stop):
+            if n not in self._blocks:
+                prev = self._blocks.get(n - 1)
+                out.append((n, self.key(prev[-1]) if prev else None))
+        return out
+
+    def rows(self, start, stop):
+        """Linhas [start, stop) do cache, ou None se falta algum bloco."""
+        out = []
+        for n in self.block_range(start, stop):
+            block = self._blocks.get(n)
+            if block is None:
+                return None
+            self._blocks.move_to_end(n)
+            base = n * self.block
+            out.extend(block[max(start - base, 0):max(stop - base, 0)])
+        return out
+
+
+class ListSource(QuerySource):
+    """
+    Fonte para resultados pequenos e completos (ex.: busca): fetch_all() traz
+    tudo de uma vez na thread de trabalho e a rolagem não volta ao banco.
+    """
+
+    incremental = False
+    patchable = False
+
+    def __init__(self, fetch_all, block=PAGE_SIZE):
+        super().__init__(None, None, block=block, max_blocks=sys.maxsize)
+        self.fetch_all = fetch_all
+
+    def _split(self, rows):
+        return [(n, rows[i:i + self.block]) for n, i in enumerate(range(0, len(rows), self.block))]
+
+    def load(self, top, visible):
+        rows = list(self.fetch_all() or [])
+        return len(rows), self._split(rows), None
+
+    def fetch_blocks(self, requests):
+        wanted = {n for n, _ in requests}
+        return [(n, rows) for n, rows in self._split(list(self.fetch_all() or [])) if n in wanted]
+
+
+class VirtualTree:
+    """
+    Treeview virtualizado: só existem itens para as linhas visíveis (height do
+    Treeview). Ao rolar, os mesmos itens são reaproveitados com os valores da
+    nova janela, então o custo de redesenhar não depende do tamanho da tabela.
+
+    A rolagem (barra, roda do mouse, setas e PageUp/PageDown) é tratada aqui;
+    a seleção é guardada pela chave da linha (id) para sobreviver à reciclagem.
+    Os dados são lidos pelo Worker; enquanto isso o rótulo mostra "Carregando…".
+
+    Reciclar itens remarca a seleção e o Treeview dispara <<TreeviewSelect>>
+    de novo; as páginas escutam SELECT_EVENT, gerado só quando as chaves
+    selecionadas mudam de fato (o formulário não é recarregado ao rolar).
+    """
+
+    SELECT_EVENT = "<<SelecaoMudou>>"
+
+    def __init__(self, tree, scrollbar, to_values, worker, label=None, error_msg="Não foi possível carregar a lista"):
+        self.tree = tree
+        self.scrollbar = scrollbar
+        self.to_values = to_values
+        self.worker = worker
+        self.label = label
+        self.error_msg = error_msg
+        self.source = None
+        self.loading = False
+        self.visible = int(tree.cget("height"))
+        self._top = 0
+        self._iids = []
+        self._keys = []
+        self._selected = set()
+
+        scrollbar.configure(command=self._on_scrollbar)
+        tree.bind("<MouseWheel>", self._on_wheel)
+        tree.bind("<Button-4>", lambda e: self._scroll_and_break(-3))
+        tree.bind("<Button-5>", lambda e: self._scroll_and_break(3))
+        tree.bind("<Up>", lambda e: self._on_arrow(-1))
+        tree.bind("<Down>", lambda e: self._on_arrow(1))
+        tree.bind("<Prior>", lambda e: self._scroll_and_break(-self.visible))
+        tree.bind("<Next>", lambda e: self._scroll_and_break(self.visible))
+        tree.bind("<<TreeviewSelect>>", self._on_select, add="+")
+
+    # ---- dados ----
+    def set_source(self, source):
+        self.source = source
+        self._top = 0
+        self.refresh()
+
+    def refresh(self):
+        if self.source is None:
+            return
+        src, top, visible = self.source, self._top, self.visible
+        self.worker.cancel((self, "bloco"))
+        self._set_loading(True)
+        self.worker.submit((self, "dados"), lambda: src.load(top, visible), self._on_loaded, self._on_error)
+
+    def sync(self):
+        """
+        Reexibe a lista (página reaberta): pelo feed de mudanças, não relê nada
+        se a tabela não mudou e só troca as linhas alteradas que já estão no
+        cache; inserções, exclusões ou linhas que mudariam de posição relêem.
+        """
+        src = self.source
+        if src is None or src.feed is None or src.version is None:
+            return self.refresh()
+        feed, since = src.feed, src.version
+        self.worker.cancel((self, "bloco"))
+        self.worker.submit(
+            (self, "dados"),
+            lambda: changes_since(feed, since),
+            lambda result: self._on_changes(src, result),
+            lambda _exc: self.refresh(),  # lápides já descartadas (ou erro): relê tudo
+        )
+
+    def _on_changes(self, src, result):
+        if src is not self.source:
+            return
+        version, rows, removed = result
+        if removed or not all(self._troca_no_lugar(row) for row in rows):
+            return self.refresh()
+        for row in rows:
+            src.patch(src.key(row), row)
+        src.version = version
+        self.render()
+
+    def cancel(self):
+        self.worker.cancel((self, "dados"))
+        self.worker.cancel((self, "bloco"))
+        self._set_loading(False)
+
+    def selected_keys(self):
+        return set(self._selected)
+
+    # ---- atualizações pontuais (após insert/update/delete de uma linha) ----
+    def _troca_no_lugar(self, row):
+        """A linha alterada está no cache e continua na mesma posição da lista?"""
+        src = self.source
+        return (src.patchable and src.find(src.key(row)) is not None
+                and (src.keep is None or src.keep(row)))
+
+    def update_row(self, row):
+        """
+        Linha alterada: troca os valores no lugar se ela está carregada e não muda
+        de posição nem sai da lista; em lista ordenada/filtrada (ou que não a
+        aceita mais, ex.: empréstimo fechado em Devoluções) relê a janela.
+        """
+        src = self.source
+        if src is None:
+            return
+        if self._troca_no_lugar(row):
+            src.patch(src.key(row), row)
+            self.render()
+        elif not src.patchable or src.find(src.key(row)) is not None:
+            self.refresh()
+
+    def insert_row(self, row):
+        self.insert_rows([row])
+
+    def insert_rows(self, rows):
+        """Linhas novas (um lote): ajusta o total e relê só a janela visível, uma vez."""
+        if self.source is None or not rows:
+            return
+        if not self.source.incremental:
+            return self.refresh()  # resultado de busca: a linha pode nem casar
+        self.source.invalidate(+len(rows))
+        self.render()
+
+    def remove_row(self, key):
+        self.remove_rows([key])
+
+    def remove_rows(self, keys):
+        self._selected.difference_update(keys)
+        if self.source is None or not keys:
+            return
+        if not self.source.incremental:
+            return self.refresh()
+        self.source.invalidate(-len(keys))
+        self.render()
+
+    def _on_loaded(self, result):
+        self.source.replace(*result)
+        self._set_loading(False)
+        self.render()
+
+    def _on_error(self, exc):
+        self._set_loading(False)
+        warn(f"{self.error_msg}: {exc}")
+
+    def _request_missing(self, start, stop):
+        src = self.source
+        requests = src.missing(start, stop)
+        generation = src.generation
+
+        def store(blocks):
+            if src.generation != generation:
+                return  # chegou depois de um refresh: dados velhos
+            src.store(blocks)
+            self._set_loading(False)
+            self.render()
+
+        self._set_loading(True)
+        self.worker.submit((self, "bloco"), lambda: src.fetch_blocks(requests), store, self._on_error)
+
+    def _set_loading(self, loading):
+        self.loading = loading
+        self.tree.configure(cursor="watch" if loading else "")
+        if self.label is not None:
+            if loading:
+                self.label.configure(text="Carregando…")
+            elif self.source is not None:
+                self.label.configure(text=f"{self.source.total} registros")
+
+    # ---- desenho ----
+    def render(self):
+        total = self.source.total if self.source else 0
+        self._top = max(0, min(self._top, total - self.visible))
+        stop = min(self._top + self.visible, total)
+        if total:
+            self.scrollbar.set(self._top / total, stop / total)
+        else:
+            self.scrollbar.set(0, 1)
+
+        rows = self.source.rows(self._top, stop) if total else []
+        if rows is None:
+            # janela fora do cache: mantém as linhas atuais até o bloco chegar
+            return self._request_missing(self._top, stop)
+
+        # recicla os itens existentes; cria/apaga só a diferença
+        while len(self._iids) < len(rows):
+            self._iids.append(self.tree.insert("", "end", values=()))
+        if len(self._iids) > len(rows):
+            self.tree.delete(*self._iids[len(rows):])
+            del self._iids[len(rows):]
+
+        self._keys = []
+        for iid, row in zip(self._iids, rows):
+            values = self.to_values(row)
+            self._keys.append(values[0])
+            self.tree.item(iid, values=values)
+
+        marcar = [iid for iid, k in zip(self._iids, self._keys) if k in self._selected]
+        if tuple(marcar) != self.tree.selection():
+            self.tree.selection_set(marcar)
+
+    # ---- rolagem ----
+    def scroll_to(self, top):
+        total = self.source.total if self.source else 0
+        top = max(0, min(int(top), max(total - self.visible, 0)))
+        if top != self._top:
+            self._top = top
+            self.render()
+
+    def _on_scrollbar(self, action, amount, unit=None):
+        if self.source is None:
+            return
+        if action == "moveto":
+            self.scroll_to(float(amount) * self.source.total)
+        elif action == "scroll":
+            step = self.visible if unit == "pages" else 1
+            self.scroll_to(self._top + int(amount) * step)
+
+    def _scroll_and_break(self, delta):
+        self.scroll_to(self._top + delta)
+        return "break"
+
+    def _on_wheel(self, event):
+        # Windows: múltiplos de 120; macOS: valores pequenos
+        delta = event.delta // 120 if abs(event.delta) >= 120 else event.delta
+        return self._scroll_and_break(-3 * delta)
+
+    def _on_arrow(self, delta):
+        # dentro da janela visível o Treeview move o foco sozinho;
+        # na borda, rola uma linha e mantém a seleção na borda
+        if not self._iids:
+            return None
+        borda = self._iids[0] if delta < 0 else self._iids[-1]
+        if self.tree.focus() != borda:
+            return None
+        antes = self._top
+        self.scroll_to(self._top + delta)
+        if self._top != antes and not self.loading:
+            antes_sel = self._selected
+            self._selected = {self._keys[0] if delta < 0 else self._keys[-1]}
+            self.render()
+            if self._selected != antes_sel:
+                self.tree.event_generate(self.SELECT_EVENT)
+        return "break"
 
-def tel_limpo(s: str) -> str:
-    return "".join(ch for ch in (s or "") if ch.isdigit())
+    def _on_select(self, _event=None):
+        antes = self._selected
+        visiveis = set(self._keys)
+        marcados = {self._keys[self._iids.index(iid)] for iid in self.tree.selection() if iid in self._iids}
+        if str(self.tree.cget("selectmode")) == "browse":
+            self._selected = marcados or (self._selected - visiveis)
+        else:
+            self._selected = (self._selected - visiveis) | marcados
+        if self._selected != antes:
+            self.tree.event_generate(self.SELECT_EVENT)
 
 # ====== App ======
 class App(tk.Tk):
@@ -84,8 +638,10 @@ class App(tk.Tk):
         self.frame_right = tk.Frame(self, bg=c02, relief="flat")
         self.frame_right.grid(row=1, column=1, sticky="nsew")
 
-        # Páginas
+        # Páginas (as leituras/escritas no banco rodam no Worker)
+        self.worker = Worker(self)
         self.pages = {}
+        self._current = None
         self._create_pages()
 
         # Página inicial
@@ -137,6 +693,8 @@ class App(tk.Tk):
         make_btn("Livros", lambda: self.show_page("LivrosPage"), 74)
         make_btn("Empréstimos", lambda: self.show_page("EmprestimosPage"), 128)
         make_btn("Devoluções", lambda: self.show_page("DevolucoesPage"), 182)
+        make_btn("Atrasados", lambda: self.show_page("AtrasadosPage"), 236)
+        make_btn("Painel", lambda: self.show_page("DashboardPage"), 290)
 
         # rodapé lateral
         lbl_version = tk.Label(
@@ -150,24 +708,197 @@ class App(tk.Tk):
 
     # ====== Páginas ======
     def _create_pages(self):
-        self.pages["UsuariosPage"] = UsuariosPage(self.frame_right)
-        self.pages["LivrosPage"] = LivrosPage(self.frame_right)
-        self.pages["EmprestimosPage"] = EmprestimosPage(self.frame_right)
-        self.pages["DevolucoesPage"] = DevolucoesPage(self.frame_right)
+        # só registra as classes: cada página é montada na primeira vez que abre
+        self._page_classes = {
+            "UsuariosPage": UsuariosPage,
+            "LivrosPage": LivrosPage,
+            "EmprestimosPage": EmprestimosPage,
+            "DevolucoesPage": DevolucoesPage,
+            "AtrasadosPage": AtrasadosPage,
+            "DashboardPage": DashboardPage,
+        }
 
     def show_page(self, name: str):
+        if self._current is not None and self._current != name:
+            self.pages[self._current].on_hide()  # descarta carga que ninguém vai ver
         for page_name, page_obj in self.pages.items():
             page_obj.place_forget()
-        page = self.pages[name]
+        page = self.pages.get(name)
+        if page is None:
+            page = self.pages[name] = self._page_classes[name](self.frame_right, self.worker)
         page.place(x=0, y=0, relwidth=1, relheight=1)
-        page.on_show()  # atualiza listagens quando abre
-
-# ====== Página: Usuários ======
-class UsuariosPage(tk.Frame):
-    def __init__(self, parent):
+        self._current = name
+        page.on_show()  # atualiza listagens quando abre (em segundo plano)
+
+    def destroy(self):
+        self.worker.shutdown()
+        _icones.clear()
+        super().destroy()
+
+# ====== Base das páginas ======
+class BasePage(tk.Frame):
+    """
+    Base comum das páginas: guarda o Worker, carrega a lista ao abrir e
+    cancela a carga pendente ao sair. Subclasses definem _build(),
+    self.vtree e self.source; FEED (tabela do changes_since) faz a lista
+    reaberta reler só o que mudou, e _keep diz se uma linha alterada ainda
+    pertence a ela.
+    """
+
+    FEED = None
+    _keep = None
+
+    def __init__(self, parent, worker):
         super().__init__(parent, bg=c02)
+        self.worker = worker
         self._build()
 
+    def on_show(self):
+        self._refresh_list()
+
+    def on_hide(self):
+        self.vtree.cancel()
+
+    def _refresh_list(self):
+        if self.vtree.source is None:
+            self.vtree.set_source(self.source)
+        else:
+            self.vtree.sync()
+
+    # ---- busca ----
+    def _build_search(self, row, column, search_fn):
+        """Caixa de busca no índice textual, consultado enquanto o operador digita."""
+        self.search_fn = search_fn
+        self._search_after = None
+        self.var_search = tk.StringVar()
+        tk.Label(self, text="Buscar", bg=c02, fg=c04, font=("Ivy", 10)).grid(
+            row=row, column=column, sticky="e", padx=(12, 0), pady=(8, 10)
+        )
+        tk.Entry(self, textvariable=self.var_search, width=22, relief="solid").grid(
+            row=row, column=column + 1, sticky="w", padx=12, pady=(8, 10)
+        )
+        self.var_search.trace_add("write", self._on_search_typed)
+
+    def _on_search_typed(self, *_):
+        # debounce: cada tecla adia a consulta; só a última dispara
+        if self._search_after is not None:
+            self.after_cancel(self._search_after)
+        self._search_after = self.after(SEARCH_DEBOUNCE_MS, self._apply_search)
+
+    def _apply_search(self):
+        self._search_after = None
+        query = self.var_search.get().strip()
+        if query:
+            search_fn = self.search_fn
+            self.vtree.set_source(ListSource(lambda: search_fn(query, SEARCH_LIMIT)))
+        else:
+            self.vtree.set_source(self.source)
+
+    # ---- ordenação e filtros por coluna ----
+    def _build_columns(self, row, columnspan, columns, fetch_page, count, numeric=()):
+        """
+        Cabeçalhos clicáveis e um campo de filtro por coluna, resolvidos no SQL
+        do view (ORDER BY/WHERE nas consultas paginadas), nunca em Python.
+
+        columns: {coluna do Treeview: (coluna do view, ordenável)}; os filtros
+        ficam na linha `row`, logo acima da lista. numeric: colunas do view
+        cujo filtro só aceita dígitos.
+        fetch_page(after_id, limit, offset, sort, desc, filters) e count(filters)
+        montam a QuerySource.
+        """
+        self._fetch_page, self._count = fetch_page, count
+        self._sort = ("id", True)  # (coluna do view, decrescente)
+        self._filter_after = None
+        self._filter_vars = {}
+        self._sort_heads = {}
+        self._titles = {c: self.tree.heading(c, "text") for c in columns}
+
+        frame = tk.Frame(self, bg=c02, height=22)
+        frame.grid(row=row, column=0, columnspan=columnspan, sticky="ew", padx=12)
+        digitos = (self.register(lambda texto: texto == "" or texto.isdigit()), "%P")
+        entries = {}
+        for c, (col, sortable) in columns.items():
+            if sortable:
+                self._sort_heads[col] = c
+                self.tree.heading(c, command=lambda col=col: self._on_sort(col))
+            var = tk.StringVar()
+            var.trace_add("write", self._on_filter_typed)
+            self._filter_vars[col] = var
+            extra = {"validate": "key", "validatecommand": digitos} if col in numeric else {}
+            entries[c] = tk.Entry(frame, textvariable=var, relief="solid", bd=1, font=("Ivy", 9), **extra)
+
+        def place_entries(_event=None):
+            # acompanha a largura real das colunas (o Treeview estica para caber)
+            x = 0
+            for c in self.tree["columns"]:
+                w = int(self.tree.column(c, "width"))
+                if c in entries:
+                    entries[c].place(x=x + 1, y=1, width=max(w - 2, 8), height=20)
+                x += w
+
+        self.tree.bind("<Configure>", place_entries, add="+")
+        place_entries()
+        self._show_sort()
+        self.source = self._new_source()
+
+    def _new_source(self):
+        sort, desc = self._sort
+        filters = {col: var.get().strip() for col, var in self._filter_vars.items() if var.get().strip()}
+        fetch_page, count = self._fetch_page, self._count
+        source = QuerySource(
+            lambda after_id, limit, offset: fetch_page(after_id, limit, offset, sort, desc, filters),
+            lambda: count(filters),
+            feed=self.FEED,
+            keep=self._keep,
+        )
+        # linha nova pode nem passar no filtro: com filtro, insert/remove relê a lista
+        source.incremental = not filters
+        # ordenada por outra coluna, a linha alterada pode mudar de lugar
+        source.patchable = not filters and sort == "id"
+        return source
+
+    def _on_sort(self, col):
+        atual, desc = self._sort
+        # outra coluna começa em ordem crescente; a mesma alterna
+        self._sort = (col, not desc) if col == atual else (col, False)
+        self._show_sort()
+        self._apply_columns()
+
+    def _show_sort(self):
+        col, desc = self._sort
+        for c, title in self._titles.items():
+            seta = (" ▼" if desc else " ▲") if self._sort_heads.get(col) == c else ""
+            self.tree.heading(c, text=title + seta)
+
+    def _on_filter_typed(self, *_):
+        if self._filter_after is not None:
+            self.after_cancel(self._filter_after)
+        self._filter_after = self.after(FILTER_DEBOUNCE_MS, self._apply_columns)
+
+    def _apply_columns(self):
+        if self._filter_after is not None:
+            self.after_cancel(self._filter_after)
+            self._filter_after = None
+        self.source = self._new_source()
+        # a busca ordena por relevância: ordenar/filtrar por coluna sai dela
+        if getattr(self, "var_search", None) is not None and self.var_search.get():
+            self.var_search.set("")
+            if self._search_after is not None:
+                self.after_cancel(self._search_after)
+                self._search_after = None
+        self.vtree.set_source(self.source)
+
+    def _run(self, fn, on_done, error_msg):
+        """Roda uma escrita do view na thread de trabalho (uma por vez por página)."""
+        canal = (self, "escrita")
+        if self.worker.busy(canal):
+            return
+        self.worker.submit(canal, fn, on_done, lambda e: error(f"{error_msg}: {e}"))
+
+# ====== Página: Usuários ======
+class UsuariosPage(BasePage):
+    FEED = "users"
+
     def _build(self):
         # Título
         tk.Label(
@@ -241,7 +972,7 @@ class UsuariosPage(tk.Frame):
         # Lista
         cols = ("id", "first", "last", "address", "email", "phone")
         self.tree = ttk.Treeview(self, columns=cols, show="headings", height=10)
-        self.tree.grid(row=6, column=0, columnspan=6, sticky="nsew", padx=12, pady=(4, 12))
+        self.tree.grid(row=7, column=0, columnspan=6, sticky="nsew", padx=12, pady=(2, 12))
 
         self.tree.heading("id", text="ID")
         self.tree.heading("first", text="Primeiro")
@@ -257,51 +988,55 @@ class UsuariosPage(tk.Frame):
         self.tree.column("email", width=190)
         self.tree.column("phone", width=100, anchor="center")
 
-        self.tree.bind("<<TreeviewSelect>>", self._on_select)
+        self.tree.bind(VirtualTree.SELECT_EVENT, self._on_select)
 
-        # Scroll
+        # Scroll (só as linhas visíveis existem no Treeview)
         yscroll = ttk.Scrollbar(self, orient="vertical", command=self.tree.yview)
-        self.tree.configure(yscroll=yscroll.set)
-        yscroll.grid(row=6, column=6, sticky="ns", pady=(4, 12))
+        yscroll.grid(row=7, column=6, sticky="ns", pady=(2, 12))
+        self.lbl_total = tk.Label(self, text="", bg=c02, fg=c04, font=("Ivy", 9))
+        self.lbl_total.grid(row=0, column=5, sticky="e", padx=12, pady=(12, 2))
+        self.vtree = VirtualTree(
+            self.tree, yscroll, self._row_values, self.worker, self.lbl_total,
+            "Não foi possível carregar usuários",
+        )
+        self._build_columns(
+            6, 6,
+            {"id": ("id", True), "first": ("first_name", True), "last": ("last_name", True), "email": ("email", True)},
+            list_users_page,
+            count_users,
+            numeric=("id",),
+        )
+        self._build_search(5, 4, search_users)
 
         # Pesos
         for i in range(6):
             self.grid_columnconfigure(i, weight=1)
 
-    def on_show(self):
-        self._refresh_list()
-
     # ====== Handlers ======
     def _on_save(self):
-        first = self.var_first.get().strip()
-        last = self.var_last.get().strip()
-        address = self.var_address.get().strip()
-        email = self.var_email.get().strip()
-        phone_raw = self.var_phone.get().strip()
-        phone = tel_limpo(phone_raw)
-
-        if not all([first, last, address, email, phone_raw]):
-            return error("Preencha todos os campos")
-
-        if not email_valido(email):
-            return error("E-mail inválido")
-
-        if len(phone) < 8:
-            return error("Telefone inválido")
+        try:
+            first, last, address, email, phone = validar_usuario(
+                self.var_first.get(), self.var_last.get(), self.var_address.get(),
+                self.var_email.get(), self.var_phone.get(),
+            )
+        except ValueError as e:
+            return error(str(e))
 
         user_id = self.var_id.get().strip()
-        try:
-            if user_id:
-                update_user(int(user_id), first, last, address, email, phone)
-                info("Usuário atualizado")
-            else:
-                insert_user(first, last, address, email, phone)
-                info("Usuário inserido")
-        except Exception as e:
-            return error(f"Erro ao salvar usuário: {e}")
+        if user_id:
+            call = lambda: update_user(int(user_id), first, last, address, email, phone)
+            msg, patch = "Usuário atualizado", self.vtree.update_row
+        else:
+            call = lambda: insert_user(first, last, address, email, phone)
+            msg, patch = "Usuário inserido", self.vtree.insert_row
+
+        def done(row):
+            info(msg)
+            self._on_clear()
+            if row is not None:
+                patch(row)
 
-        self._on_clear()
-        self._refresh_list()
+        self._run(call, done, "Erro ao salvar usuário")
 
     def _on_delete(self):
         user_id = self.var_id.get().strip()
@@ -309,13 +1044,13 @@ class UsuariosPage(tk.Frame):
             return warn("Selecione um usuário para excluir")
         if not ask_yesno("Confirmação", "Deseja excluir este usuário?"):
             return
-        try:
-            delete_user(int(user_id))
+
+        def done(_):
             info("Usuário excluído")
             self._on_clear()
-            self._refresh_list()
-        except Exception as e:
-            error(f"Erro ao excluir: {e}")
+            self.vtree.remove_row(int(user_id))
+
+        self._run(lambda: delete_user(int(user_id)), done, "Erro ao excluir")
 
     def _on_clear(self):
         self.var_id.set("")
@@ -338,34 +1073,14 @@ class UsuariosPage(tk.Frame):
         self.var_email.set(vals[4])
         self.var_phone.set(vals[5])
 
-    def _refresh_list(self):
-        for i in self.tree.get_children():
-            self.tree.delete(i)
-
-        try:
-            data = list_users() or []
-        except Exception as e:
-            return warn(f"Não foi possível carregar usuários: {e}")
-
-        # Aceita tupla ou dict
-        for row in data:
-            if isinstance(row, dict):
-                rid = row.get("id", "")
-                first = row.get("first_name", "")
-                last = row.get("last_name", "")
-                address = row.get("address", "")
-                email = row.get("email", "")
-                phone = row.get("phone", "")
-            else:
-                # id, first_name, last_name, address, email, phone, ...
-                rid, first, last, address, email, phone = row[:6]
-            self.tree.insert("", "end", values=(rid, first, last, address, email, phone))
+    @staticmethod
+    def _row_values(row):
+        # view.User: id, first_name, last_name, address, email, phone, created_at
+        return row[:6]
 
 # ====== Página: Livros ======
-class LivrosPage(tk.Frame):
-    def __init__(self, parent):
-        super().__init__(parent, bg=c02)
-        self._build()
+class LivrosPage(BasePage):
+    FEED = "books"
 
     def _build(self):
         tk.Label(
@@ -441,7 +1156,7 @@ class LivrosPage(tk.Frame):
         # Lista
         cols = ("id", "title", "author", "publisher", "year", "isbn", "qty")
         self.tree = ttk.Treeview(self, columns=cols, show="headings", height=10)
-        self.tree.grid(row=6, column=0, columnspan=8, sticky="nsew", padx=12, pady=(4, 12))
+        self.tree.grid(row=7, column=0, columnspan=8, sticky="nsew", padx=12, pady=(2, 12))
 
         for k, t in zip(cols, ["ID", "Título", "Autor", "Editora", "Ano", "ISBN", "Qtd."]):
             self.tree.heading(k, text=t)
@@ -454,49 +1169,54 @@ class LivrosPage(tk.Frame):
         self.tree.column("isbn", width=120)
         self.tree.column("qty", width=60, anchor="center")
 
-        self.tree.bind("<<TreeviewSelect>>", self._on_select)
+        self.tree.bind(VirtualTree.SELECT_EVENT, self._on_select)
 
         yscroll = ttk.Scrollbar(self, orient="vertical", command=self.tree.yview)
-        self.tree.configure(yscroll=yscroll.set)
-        yscroll.grid(row=6, column=8, sticky="ns", pady=(4, 12))
+        yscroll.grid(row=7, column=8, sticky="ns", pady=(2, 12))
+        self.lbl_total = tk.Label(self, text="", bg=c02, fg=c04, font=("Ivy", 9))
+        self.lbl_total.grid(row=0, column=7, sticky="e", padx=12, pady=(12, 2))
+        self.vtree = VirtualTree(
+            self.tree, yscroll, self._row_values, self.worker, self.lbl_total,
+            "Não foi possível carregar livros",
+        )
+        self._build_columns(
+            6, 8,
+            {"id": ("id", True), "title": ("title", True), "author": ("author", True),
+             "publisher": ("publisher", True), "year": ("year", True), "isbn": ("isbn", True)},
+            list_books_page,
+            count_books,
+            numeric=("id", "year"),
+        )
+        self._build_search(5, 4, search_books)
 
         for i in range(8):
             self.grid_columnconfigure(i, weight=1)
 
-    def on_show(self):
-        self._refresh_list()
-
     # ====== Handlers ======
     def _on_save(self):
-        title = self.var_title.get().strip()
-        author = self.var_author.get().strip()
-        publisher = self.var_publisher.get().strip()
-        year = self.var_year.get().strip()
-        isbn = self.var_isbn.get().strip()
-        qty = self.var_qty.get().strip()
-
-        if not all([title, author, publisher, year, isbn, qty]):
-            return error("Preencha todos os campos")
-
-        if not year.isdigit() or len(year) not in (2, 4):
-            return error("Ano inválido")
-
-        if not qty.isdigit():
-            return error("Quantidade inválida")
+        try:
+            title, author, publisher, year, isbn, qty = validar_livro(
+                self.var_title.get(), self.var_author.get(), self.var_publisher.get(),
+                self.var_year.get(), self.var_isbn.get(), self.var_qty.get(),
+            )
+        except ValueError as e:
+            return error(str(e))
 
         bid = self.var_id.get().strip()
-        try:
-            if bid:
-                update_book(int(bid), title, author, publisher, int(year), isbn, int(qty))
-                info("Livro atualizado")
-            else:
-                insert_book(title, author, publisher, int(year), isbn, int(qty))
-                info("Livro inserido")
-        except Exception as e:
-            return error(f"Erro ao salvar livro: {e}")
+        if bid:
+            call = lambda: update_book(int(bid), title, author, publisher, year, isbn, qty)
+            msg, patch = "Livro atualizado", self.vtree.update_row
+        else:
+            call = lambda: insert_book(title, author, publisher, year, isbn, qty)
+            msg, patch = "Livro inserido", self.vtree.insert_row
+
+        def done(row):
+            info(msg)
+            self._on_clear()
+            if row is not None:
+                patch(row)
 
-        self._on_clear()
-        self._refresh_list()
+        self._run(call, done, "Erro ao salvar livro")
 
     def _on_delete(self):
         bid = self.var_id.get().strip()
@@ -504,13 +1224,13 @@ class LivrosPage(tk.Frame):
             return warn("Selecione um livro para excluir")
         if not ask_yesno("Confirmação", "Deseja excluir este livro?"):
             return
-        try:
-            delete_book(int(bid))
+
+        def done(_):
             info("Livro excluído")
             self._on_clear()
-            self._refresh_list()
-        except Exception as e:
-            error(f"Erro ao excluir: {e}")
+            self.vtree.remove_row(int(bid))
+
+        self._run(lambda: delete_book(int(bid)), done, "Erro ao excluir")
 
     def _on_clear(self):
         self.var_id.set("")
@@ -535,33 +1255,15 @@ class LivrosPage(tk.Frame):
         self.var_isbn.set(vals[5])
         self.var_qty.set(vals[6])
 
-    def _refresh_list(self):
-        for i in self.tree.get_children():
-            self.tree.delete(i)
-        try:
-            data = list_books() or []
-        except Exception as e:
-            return warn(f"Não foi possível carregar livros: {e}")
-
-        for row in data:
-            if isinstance(row, dict):
-                rid = row.get("id", "")
-                title = row.get("title", "")
-                author = row.get("author", "")
-                publisher = row.get("publisher", "")
-                year = row.get("year", "")
-                isbn = row.get("isbn", "")
-                qty = row.get("quantity", "")
-            else:
-                rid, title, author, publisher, year, isbn, qty = row[:7]
-            self.tree.insert("", "end", values=(rid, title, author, publisher, year, isbn, qty))
+    @staticmethod
+    def _row_values(row):
+        # view.Book: id, title, author, publisher, year, isbn, quantity, ...
+        return row[:7]
 
 
 # ====== Página: Empréstimos ======
-class EmprestimosPage(tk.Frame):
-    def __init__(self, parent):
-        super().__init__(parent, bg=c02)
-        self._build()
+class EmprestimosPage(BasePage):
+    FEED = "loans"
 
     def _build(self):
         tk.Label(
@@ -589,7 +1291,7 @@ class EmprestimosPage(tk.Frame):
         mk_lbl("ID Usuário", 2, 0)
         mk_ent(self.var_user_id, 2, 1)
 
-        mk_lbl("ID Livro", 2, 2)
+        mk_lbl("ID Livro(s)", 2, 2)
         mk_ent(self.var_book_id, 2, 3)
 
         mk_lbl("Data Empréstimo (YYYY-MM-DD)", 3, 0)
@@ -623,60 +1325,77 @@ class EmprestimosPage(tk.Frame):
         self.tree.column("status", width=80, anchor="center")
 
         yscroll = ttk.Scrollbar(self, orient="vertical", command=self.tree.yview)
-        self.tree.configure(yscroll=yscroll.set)
         yscroll.grid(row=6, column=6, sticky="ns", pady=(6, 12))
+        self.lbl_total = tk.Label(self, text="", bg=c02, fg=c04, font=("Ivy", 9))
+        self.lbl_total.grid(row=0, column=5, sticky="e", padx=12, pady=(12, 2))
+        self.vtree = VirtualTree(
+            self.tree, yscroll, self._row_values, self.worker, self.lbl_total,
+            "Não foi possível carregar empréstimos",
+        )
+        # selecionar empréstimos (Ctrl/Shift+clique) preenche os livros para emprestar de novo
+        self.tree.bind(VirtualTree.SELECT_EVENT, self._on_select)
+        self._build_columns(
+            5, 6,
+            {"id": ("id", True), "user": ("user_name", False), "book": ("book_title", False),
+             "loan_date": ("loan_date", True), "expected": ("expected_date", True), "status": ("status", False)},
+            lambda after_id, limit, offset, sort, desc, filters: list_loans_page(
+                after_id, limit, False, offset, sort, desc, filters),
+            lambda filters: count_loans(False, filters),
+            numeric=("id",),
+        )
 
         for i in range(6):
             self.grid_columnconfigure(i, weight=1)
 
-    def on_show(self):
-        self._refresh_list()
-
     def _on_save(self):
         user_id = self.var_user_id.get().strip()
-        book_id = self.var_book_id.get().strip()
+        book_ids = parse_ids(self.var_book_id.get())
         loan_date = self.var_loan_date.get().strip()
 
-        if not all([user_id, book_id, loan_date]):
+        if not all([user_id, self.var_book_id.get().strip(), loan_date]):
             return error("Preencha todos os campos")
-
-        try:
-            insert_loan(int(user_id), int(book_id), loan_date, None)
-            info("Empréstimo registrado")
+        if not user_id.isdigit() or book_ids is None:
+            return error("Informe IDs numéricos (vários livros separados por vírgula)")
+
+        def done(resultados):
+            feitos = [loan for loan, _ in resultados if loan]
+            self.vtree.insert_rows(feitos)  # um lote = uma releitura da janela
+            recusas = resumo_lote(resultados, book_ids, "Livro")
+            if not recusas:
+                info("Empréstimo registrado" if len(feitos) == 1 else f"{len(feitos)} empréstimos registrados")
+            elif feitos:
+                warn(f"{len(feitos)} empréstimos registrados. Não emprestados:\n{recusas}")
+            else:
+                return error(recusas)
             self.var_user_id.set("")
             self.var_book_id.set("")
             self.var_loan_date.set(date.today().strftime("%Y-%m-%d"))
-            self._refresh_list()
-        except Exception as e:
-            error(f"Erro ao registrar empréstimo: {e}")
 
-    def _refresh_list(self):
-        # Lista por padrão apenas abertos
-        for i in self.tree.get_children():
-            self.tree.delete(i)
-        try:
-            data = list_loans(open_only=False) or []
-        except Exception as e:
-            return warn(f"Não foi possível carregar empréstimos: {e}")
-
-        for row in data:
-            if isinstance(row, dict):
-                rid = row.get("id", "")
-                user = row.get("user_name", row.get("user_id", ""))
-                book = row.get("book_title", row.get("book_id", ""))
-                loan_d = row.get("loan_date", "")
-                expected = row.get("expected_date", "")
-                status = row.get("status", "")
-            else:
-                rid, _uid, user, _bid, book, loan_d, expected, _ret, status = row[:9]
-            self.tree.insert("", "end", values=(rid, user, book, loan_d, expected, status))
+        self._run(
+            lambda: insert_loans(int(user_id), book_ids, loan_date),
+            done, "Erro ao registrar empréstimo",
+        )
+
+    def _on_select(self, _event=None):
+        # a tabela mostra só o título: o id do livro vem da linha completa no cache
+        rows = [self.source.find(k) for k in sorted(self.vtree.selected_keys())]
+        rows = [r for r in rows if r]
+        if not rows:
+            return
+        self.var_book_id.set(", ".join(str(r.book_id) for r in rows))
+        usuarios = {r.user_id for r in rows}
+        if len(usuarios) == 1:
+            self.var_user_id.set(str(usuarios.pop()))
+
+    @staticmethod
+    def _row_values(row):
+        return (row.id, row.user_name, row.book_title, row.loan_date, row.expected_date, row.status)
 
 
 # ====== Página: Devoluções ======
-class DevolucoesPage(tk.Frame):
-    def __init__(self, parent):
-        super().__init__(parent, bg=c02)
-        self._build()
+class DevolucoesPage(BasePage):
+    FEED = "loans"
+    _keep = staticmethod(lambda row: row.status == "open")
 
     def _build(self):
         tk.Label(
@@ -690,7 +1409,7 @@ class DevolucoesPage(tk.Frame):
         self.var_loan_id = tk.StringVar()
         self.var_return_date = tk.StringVar(value=date.today().strftime("%Y-%m-%d"))
 
-        tk.Label(self, text="ID Empréstimo", bg=c02, fg=c04, font=("Ivy", 10)).grid(
+        tk.Label(self, text="ID Empréstimo(s)", bg=c02, fg=c04, font=("Ivy", 10)).grid(
             row=2, column=0, sticky="w", padx=12, pady=4
         )
         tk.Entry(self, textvariable=self.var_loan_id, width=20, relief="solid").grid(
@@ -712,6 +1431,11 @@ class DevolucoesPage(tk.Frame):
         ).grid(row=3, column=1, sticky="w", padx=12, pady=(8, 10))
         if icon_save: self.children[list(self.children)[-1]].image = icon_save
 
+        tk.Button(
+            self, text="Renovar", font=("Ivy", 11), bg=c06, fg=c04, relief="ridge", bd=2,
+            command=self._on_renew, padx=8, pady=4
+        ).grid(row=3, column=2, sticky="w", padx=12, pady=(8, 10))
+
         # Lista de empréstimos abertos para facilitar seleção
         cols = ("id", "user", "book", "loan_date", "expected")
         self.tree = ttk.Treeview(self, columns=cols, show="headings", height=12)
@@ -729,57 +1453,283 @@ class DevolucoesPage(tk.Frame):
         self.tree.column("loan_date", width=120, anchor="center")
         self.tree.column("expected", width=120, anchor="center")
 
-        self.tree.bind("<<TreeviewSelect>>", self._on_select)
-
         yscroll = ttk.Scrollbar(self, orient="vertical", command=self.tree.yview)
-        self.tree.configure(yscroll=yscroll.set)
         yscroll.grid(row=5, column=6, sticky="ns", pady=(6, 12))
+        self.lbl_total = tk.Label(self, text="", bg=c02, fg=c04, font=("Ivy", 9))
+        self.lbl_total.grid(row=0, column=5, sticky="e", padx=12, pady=(12, 2))
+        self.vtree = VirtualTree(
+            self.tree, yscroll, self._row_values, self.worker, self.lbl_total,
+            "Não foi possível carregar empréstimos abertos",
+        )
+        self.tree.bind(VirtualTree.SELECT_EVENT, self._on_select)
+        self._build_columns(
+            4, 6,
+            {"id": ("id", True), "user": ("user_name", False), "book": ("book_title", False),
+             "loan_date": ("loan_date", True), "expected": ("expected_date", True)},
+            lambda after_id, limit, offset, sort, desc, filters: list_loans_page(
+                after_id, limit, True, offset, sort, desc, filters),
+            lambda filters: count_loans(True, filters),
+            numeric=("id",),
+        )
 
         for i in range(6):
             self.grid_columnconfigure(i, weight=1)
 
-    def on_show(self):
-        self._refresh_list()
-
     def _on_close(self):
-        loan_id = self.var_loan_id.get().strip()
+        loan_ids = parse_ids(self.var_loan_id.get())
         ret_date = self.var_return_date.get().strip()
-        if not all([loan_id, ret_date]):
+        if not all([self.var_loan_id.get().strip(), ret_date]):
             return error("Informe o ID do empréstimo e a data de devolução")
-        try:
-            close_loan(int(loan_id), ret_date)
-            info("Devolução registrada")
+        if loan_ids is None:
+            return error("Informe IDs numéricos (vários empréstimos separados por vírgula)")
+        loan_ids = list(dict.fromkeys(loan_ids))  # o mesmo empréstimo duas vezes fecha uma vez só
+
+        def done(resultados):
+            feitos = [loan for loan, erro in resultados if loan is not None and erro is None]
+            self.vtree.remove_rows([loan.id for loan in feitos])  # somem da lista de abertos
+            if len(feitos) < len(resultados):
+                # recusados (ex.: outra mesa já devolveu): a lista pode estar velha
+                self.vtree.refresh()
+            recusas = resumo_lote(resultados, loan_ids, "Empréstimo")
+            if not recusas:
+                info("Devolução registrada" if len(feitos) == 1 else f"{len(feitos)} devoluções registradas")
+            elif feitos:
+                warn(f"{len(feitos)} devoluções registradas. Não devolvidos:\n{recusas}")
+            else:
+                return error(recusas)
             self.var_loan_id.set("")
             self.var_return_date.set(date.today().strftime("%Y-%m-%d"))
-            self._refresh_list()
-        except Exception as e:
-            error(f"Erro ao registrar devolução: {e}")
+
+        self._run(lambda: close_loans(loan_ids, ret_date), done, "Erro ao registrar devolução")
+
+    def _on_renew(self):
+        loan_ids = parse_ids(self.var_loan_id.get())
+        if loan_ids is None:
+            return error("Informe IDs numéricos (vários empréstimos separados por vírgula)")
+        loan_ids = list(dict.fromkeys(loan_ids))
+
+        def renovar():
+            # cada renovação é independente: uma recusada não desfaz as outras
+            out = []
+            for loan_id in loan_ids:
+                try:
+                    out.append((renew_loan(loan_id), None))
+                except ValueError as e:
+                    out.append((None, str(e)))
+            return out
+
+        def done(resultados):
+            feitos = [loan for loan, _ in resultados if loan]
+            for loan in feitos:
+                self.vtree.update_row(loan)  # novo prazo em "Previsto"
+            recusas = resumo_lote(resultados, loan_ids, "Empréstimo")
+            if not recusas:
+                info("Empréstimo renovado" if len(feitos) == 1 else f"{len(feitos)} empréstimos renovados")
+            elif feitos:
+                warn(f"{len(feitos)} empréstimos renovados. Não renovados:\n{recusas}")
+            else:
+                error(recusas)
+
+        self._run(renovar, done, "Erro ao renovar empréstimo")
 
     def _on_select(self, _event=None):
-        sel = self.tree.selection()
-        if not sel:
-            return
-        vals = self.tree.item(sel[0], "values")
-        self.var_loan_id.set(vals[0])
+        # várias linhas (Ctrl/Shift+clique) devolvem a pilha toda de uma vez
+        ids = sorted(self.vtree.selected_keys())
+        if ids:
+            self.var_loan_id.set(", ".join(str(i) for i in ids))
+
+    @staticmethod
+    def _row_values(row):
+        return (row.id, row.user_name, row.book_title, row.loan_date, row.expected_date)
 
+
+# ====== Página: Atrasados ======
+class AtrasadosPage(BasePage):
+    def _build(self):
+        tk.Label(
+            self, text="Empréstimos Atrasados", font=("Verdana", 14, "bold"), bg=c02, fg=c04
+        ).grid(row=0, column=0, columnspan=6, sticky="w", padx=12, pady=(12, 2))
+
+        ttk.Separator(self, orient="horizontal").grid(
+            row=1, column=0, columnspan=6, sticky="ew", padx=12, pady=(0, 10)
+        )
+
+        self.var_as_of = tk.StringVar(value=date.today().strftime("%Y-%m-%d"))
+        self.var_min_days = tk.StringVar(value="1")
+
+        tk.Label(self, text="Data de referência (YYYY-MM-DD)", bg=c02, fg=c04, font=("Ivy", 10)).grid(
+            row=2, column=0, sticky="w", padx=12, pady=4
+        )
+        tk.Entry(self, textvariable=self.var_as_of, width=14, relief="solid").grid(
+            row=2, column=1, sticky="w", padx=12, pady=4
+        )
+        tk.Label(self, text="Dias de atraso (mín.)", bg=c02, fg=c04, font=("Ivy", 10)).grid(
+            row=2, column=2, sticky="w", padx=12, pady=4
+        )
+        tk.Entry(self, textvariable=self.var_min_days, width=6, relief="solid").grid(
+            row=2, column=3, sticky="w", padx=12, pady=4
+        )
+        tk.Button(
+            self, text="Atualizar", font=("Ivy", 11), bg=c04, fg=c06, relief="ridge", bd=2,
+            command=self._refresh_list, padx=8, pady=2
+        ).grid(row=2, column=4, sticky="w", padx=12, pady=4)
+
+        self.lbl_total = tk.Label(self, text="", bg=c02, fg=c04, font=("Ivy", 9))
+        self.lbl_total.grid(row=0, column=5, sticky="e", padx=12, pady=(12, 2))
+
+        # uma aba por visão: empréstimos, por usuário, por livro
+        notebook = ttk.Notebook(self)
+        notebook.grid(row=3, column=0, columnspan=6, sticky="nsew", padx=12, pady=(6, 12))
+        self.vtree = self._build_tab(
+            notebook, "Empréstimos",
+            (("id", "ID", 50), ("user", "Usuário", 150), ("book", "Livro", 190),
+             ("loan_date", "Empréstimo", 100), ("expected", "Previsto", 100), ("late", "Dias", 60)),
+            self._row_values, self.lbl_total,
+        )
+        self.vtree_users = self._build_tab(
+            notebook, "Por usuário",
+            (("id", "ID", 50), ("user", "Usuário", 170), ("email", "E-mail", 190),
+             ("phone", "Telefone", 110), ("loans", "Atrasados", 80), ("late", "Maior atraso", 90)),
+            self._user_values,
+        )
+        self.vtree_books = self._build_tab(
+            notebook, "Por livro",
+            (("id", "ID", 50), ("book", "Livro", 380), ("loans", "Atrasados", 90), ("late", "Maior atraso", 100)),
+            self._book_values,
+        )
+        self.source = None
+
+        for i in range(6):
+            self.grid_columnconfigure(i, weight=1)
+
+    def _build_tab(self, notebook, title, columns, to_values, label=None):
+        frame = tk.Frame(notebook, bg=c02)
+        notebook.add(frame, text=title)
+        tree = ttk.Treeview(frame, columns=[c[0] for c in columns], show="headings", height=11)
+        tree.grid(row=0, column=0, sticky="nsew")
+        for col, text, width in columns:
+            tree.heading(col, text=text)
+            tree.column(col, width=width, anchor="w" if width > 100 else "center")
+        yscroll = ttk.Scrollbar(frame, orient="vertical", command=tree.yview)
+        yscroll.grid(row=0, column=1, sticky="ns")
+        frame.grid_columnconfigure(0, weight=1)
+        return VirtualTree(tree, yscroll, to_values, self.worker, label, "Não foi possível carregar atrasados")
+
+    # ====== Handlers ======
     def _refresh_list(self):
-        for i in self.tree.get_children():
-            self.tree.delete(i)
+        as_of = self.var_as_of.get().strip()
+        min_days = self.var_min_days.get().strip()
         try:
-            data = list_loans(open_only=True) or []
-        except Exception as e:
-            return warn(f"Não foi possível carregar empréstimos abertos: {e}")
-
-        for row in data:
-            if isinstance(row, dict):
-                rid = row.get("id", "")
-                user = row.get("user_name", row.get("user_id", ""))
-                book = row.get("book_title", row.get("book_id", ""))
-                loan_d = row.get("loan_date", "")
-                expected = row.get("expected_date", "")
-            else:
-                rid, _uid, user, _bid, book, loan_d, expected, _ret, _status = row[:9]
-            self.tree.insert("", "end", values=(rid, user, book, loan_d, expected))
+            date.fromisoformat(as_of)
+        except ValueError:
+            return error("Data de referência inválida")
+        if not min_days.isdigit():
+            return error("Dias de atraso inválido")
+        min_days = int(min_days)
+
+        # as três consultas rodam no Worker; a página continua respondendo
+        self.source = ListSource(lambda: list_overdue(as_of, min_days))
+        self.vtree.set_source(self.source)
+        self.vtree_users.set_source(ListSource(lambda: overdue_by_user(as_of, min_days)))
+        self.vtree_books.set_source(ListSource(lambda: overdue_by_book(as_of, min_days)))
+
+    def on_hide(self):
+        for vtree in (self.vtree, self.vtree_users, self.vtree_books):
+            vtree.cancel()
+
+    @staticmethod
+    def _row_values(row):
+        rid, _uid, user, _bid, book, loan_d, expected, days_late = row[:8]
+        return (rid, user, book, loan_d, expected, days_late)
+
+    @staticmethod
+    def _user_values(row):
+        return tuple(row[:6])
+
+    @staticmethod
+    def _book_values(row):
+        return tuple(row[:4])
+
+
+# ====== Página: Painel ======
+class DashboardPage(BasePage):
+    TOP = 10
+
+    def _build(self):
+        tk.Label(
+            self, text="Painel", font=("Verdana", 14, "bold"), bg=c02, fg=c04
+        ).grid(row=0, column=0, columnspan=4, sticky="w", padx=12, pady=(12, 2))
+
+        ttk.Separator(self, orient="horizontal").grid(
+            row=1, column=0, columnspan=4, sticky="ew", padx=12, pady=(0, 10)
+        )
+
+        self.lbl_util = tk.Label(self, text="", bg=c02, fg=c04, font=("Ivy", 11, "bold"))
+        self.lbl_util.grid(row=2, column=0, columnspan=3, sticky="w", padx=12, pady=4)
+        tk.Button(
+            self, text="Atualizar", font=("Ivy", 11), bg=c04, fg=c06, relief="ridge", bd=2,
+            command=self._refresh_list, padx=8, pady=2
+        ).grid(row=2, column=3, sticky="e", padx=12, pady=4)
+
+        self.tree_books = self._build_table(3, 0, "Livros mais emprestados", (("title", "Livro", 250), ("loans", "Empréstimos", 90)))
+        self.tree_users = self._build_table(3, 2, "Usuários mais ativos", (("name", "Usuário", 250), ("loans", "Empréstimos", 90)))
+        self.tree_months = self._build_table(5, 0, "Por mês", (("month", "Mês", 110), ("loans", "Empréstimos", 115), ("returns", "Devoluções", 115)))
+        self.tree_days = self._build_table(5, 2, "Últimos 30 dias", (("day", "Dia", 110), ("loans", "Empréstimos", 115), ("returns", "Devoluções", 115)))
+
+        for i in range(4):
+            self.grid_columnconfigure(i, weight=1)
+
+    def _build_table(self, row, column, title, columns):
+        tk.Label(self, text=title, bg=c02, fg=c04, font=("Ivy", 10, "bold")).grid(
+            row=row, column=column, columnspan=2, sticky="w", padx=12, pady=(6, 0)
+        )
+        tree = ttk.Treeview(self, columns=[c[0] for c in columns], show="headings", height=6)
+        tree.grid(row=row + 1, column=column, columnspan=2, sticky="nsew", padx=12, pady=(2, 8))
+        for col, text, width in columns:
+            tree.heading(col, text=text)
+            tree.column(col, width=width, anchor="w" if col in ("title", "name") else "center")
+        return tree
+
+    # ====== Handlers ======
+    def on_show(self):
+        self._refresh_list()
+
+    def on_hide(self):
+        self.worker.cancel((self, "dados"))
+
+    def _refresh_list(self):
+        top = self.TOP
+
+        def carregar():
+            # leituras pequenas das tabelas de resumo; nenhuma varre o histórico
+            return {
+                "books": top_books(top), "users": top_users(top),
+                "months": loans_per_month(12), "days": loans_per_day(30),
+                "util": utilization(),
+            }
+
+        self.lbl_util.configure(text="Carregando…")
+        self.worker.submit(
+            (self, "dados"), carregar, self._on_loaded,
+            lambda e: warn(f"Não foi possível carregar o painel: {e}"),
+        )
+
+    def _on_loaded(self, dados):
+        exemplares, emprestados, fracao = dados["util"]
+        self.lbl_util.configure(
+            text=f"Acervo: {exemplares} exemplares · emprestados agora: {emprestados} ({fracao:.0%})"
+        )
+        self._fill(self.tree_books, [(title, loans) for _id, title, loans in dados["books"]])
+        self._fill(self.tree_users, [(name, loans) for _id, name, loans in dados["users"]])
+        self._fill(self.tree_months, reversed(dados["months"]))  # mais recente no topo
+        self._fill(self.tree_days, reversed(dados["days"]))
+
+    @staticmethod
+    def _fill(tree, rows):
+        # listas curtas (poucas dezenas de linhas): recriar é mais simples que reciclar
+        tree.delete(*tree.get_children())
+        for row in rows:
+            tree.insert("", "end", values=tuple(row))
 
 
 # ====== Execução ======
@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+"""
+validacao.py — Regras de validação de usuários e livros.
+
+Usadas pelos formulários do tela.py e pela importação em lote do view.py,
+para que os dois caminhos aceitem e rejeitem exatamente os mesmos dados.
+Os validadores devolvem os campos já normalizados ou levantam ValueError
+com a mensagem mostrada ao operador.
+"""
+
+from typing import Any, Tuple
+
+
+def email_valido(s: str) -> bool:
+    s = (s or "").strip()
+    return "@" in s and "." in s.split("@")[-1]
+
+
+def tel_limpo(s: str) -> str:
+    return "".join(ch for ch in (s or "") if ch.isdigit())
+
+
+def _texto(v: Any) -> str:
+    return "" if v is None else str(v).strip()
+
+
+def validar_usuario(first_name, last_name, address, email, phone) -> Tuple[str, str, str, str, str]:
+    """-> (first_name, last_name, address, email, phone só com dígitos)"""
+    first, last, addr, mail, phone_raw = map(_texto, (first_name, last_name, address, email, phone))
+    phone_digits = tel_limpo(phone_raw)
+
+    if not all([first, last, addr, mail, phone_raw]):
+        raise ValueError("Preencha todos os campos")
+
+    if not email_valido(mail):
+        raise ValueError("E-mail inválido")
+
+    if len(phone_digits) < 8:
+        raise ValueError("Telefone inválido")
+
+    return first, last, addr, mail, phone_digits
+
+
+def validar_livro(title, author, publisher, year, isbn, quantity) -> Tuple[str, str, str, int, str, int]:
+    """-> (title, author, publisher, year:int, isbn, quantity:int)"""
+    title, author, publisher, year, isbn, qty = map(_texto, (title, author, publisher, year, isbn, quantity))
+
+    if not all([title, author, publisher, year, isbn, qty]):
+        raise ValueError("Preencha todos os campos")
+
+    if not year.isdigit() or len(year) not in (2, 4):
+        raise ValueError("Ano inválido")
+
+    if not qty.isdigit():
+        raise ValueError("Quantidade inválida")
+
+    return title, author, publisher, int(year), isbn, int(qty)
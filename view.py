@@ -7,55 +7,499 @@ view.py — Camada de dados (SQLite) compatível com o banco 'dados.db' que voc
   usuarios(id, nome, sobrenome, endereco, email, telefone)
   emprestimos(id, id_livro, id_usuario, data_emprestimo, data_devolucao)
 
-- Na importação, roda migrações para adicionar colunas que o app usa:
+- No primeiro acesso ao banco (não na importação), aplica as migrações versionadas
+  pendentes (PRAGMA user_version), que são a única definição do esquema. As primeiras adicionam colunas que o app usa:
   livros:     quantidade INTEGER DEFAULT 1, disponivel INTEGER DEFAULT 1
   emprestimos: data_prevista TEXT, status TEXT DEFAULT 'open'
+  livros.disponivel é mantido por gatilhos em emprestimos (e em livros.quantidade).
 
 - Expõe as funções no formato esperado pelo app (tuplas na ordem certa).
 
 Assinaturas:
+LINHAS: usuários, livros e empréstimos saem como namedtuples User, Book e Loan (tuplas na ordem abaixo,
+também com acesso por nome: row.title, row.user_name); "tuple" abaixo é um desses tipos.
+
 USUÁRIOS
-- insert_user(first_name, last_name, address, email, phone) -> None
-- list_users() -> list[tuple]  (id, first_name, last_name, address, email, phone, created_at)
-- update_user(user_id, first_name, last_name, address, email, phone) -> None
+- insert_user(first_name, last_name, address, email, phone) -> tuple  (linha criada, como em list_users)
+- list_users() -> list[tuple]  (id, first_name, last_name, address, email, phone, created_at, updated_at)
+- list_users_page(after_id=None, limit=PAGE_SIZE, offset=0, sort="id", desc=True, filters=None) -> list[tuple]
+  (mesma tupla; a página começa depois da linha after_id na ordem pedida)
+- count_users(filters=None) -> int
+- get_user(user_id) -> tuple | None
+- update_user(user_id, first_name, last_name, address, email, phone) -> tuple | None  (linha atualizada)
 - delete_user(user_id) -> None
 
 LIVROS
-- insert_book(title, author, publisher, year, isbn, quantity) -> None
-- list_books() -> list[tuple]  (id, title, author, publisher, year, isbn, quantity, available, created_at)
-- update_book(book_id, title, author, publisher, year, isbn, quantity) -> None
+- insert_book(title, author, publisher, year, isbn, quantity) -> tuple  (linha criada, como em list_books)
+- list_books() -> list[tuple]  (id, title, author, publisher, year, isbn, quantity, available, created_at, updated_at)
+- list_books_page(after_id=None, limit=PAGE_SIZE, offset=0, sort="id", desc=True, filters=None) -> list[tuple]
+- count_books(filters=None) -> int
+- get_book(book_id) -> tuple | None
+- update_book(book_id, title, author, publisher, year, isbn, quantity) -> tuple | None  (linha atualizada)
 - delete_book(book_id) -> None
 
+POLÍTICAS (prazo, limite de empréstimos abertos e de renovações por tipo de usuário x categoria de livro;
+'*' = qualquer um; vale a regra mais específica; padrão: 7 dias, sem limite, 1 renovação)
+- list_policies() -> list[tuple]  (user_type, category, days, max_loans | None, max_renewals)
+- set_policy(user_type, category, days, max_loans=None, max_renewals=0) -> None
+- delete_policy(user_type, category) -> None
+- set_user_type(user_id, user_type) -> None      (padrão 'padrao')
+- set_book_category(book_id, category) -> None   (padrão 'geral')
+
 EMPRÉSTIMOS
-- insert_loan(user_id, book_id, loan_date, return_date) -> None
+- insert_loan(user_id, book_id, loan_date, return_date) -> tuple  (linha criada, como em list_loans;
+  data prevista e limite de empréstimos vêm da política)
+- renew_loan(loan_id, renew_date=None) -> tuple  (novo prazo pela política; respeita o limite de renovações)
 - list_loans(open_only=False) -> list[tuple]
   (id, user_id, user_name, book_id, book_title, loan_date, expected_date, return_date, status)
-- close_loan(loan_id, return_date) -> None
+- list_loans_page(after_id=None, limit=PAGE_SIZE, open_only=False, offset=0, sort="id", desc=True,
+                  filters=None) -> list[tuple]
+- count_loans(open_only=False, filters=None) -> int
+- get_loan(loan_id) -> tuple | None
+- close_loan(loan_id, return_date) -> tuple  (empréstimo já fechado)
+- insert_loans(user_id, book_ids, loan_date) -> list[(tuple | None, erro | None)]  (uma transação, um resultado por livro)
+- close_loans(loan_ids, return_date) -> list[(tuple | None, erro | None)]  (uma transação, um resultado por empréstimo;
+  já fechado = (None, "Empréstimo já devolvido"))
+- iter_loans(start=None, end=None, status=None, after_id=None, batch_size=EXPORT_BATCH_SIZE) -> iterator[tuple]
+  (mesma tupla de list_loans, ids crescentes, lida em blocos; para exportação)
+- iter_users(after_id=None, batch_size=EXPORT_BATCH_SIZE) / iter_books(...) -> iterator[tuple]
+  (idem para usuários e livros; o servidor usa para enviar a tabela inteira em streaming)
+
+MUDANÇAS (cada insert/update/delete em usuários, livros e empréstimos ganha uma versão, contador por tabela;
+created_at/updated_at em UTC 'AAAA-MM-DD HH:MM:SS.sss', mantidos por gatilhos; linhas anteriores à
+migração 9 levam o instante dela em created_at/updated_at, exceto o created_at dos empréstimos, que é a data
+do empréstimo)
+- changes_since(table, since=0) -> (version, list[tuple], list[id excluído])
+  table = 'users' | 'books' | 'loans'; since = versão devolvida antes ou instante UTC (datetime/date/texto ISO)
+- current_version(table) -> int
+- prune_changes(table, up_to_version) -> int  (apaga lápides de exclusão até essa versão; changes_since
+  de antes delas passa a dar ValueError -> releia a tabela)
+  Renomear usuário ou livro dá versão nova aos empréstimos dele (user_name/book_title vêm do JOIN).
+
+ORDENAÇÃO E FILTROS (list_*_page / count_*; colunas fora da lista -> ValueError; empate desfeito pelo id)
+- sort: usuários id, first_name, last_name, email; livros id, title, author, publisher, year, isbn;
+  empréstimos id, loan_date, expected_date.  desc=True = decrescente
+  (NULL vem primeiro na crescente e por último na decrescente, como no SQLite)
+- filters: {coluna: valor}; texto casa pelo início sem diferenciar maiúsculas ASCII (first_name, last_name,
+  title, author, publisher, book_title; user_name pelo nome completo ou pelo sobrenome), email/isbn/datas
+  pelo início, id/year/user_id/book_id por igualdade, status ('open'/'closed') exato. Acentos contam:
+  'jose' não acha 'José' (a busca textual, search_*, é que ignora acentos)
+
+ATRASOS (abertos com data_prevista <= as_of - min_days_late; as_of = 'AAAA-MM-DD' ou date, padrão hoje;
+  a data entra na chave do cache, então o resultado em cache vira no dia seguinte)
+- list_overdue(as_of=None, min_days_late=1) -> list[tuple]
+  (id, user_id, user_name, book_id, book_title, loan_date, expected_date, days_late), mais atrasados primeiro
+- overdue_by_user(as_of=None, min_days_late=1) -> list[tuple]  (user_id, user_name, email, phone, loans, max_days_late)
+- overdue_by_book(as_of=None, min_days_late=1) -> list[tuple]  (book_id, book_title, loans, max_days_late)
+
+PAINEL (lido das tabelas de resumo estat_*, atualizadas por gatilhos a cada empréstimo/devolução)
+- top_books(limit=10) -> list[tuple]  (book_id, title, loans)
+- top_users(limit=10) -> list[tuple]  (user_id, name, loans)
+- loans_per_day(days=30, as_of=None) -> list[tuple]  (dia, loans, returns)
+- loans_per_month(months=12, as_of=None) -> list[tuple]  ('AAAA-MM', loans, returns)
+- utilization() -> (copies, on_loan, fraction)
+- rebuild_stats() -> None  (recalcula os resumos a partir do histórico)
+
+BUSCA (texto livre; cada palavra casa como prefixo, resultados por relevância)
+- search_books(query, limit=50, offset=0) -> list[tuple]  (mesma tupla de list_books)
+- search_users(query, limit=50, offset=0) -> list[tuple]  (mesma tupla de list_users)
+
+IMPORTAÇÃO EM LOTE (linhas = tuplas na ordem de insert_* ou dicts com as mesmas chaves;
+mesmas regras de validação dos formulários; uma transação, executemany em lotes)
+- bulk_insert_users(rows, batch_size=BULK_BATCH_SIZE, on_reject=None) -> int  (linhas gravadas)
+- bulk_insert_books(rows, batch_size=BULK_BATCH_SIZE, on_reject=None) -> int
+  on_reject(n, motivo, linha) é chamado para cada linha recusada
+
+CACHE (list_*, count_*, search_* são memoizadas; escritas invalidam só as tabelas tocadas)
+- cache_stats() -> dict  (hits, misses, evictions, entries, rows, max_rows)
+- clear_cache() -> None
+- data_version() -> int  (muda a cada commit no banco, de qualquer processo; serve de ETag)
+
+CONEXÕES / DIAGNÓSTICO
+- close_connections() -> None  (encerra o pool; todas as funções acima compartilham o pool)
+  (view_async.py expõe as mesmas funções como corrotinas asyncio, com escritas em grupo)
+- check_query_plans() -> dict[str, str | None]  (None = consulta usa o índice esperado)
+- check_availability(repair=False) -> list[tuple]  (id, title, quantity, available, expected) dos livros
+  cujo disponivel diverge de quantidade - empréstimos abertos; repair=True corrige
+- migrate() -> None  (aplica as migrações pendentes já; senão o primeiro acesso ao banco aplica)
+- schema_version() -> int  (versão do esquema gravada no banco; SCHEMA_VERSION = versão do código)
 """
 
 from __future__ import annotations
+import atexit
+import configparser
+import functools
+import inspect
+import os
+import re
 import sqlite3
+import threading
+import time
+from collections import OrderedDict, namedtuple
 from contextlib import contextmanager
 from pathlib import Path
-from datetime import date, datetime, timedelta
-from typing import Iterable, List, Dict, Any, Optional
+from datetime import date, datetime, timedelta, timezone
+from typing import Iterable, Iterator, List, Dict, Any, Optional, Tuple
+
+from validacao import validar_livro, validar_usuario
+
+DB_PATH = Path(os.environ.get("BIBLIOTECA_DB") or Path(__file__).with_name("dados.db"))
+
+# Quantas conexões ociosas o pool mantém abertas (0 = abre/fecha a cada chamada)
+POOL_SIZE = int(os.environ.get("BIBLIOTECA_POOL_SIZE", "4"))
+# Tamanho padrão das páginas de list_*_page.
+# Prefira after_id (id da última linha recebida): offset só para saltar direto
+# a uma posição, pois o SQLite precisa percorrer as linhas puladas.
+PAGE_SIZE = 200
+# Conexão ociosa há mais tempo que isso (segundos) é testada antes de ser reusada
+POOL_IDLE_CHECK = 30.0
+
+# =========================
+# Perfil de desempenho (PRAGMAs)
+# =========================
+# "durable": WAL + synchronous=FULL, não perde transação confirmada nem em queda de energia.
+# "fast":    WAL + synchronous=NORMAL, cache/mmap maiores; pode perder os últimos commits
+#            numa queda de energia, mas o banco nunca corrompe.
+_PERFIS: Dict[str, Dict[str, str]] = {
+    "durable": {
+        "journal_mode": "WAL",
+        "synchronous": "FULL",
+        "cache_size": "-16000",       # em KiB quando negativo (~16 MB)
+        "mmap_size": "0",
+        "temp_store": "DEFAULT",
+        "busy_timeout": "5000",       # ms esperando lock de outra mesa antes de falhar
+    },
+    "fast": {
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "cache_size": "-65536",       # ~64 MB
+        "mmap_size": "268435456",     # 256 MB
+        "temp_store": "MEMORY",
+        "busy_timeout": "5000",
+    },
+}
+
+# Arquivo opcional de configuração:
+#   [banco]
+#   perfil = fast
+#   cache_size = -131072     (qualquer chave do perfil pode ser sobrescrita)
+CONFIG_PATH = Path(os.environ.get("BIBLIOTECA_CONFIG") or Path(__file__).with_name("biblioteca.ini"))
+
+_VALOR_PRAGMA = re.compile(r"^-?[A-Za-z0-9_]+$")
+
+def _carregar_perfil() -> Dict[str, str]:
+    cfg = configparser.ConfigParser()
+    cfg.read(CONFIG_PATH, encoding="utf-8")
+    nome = os.environ.get("BIBLIOTECA_PERFIL") or cfg.get("banco", "perfil", fallback="durable")
+    if nome not in _PERFIS:
+        raise ValueError(f"Perfil de banco desconhecido: {nome!r} (use {', '.join(_PERFIS)})")
+    perfil = dict(_PERFIS[nome])
+    for chave in perfil:
+        if cfg.has_option("banco", chave):
+            perfil[chave] = cfg.get("banco", chave).strip()
+    for chave, valor in perfil.items():
+        # valores entram direto no PRAGMA, então só aceitamos palavras/números
+        if not _VALOR_PRAGMA.match(valor):
+            raise ValueError(f"Valor inválido para {chave}: {valor!r}")
+    return perfil
+
+PERFIL = _carregar_perfil()
 
-DB_PATH = Path(__file__).with_name("dados.db")
+# PRAGMAs que valem por conexão (journal_mode fica gravado no arquivo e é aplicado na migração)
+_PRAGMAS_POR_CONEXAO = ("synchronous", "cache_size", "mmap_size", "temp_store", "busy_timeout")
 
 # =========================
 # Infra básica do SQLite
 # =========================
-@contextmanager
-def _conn():
-    con = sqlite3.connect(DB_PATH)
-    try:
+class _ConnectionPool:
+    """
+    Pool pequeno de conexões SQLite reaproveitáveis entre chamadas e threads.
+
+    - acquire(): pega uma conexão ociosa (a mais recente primeiro) ou abre uma nova.
+    - release(): desfaz transação pendente e devolve ao pool se houver vaga; senão fecha.
+    - close(): fecha as ociosas; as que estiverem em uso fecham ao serem devolvidas.
+    """
+
+    def __init__(self, path: Path, size: int):
+        self.path = path
+        self.size = max(0, size)
+        self._idle: List[Tuple[sqlite3.Connection, float]] = []
+        self._lock = threading.Lock()
+        self._closed = False
+
+    def _open(self) -> sqlite3.Connection:
+        # check_same_thread=False: a conexão pode ser usada por outra thread depois
+        # de devolvida, mas nunca por duas ao mesmo tempo.
+        con = sqlite3.connect(self.path, check_same_thread=False)
         con.row_factory = sqlite3.Row
         # Importante no SQLite para chaves estrangeiras (se usar futuramente com ON DELETE CASCADE):
         con.execute("PRAGMA foreign_keys = ON;")
+        for chave in _PRAGMAS_POR_CONEXAO:
+            con.execute(f"PRAGMA {chave} = {PERFIL[chave]};")
+        return con
+
+    @staticmethod
+    def _healthy(con: sqlite3.Connection) -> bool:
+        try:
+            con.execute("SELECT 1;").fetchone()
+            return True
+        except sqlite3.Error:
+            return False
+
+    def acquire(self) -> sqlite3.Connection:
+        while True:
+            with self._lock:
+                if self._closed:
+                    raise sqlite3.ProgrammingError("Pool de conexões encerrado")
+                item = self._idle.pop() if self._idle else None
+            if item is None:
+                return self._open()
+            con, idle_since = item
+            if time.monotonic() - idle_since < POOL_IDLE_CHECK or self._healthy(con):
+                return con
+            con.close()
+
+    def release(self, con: sqlite3.Connection) -> None:
+        try:
+            if con.in_transaction:
+                con.rollback()
+        except sqlite3.Error:
+            con.close()
+            return
+        with self._lock:
+            if not self._closed and len(self._idle) < self.size:
+                self._idle.append((con, time.monotonic()))
+                return
+        con.close()
+
+    def close(self) -> None:
+        with self._lock:
+            self._closed = True
+            idle, self._idle = self._idle, []
+        for con, _ in idle:
+            try:
+                # atualiza estatísticas dos índices quando vale a pena (barato se nada mudou)
+                con.execute("PRAGMA optimize;")
+            except sqlite3.Error:
+                pass
+            con.close()
+
+_pool = _ConnectionPool(DB_PATH, POOL_SIZE)
+
+# =========================
+# Cache de leitura
+# =========================
+# Quantas linhas (somando todos os resultados guardados) o cache pode manter
+CACHE_MAX_ROWS = int(os.environ.get("BIBLIOTECA_CACHE_ROWS", "50000"))
+
+class _ReadCache:
+    """
+    Cache LRU dos resultados de list_*/search_*/count_*, chaveado pela função
+    e seus parâmetros e limitado pelo total de linhas guardadas.
+
+    - As escritas deste processo invalidam só as tabelas que tocaram, depois do commit.
+    - Escritas de fora (outro processo/mesa) são detectadas por PRAGMA data_version
+      numa conexão própria; nesse caso o cache inteiro é descartado.
+    - Cada tabela tem um contador de versão: um resultado lido antes de uma
+      invalidação não é guardado depois dela.
+    """
+
+    def __init__(self, max_rows: int):
+        self.max_rows = max_rows
+        self._data: "OrderedDict[tuple, Tuple[Tuple[str, ...], Any, int]]" = OrderedDict()
+        self._rows = 0
+        self._versions: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._watch: Optional[sqlite3.Connection] = None
+        self._data_version: Optional[int] = None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _external_change(self) -> bool:
+        # chamado com o lock; data_version muda quando OUTRA conexão faz commit
+        if self._watch is None:
+            self._watch = sqlite3.connect(DB_PATH, check_same_thread=False)
+        dv = self._watch.execute("PRAGMA data_version;").fetchone()[0]
+        changed = self._data_version is not None and dv != self._data_version
+        self._data_version = dv
+        return changed
+
+    def _drop(self, key: tuple) -> None:
+        _, _, size = self._data.pop(key)
+        self._rows -= size
+
+    def _clear(self) -> None:
+        self._data.clear()
+        self._rows = 0
+        for t in self._versions:
+            self._versions[t] += 1
+
+    def get(self, key: tuple, tables: Tuple[str, ...], load):
+        with self._lock:
+            if self._external_change():
+                self._clear()
+            item = self._data.get(key)
+            if item is not None:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return item[1]
+            self.misses += 1
+            versions = [self._versions.get(t, 0) for t in tables]
+
+        value = load()  # fora do lock: leituras em paralelo
+        size = len(value) if isinstance(value, list) else 1
+
+        with self._lock:
+            if [self._versions.get(t, 0) for t in tables] != versions or size > self.max_rows:
+                return value  # alguém escreveu nessas tabelas enquanto líamos
+            if key in self._data:
+                self._drop(key)
+            self._data[key] = (tables, value, size)
+            self._rows += size
+            while self._rows > self.max_rows:
+                self._drop(next(iter(self._data)))
+                self.evictions += 1
+        return value
+
+    def invalidate(self, tables) -> None:
+        tables = set(tables)
+        with self._lock:
+            for t in tables:
+                self._versions[t] = self._versions.get(t, 0) + 1
+            for key in [k for k, (deps, _, _) in self._data.items() if tables.intersection(deps)]:
+                self._drop(key)
+            # a escrita foi nossa: não confundir com escrita externa
+            if self._watch is not None:
+                self._data_version = self._watch.execute("PRAGMA data_version;").fetchone()[0]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._clear()
+
+    def data_version(self) -> int:
+        # a conexão de vigia não escreve: o valor dela muda a cada commit de
+        # qualquer outra conexão (do pool ou de outro processo)
+        with self._lock:
+            if self._watch is None:
+                self._external_change()
+            return self._watch.execute("PRAGMA data_version;").fetchone()[0]
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "hits": self.hits, "misses": self.misses, "evictions": self.evictions,
+                "entries": len(self._data), "rows": self._rows, "max_rows": self.max_rows,
+            }
+
+    def close(self) -> None:
+        with self._lock:
+            if self._watch is not None:
+                self._watch.close()
+                self._watch = None
+                self._data_version = None
+
+_cache = _ReadCache(CACHE_MAX_ROWS)
+_local = threading.local()
+
+def _changed(*tables: str) -> None:
+    """Marca tabelas alteradas na transação atual; o cache é invalidado após o commit."""
+    pending = getattr(_local, "changed", None)
+    if pending is None:
+        pending = _local.changed = set()
+    pending.update(tables)
+
+def _chave(valor):
+    # filtros chegam como dict (não hashable): viram pares ordenados na chave do cache
+    return tuple(sorted(valor.items())) if isinstance(valor, dict) else valor
+
+def _cached(*tables: str):
+    """Memoiza uma função de leitura; `tables` são as tabelas das quais o resultado depende."""
+    def deco(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if getattr(_local, "con", None) is not None:
+                # dentro de uma transação aberta: lê direto, vendo as próprias
+                # escritas, e nada ainda não confirmado vai para o cache
+                return fn(*args, **kwargs)
+            key = (fn.__name__, tuple(map(_chave, args)), tuple(sorted((k, _chave(v)) for k, v in kwargs.items())))
+            value = _cache.get(key, tables, lambda: fn(*args, **kwargs))
+            # cópia rasa: quem chamou pode mexer na lista sem estragar o cache
+            return list(value) if isinstance(value, list) else value
+        wrapper.uncached = fn
+        return wrapper
+    return deco
+
+def _ate_hoje(fn):
+    """
+    Leituras com as_of=None ("hoje"): a data é resolvida antes do cache e entra
+    na chave, senão o resultado guardado ontem continuaria valendo hoje.
+    Vai por fora de @_cached.
+    """
+    assinatura = inspect.signature(fn)
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        chamada = assinatura.bind(*args, **kwargs)
+        chamada.apply_defaults()
+        chamada.arguments["as_of"] = _data_base(chamada.arguments["as_of"])
+        return fn(*chamada.args, **chamada.kwargs)
+    return wrapper
+
+def cache_stats() -> Dict[str, int]:
+    return _cache.stats()
+
+def clear_cache() -> None:
+    _cache.clear()
+
+def data_version() -> int:
+    """Muda a cada commit no banco, deste ou de outro processo (base para ETag)."""
+    return _cache.data_version()
+
+def close_connections() -> None:
+    """Fecha as conexões do pool (chamado automaticamente ao sair do processo)."""
+    _pool.close()
+    _cache.close()
+
+atexit.register(close_connections)
+
+@contextmanager
+def _conn():
+    externa = getattr(_local, "con", None)
+    if externa is not None:
+        # Já dentro de um _conn() nesta thread (ex.: grupo de escritas do view_async):
+        # usa a mesma conexão num SAVEPOINT. Um erro desfaz só este trecho; o commit
+        # e a invalidação do cache (tabelas somadas em _local.changed) ficam com o de fora.
+        externa.execute("SAVEPOINT aninhada")
+        try:
+            yield externa
+        except BaseException:
+            externa.execute("ROLLBACK TO aninhada")
+            externa.execute("RELEASE aninhada")
+            raise
+        externa.execute("RELEASE aninhada")
+        return
+
+    migrate()
+    con = _pool.acquire()
+    _local.con = con
+    _local.changed = set()
+    try:
         yield con
         con.commit()
+        if _local.changed:
+            _cache.invalidate(_local.changed)
+    except BaseException:
+        con.rollback()
+        raise
     finally:
-        con.close()
+        _local.con = None
+        _local.changed = set()
+        _pool.release(con)
+
+def _begin(con: sqlite3.Connection) -> None:
+    """BEGIN IMMEDIATE, a não ser que a conexão já esteja numa transação (_conn aninhado)."""
+    if not con.in_transaction:
+        con.execute("BEGIN IMMEDIATE")
 
 def _colunas_da_tabela(con: sqlite3.Connection, tabela: str) -> List[str]:
     cols = con.execute(f"PRAGMA table_info({tabela});").fetchall()
@@ -68,51 +512,450 @@ def _add_coluna_se_nao_existir(con: sqlite3.Connection, tabela: str, coluna: str
         sql = f"ALTER TABLE {tabela} ADD COLUMN {coluna} {ddl};"
         con.execute(sql)
 
-def _init_and_migrate():
-    # Garante tabelas base (caso rode esse arquivo sem ter criado as tabelas)
-    with _conn() as con:
-        con.execute("""
-            CREATE TABLE IF NOT EXISTS livros (
-                id INTEGER PRIMARY KEY,
-                titulo TEXT,
-                autor TEXT,
-                editora TEXT,
-                ano_publicacao INTEGER,
-                isbn TEXT
-            )
+def _aplicar_journal_mode(con: sqlite3.Connection):
+    # journal_mode=WAL é persistente no arquivo e não pode mudar dentro de transação,
+    # por isso roda fora do bloco de migração.
+    atual = con.execute("PRAGMA journal_mode;").fetchone()[0]
+    if atual.upper() != PERFIL["journal_mode"].upper():
+        con.execute(f"PRAGMA journal_mode = {PERFIL['journal_mode']};")
+
+# =========================
+# Migrações versionadas
+# =========================
+# Cada migração roda uma única vez, em ordem; a última aplicada fica gravada em
+# PRAGMA user_version. Banco já atualizado = uma leitura de PRAGMA e nada mais.
+# Nunca edite uma migração já publicada: acrescente uma nova no fim da lista.
+
+def _m001_tabelas_base(con: sqlite3.Connection):
+    # Esquema original (o mesmo que o antigo dados.py criava)
+    con.execute("""
+        CREATE TABLE IF NOT EXISTS livros (
+            id INTEGER PRIMARY KEY,
+            titulo TEXT,
+            autor TEXT,
+            editora TEXT,
+            ano_publicacao INTEGER,
+            isbn TEXT
+        )
+    """)
+    con.execute("""
+        CREATE TABLE IF NOT EXISTS usuarios (
+            id INTEGER PRIMARY KEY,
+            nome TEXT,
+            sobrenome TEXT,
+            endereco TEXT,
+            email TEXT,
+            telefone TEXT
+        )
+    """)
+    con.execute("""
+        CREATE TABLE IF NOT EXISTS emprestimos (
+            id INTEGER PRIMARY KEY,
+            id_livro INTEGER,
+            id_usuario INTEGER,
+            data_emprestimo TEXT,
+            data_devolucao TEXT,
+            FOREIGN KEY(id_livro) REFERENCES livros(id),
+            FOREIGN KEY(id_usuario) REFERENCES usuarios(id)
+        )
+    """)
+
+    # Colunas que o app usa. Bancos antigos (user_version=0) podem já ter algumas
+    # delas, então aqui ainda é preciso sondar; depois desta migração, nunca mais.
+    # livros: quantidade, disponivel
+    _add_coluna_se_nao_existir(con, "livros", "quantidade", "INTEGER DEFAULT 1")
+    _add_coluna_se_nao_existir(con, "livros", "disponivel", "INTEGER DEFAULT 1")
+
+    # emprestimos: data_prevista, status
+    _add_coluna_se_nao_existir(con, "emprestimos", "data_prevista", "TEXT")
+    _add_coluna_se_nao_existir(con, "emprestimos", "status", "TEXT DEFAULT 'open'")
+
+def _m002_indices(con: sqlite3.Connection):
+    # Índices dos caminhos quentes (o SQLite os mantém a cada INSERT/UPDATE/DELETE)
+    con.execute("CREATE INDEX IF NOT EXISTS idx_emprestimos_status ON emprestimos (status);")          # list_loans(open_only=True)
+    con.execute("CREATE INDEX IF NOT EXISTS idx_emprestimos_usuario ON emprestimos (id_usuario);")     # delete_user
+    con.execute("CREATE INDEX IF NOT EXISTS idx_emprestimos_livro ON emprestimos (id_livro);")         # delete_book
+    con.execute("CREATE INDEX IF NOT EXISTS idx_emprestimos_prevista ON emprestimos (data_prevista);") # atrasos
+    con.execute("CREATE INDEX IF NOT EXISTS idx_livros_isbn ON livros (isbn);")
+    con.execute("CREATE INDEX IF NOT EXISTS idx_usuarios_email ON usuarios (email);")
+
+def _criar_fts(con: sqlite3.Connection, tabela: str, colunas: List[str]):
+    # Índice FTS5 "external content": o texto fica só na tabela original e os
+    # gatilhos mantêm o índice em dia a cada INSERT/UPDATE/DELETE.
+    fts = f"{tabela}_fts"
+    cols = ", ".join(colunas)
+    new_cols = ", ".join(f"new.{c}" for c in colunas)
+    old_cols = ", ".join(f"old.{c}" for c in colunas)
+    con.execute(f"""
+        CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5(
+            {cols}, content='{tabela}', content_rowid='id',
+            tokenize='unicode61 remove_diacritics 2'
+        )
+    """)
+    con.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS {fts}_ai AFTER INSERT ON {tabela} BEGIN
+            INSERT INTO {fts}(rowid, {cols}) VALUES (new.id, {new_cols});
+        END
+    """)
+    con.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS {fts}_ad AFTER DELETE ON {tabela} BEGIN
+            INSERT INTO {fts}({fts}, rowid, {cols}) VALUES ('delete', old.id, {old_cols});
+        END
+    """)
+    con.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS {fts}_au AFTER UPDATE OF {cols} ON {tabela} BEGIN
+            INSERT INTO {fts}({fts}, rowid, {cols}) VALUES ('delete', old.id, {old_cols});
+            INSERT INTO {fts}(rowid, {cols}) VALUES (new.id, {new_cols});
+        END
+    """)
+    # indexa o que já existe
+    con.execute(f"INSERT INTO {fts}({fts}) VALUES ('rebuild')")
+
+def _m003_busca_textual(con: sqlite3.Connection):
+    _criar_fts(con, "livros", ["titulo", "autor", "editora", "isbn"])
+    _criar_fts(con, "usuarios", ["nome", "sobrenome", "email"])
+
+# Disponibilidade esperada de cada livro: quantidade - empréstimos abertos,
+# numa agregação só sobre emprestimos (usada pela m004 e por check_availability).
+_SQL_DISPONIBILIDADE = """
+    WITH abertos AS (
+        SELECT id_livro, COUNT(*) AS n
+          FROM emprestimos
+         WHERE status IS NULL OR status != 'closed'
+         GROUP BY id_livro
+    )
+    SELECT l.id, l.titulo, l.quantidade, l.disponivel,
+           COALESCE(l.quantidade, 0) - COALESCE(a.n, 0) AS esperado
+      FROM livros l
+      LEFT JOIN abertos a ON a.id_livro = l.id
+"""
+
+def _corrigir_disponibilidade(con: sqlite3.Connection) -> int:
+    cur = con.execute(f"""
+        UPDATE livros
+           SET disponivel = d.esperado
+          FROM ({_SQL_DISPONIBILIDADE}) AS d
+         WHERE d.id = livros.id AND livros.disponivel IS NOT d.esperado
+    """)
+    return cur.rowcount
+
+def _m004_disponibilidade_por_gatilho(con: sqlite3.Connection):
+    # livros.disponivel passa a ser mantido só por gatilhos: todo empréstimo
+    # aberto/fechado/apagado e toda mudança de quantidade ajusta o contador na
+    # mesma instrução, então o código do app não tem mais +1/-1 espalhados.
+    aberto_new = "(NEW.status IS NULL OR NEW.status != 'closed')"
+    aberto_old = "(OLD.status IS NULL OR OLD.status != 'closed')"
+    con.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS emprestimos_disp_ai AFTER INSERT ON emprestimos
+        WHEN {aberto_new} BEGIN
+            UPDATE livros SET disponivel = disponivel - 1 WHERE id = NEW.id_livro;
+        END
+    """)
+    con.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS emprestimos_disp_ad AFTER DELETE ON emprestimos
+        WHEN {aberto_old} BEGIN
+            UPDATE livros SET disponivel = disponivel + 1 WHERE id = OLD.id_livro;
+        END
+    """)
+    con.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS emprestimos_disp_au AFTER UPDATE OF status, id_livro ON emprestimos BEGIN
+            UPDATE livros SET disponivel = disponivel + 1 WHERE id = OLD.id_livro AND {aberto_old};
+            UPDATE livros SET disponivel = disponivel - 1 WHERE id = NEW.id_livro AND {aberto_new};
+        END
+    """)
+    con.execute("""
+        CREATE TRIGGER IF NOT EXISTS livros_disp_quantidade AFTER UPDATE OF quantidade ON livros
+        WHEN NEW.quantidade IS NOT OLD.quantidade BEGIN
+            UPDATE livros SET disponivel = disponivel + NEW.quantidade - OLD.quantidade WHERE id = NEW.id;
+        END
+    """)
+    # parte de um contador correto, qualquer que seja o desvio acumulado até aqui
+    _corrigir_disponibilidade(con)
+
+def _m005_indice_atrasos(con: sqlite3.Connection):
+    # Atrasados = status aberto + data_prevista numa faixa: um índice composto
+    # resolve os dois. Ele também serve a quem filtra só por status, então o
+    # índice só de status fica redundante. O só de data_prevista não: sem status
+    # na consulta o composto não entrega a ordem por data (m010 o recria).
+    con.execute("CREATE INDEX IF NOT EXISTS idx_emprestimos_status_prevista ON emprestimos (status, data_prevista);")
+    con.execute("DROP INDEX IF EXISTS idx_emprestimos_status;")
+    con.execute("DROP INDEX IF EXISTS idx_emprestimos_prevista;")
+
+def _m006_politicas(con: sqlite3.Connection):
+    # tipo do usuário e categoria do livro escolhem a política; renovacoes conta as renovações
+    con.execute("ALTER TABLE usuarios ADD COLUMN tipo TEXT NOT NULL DEFAULT 'padrao';")
+    con.execute("ALTER TABLE livros ADD COLUMN categoria TEXT NOT NULL DEFAULT 'geral';")
+    con.execute("ALTER TABLE emprestimos ADD COLUMN renovacoes INTEGER NOT NULL DEFAULT 0;")
+    con.execute("""
+        CREATE TABLE IF NOT EXISTS politicas (
+            tipo_usuario TEXT NOT NULL DEFAULT '*',
+            categoria TEXT NOT NULL DEFAULT '*',
+            dias INTEGER NOT NULL,
+            max_emprestimos INTEGER,            -- NULL = sem limite
+            max_renovacoes INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (tipo_usuario, categoria)
+        )
+    """)
+    # regra geral = comportamento de antes: 7 dias, sem limite de empréstimos; uma renovação
+    con.execute("INSERT OR IGNORE INTO politicas VALUES ('*', '*', 7, NULL, 1);")
+
+def _reconstruir_estatisticas(con: sqlite3.Connection):
+    # recalcula as tabelas de resumo a partir de emprestimos/livros, numa passada cada
+    for tabela in ("estat_livros", "estat_usuarios", "estat_dias", "estat_geral"):
+        con.execute(f"DELETE FROM {tabela}")
+    con.execute("""
+        INSERT INTO estat_livros (id_livro, emprestimos)
+        SELECT id_livro, COUNT(*) FROM emprestimos GROUP BY id_livro
+    """)
+    con.execute("""
+        INSERT INTO estat_usuarios (id_usuario, emprestimos)
+        SELECT id_usuario, COUNT(*) FROM emprestimos GROUP BY id_usuario
+    """)
+    con.execute("""
+        INSERT INTO estat_dias (dia, emprestimos, devolucoes)
+        SELECT dia, SUM(emp), SUM(dev) FROM (
+            SELECT data_emprestimo AS dia, 1 AS emp, 0 AS dev FROM emprestimos WHERE data_emprestimo IS NOT NULL
+            UNION ALL
+            SELECT data_devolucao, 0, 1 FROM emprestimos
+             WHERE status = 'closed' AND data_devolucao IS NOT NULL
+        ) GROUP BY dia
+    """)
+    con.execute("""
+        INSERT INTO estat_geral (id, exemplares, emprestados)
+        SELECT 1,
+               (SELECT COALESCE(SUM(quantidade), 0) FROM livros),
+               (SELECT COUNT(*) FROM emprestimos WHERE status IS NULL OR status != 'closed')
+    """)
+
+def _m007_estatisticas(con: sqlite3.Connection):
+    # Tabelas de resumo do painel, mantidas por gatilhos a cada empréstimo,
+    # devolução e mudança de acervo: abrir o painel lê poucas linhas prontas
+    # em vez de agregar o histórico inteiro de emprestimos.
+    con.execute("CREATE TABLE IF NOT EXISTS estat_livros (id_livro INTEGER PRIMARY KEY, emprestimos INTEGER NOT NULL DEFAULT 0)")
+    con.execute("CREATE TABLE IF NOT EXISTS estat_usuarios (id_usuario INTEGER PRIMARY KEY, emprestimos INTEGER NOT NULL DEFAULT 0)")
+    con.execute("""
+        CREATE TABLE IF NOT EXISTS estat_dias (
+            dia TEXT PRIMARY KEY,
+            emprestimos INTEGER NOT NULL DEFAULT 0,
+            devolucoes INTEGER NOT NULL DEFAULT 0
+        ) WITHOUT ROWID
+    """)
+    con.execute("""
+        CREATE TABLE IF NOT EXISTS estat_geral (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            exemplares INTEGER NOT NULL DEFAULT 0,
+            emprestados INTEGER NOT NULL DEFAULT 0
+        )
+    """)
+    con.execute("CREATE INDEX IF NOT EXISTS idx_estat_livros_emprestimos ON estat_livros (emprestimos);")
+    con.execute("CREATE INDEX IF NOT EXISTS idx_estat_usuarios_emprestimos ON estat_usuarios (emprestimos);")
+
+    aberto_new = "(NEW.status IS NULL OR NEW.status != 'closed')"
+    aberto_old = "(OLD.status IS NULL OR OLD.status != 'closed')"
+    con.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS emprestimos_estat_ai AFTER INSERT ON emprestimos BEGIN
+            INSERT INTO estat_livros (id_livro, emprestimos) VALUES (NEW.id_livro, 1)
+                ON CONFLICT (id_livro) DO UPDATE SET emprestimos = emprestimos + 1;
+            INSERT INTO estat_usuarios (id_usuario, emprestimos) VALUES (NEW.id_usuario, 1)
+                ON CONFLICT (id_usuario) DO UPDATE SET emprestimos = emprestimos + 1;
+            INSERT INTO estat_dias (dia, emprestimos) VALUES (NEW.data_emprestimo, 1)
+                ON CONFLICT (dia) DO UPDATE SET emprestimos = emprestimos + 1;
+            UPDATE estat_geral SET emprestados = emprestados + 1 WHERE {aberto_new};
+        END
+    """)
+    con.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS emprestimos_estat_au AFTER UPDATE OF status ON emprestimos BEGIN
+            UPDATE estat_geral SET emprestados = emprestados + {aberto_new} - {aberto_old};
+            INSERT INTO estat_dias (dia, devolucoes)
+                SELECT NEW.data_devolucao, 1 WHERE {aberto_old} AND NEW.status = 'closed' AND NEW.data_devolucao IS NOT NULL
+                ON CONFLICT (dia) DO UPDATE SET devolucoes = devolucoes + 1;
+        END
+    """)
+    con.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS emprestimos_estat_ad AFTER DELETE ON emprestimos BEGIN
+            UPDATE estat_livros SET emprestimos = emprestimos - 1 WHERE id_livro = OLD.id_livro;
+            UPDATE estat_usuarios SET emprestimos = emprestimos - 1 WHERE id_usuario = OLD.id_usuario;
+            UPDATE estat_dias SET emprestimos = emprestimos - 1 WHERE dia = OLD.data_emprestimo;
+            UPDATE estat_dias SET devolucoes = devolucoes - 1
+             WHERE dia = OLD.data_devolucao AND OLD.status = 'closed';
+            UPDATE estat_geral SET emprestados = emprestados - 1 WHERE {aberto_old};
+        END
+    """)
+    con.execute("""
+        CREATE TRIGGER IF NOT EXISTS livros_estat_ai AFTER INSERT ON livros BEGIN
+            UPDATE estat_geral SET exemplares = exemplares + COALESCE(NEW.quantidade, 0);
+        END
+    """)
+    con.execute("""
+        CREATE TRIGGER IF NOT EXISTS livros_estat_ad AFTER DELETE ON livros BEGIN
+            UPDATE estat_geral SET exemplares = exemplares - COALESCE(OLD.quantidade, 0);
+            DELETE FROM estat_livros WHERE id_livro = OLD.id;
+        END
+    """)
+    con.execute("""
+        CREATE TRIGGER IF NOT EXISTS livros_estat_au AFTER UPDATE OF quantidade ON livros BEGIN
+            UPDATE estat_geral SET exemplares = exemplares + COALESCE(NEW.quantidade, 0) - COALESCE(OLD.quantidade, 0);
+        END
+    """)
+    con.execute("""
+        CREATE TRIGGER IF NOT EXISTS usuarios_estat_ad AFTER DELETE ON usuarios BEGIN
+            DELETE FROM estat_usuarios WHERE id_usuario = OLD.id;
+        END
+    """)
+    _reconstruir_estatisticas(con)
+
+def _m008_indices_ordenacao(con: sqlite3.Connection):
+    # Colunas que as listas ordenam/filtram (ver _LISTA_*). Texto em COLLATE NOCASE:
+    # serve ao ORDER BY ... COLLATE NOCASE e ao LIKE 'prefixo%' (que ignora maiúsculas).
+    # isbn e email já têm índice (m002) e filtram por prefixo exato.
+    con.execute("CREATE INDEX IF NOT EXISTS idx_livros_titulo ON livros (titulo COLLATE NOCASE);")
+    con.execute("CREATE INDEX IF NOT EXISTS idx_livros_autor ON livros (autor COLLATE NOCASE);")
+    con.execute("CREATE INDEX IF NOT EXISTS idx_livros_editora ON livros (editora COLLATE NOCASE);")
+    con.execute("CREATE INDEX IF NOT EXISTS idx_livros_ano ON livros (ano_publicacao);")
+    con.execute("CREATE INDEX IF NOT EXISTS idx_usuarios_nome ON usuarios (nome COLLATE NOCASE);")
+    con.execute("CREATE INDEX IF NOT EXISTS idx_usuarios_sobrenome ON usuarios (sobrenome COLLATE NOCASE);")
+    con.execute("CREATE INDEX IF NOT EXISTS idx_emprestimos_data ON emprestimos (data_emprestimo);")
+
+# instante UTC com milissegundos; texto ISO, então comparar texto = comparar instantes
+_AGORA = "strftime('%Y-%m-%d %H:%M:%f', 'now')"
+_VERSIONADAS = ("usuarios", "livros", "emprestimos")
+
+def _m009_versoes(con: sqlite3.Connection):
+    # criado_em/atualizado_em e versao em cada linha. versao vem de um contador por
+    # tabela (versoes), incrementado a cada insert/update: ordena as mudanças sem
+    # depender do relógio. Exclusões deixam uma lápide em removidos.
+    # ALTER TABLE não aceita default não constante: os gatilhos carimbam a linha.
+    con.execute("""
+        CREATE TABLE IF NOT EXISTS versoes (
+            tabela TEXT PRIMARY KEY,
+            atual INTEGER NOT NULL DEFAULT 0
+        ) WITHOUT ROWID;
+    """)
+    con.execute("""
+        CREATE TABLE IF NOT EXISTS removidos (
+            tabela TEXT NOT NULL,
+            versao INTEGER NOT NULL,
+            id INTEGER NOT NULL,
+            removido_em TEXT NOT NULL,
+            PRIMARY KEY (tabela, versao)
+        ) WITHOUT ROWID;
+    """)
+    for tabela in _VERSIONADAS:
+        for coluna in ("criado_em TEXT", "atualizado_em TEXT", "versao INTEGER"):
+            con.execute(f"ALTER TABLE {tabela} ADD COLUMN {coluna};")
+        # linhas de antes ficam na versão 1 (changes_since(..., 0) traz todas) e
+        # carimbadas com o instante da migração, senão changes_since por instante
+        # nunca as veria; a criação só é conhecida no empréstimo
+        criado = "data_emprestimo" if tabela == "emprestimos" else _AGORA
+        con.execute(f"UPDATE {tabela} SET versao = 1, criado_em = {criado}, atualizado_em = {_AGORA};")
+        con.execute("INSERT OR REPLACE INTO versoes (tabela, atual) VALUES (?, 1);", (tabela,))
+        con.execute(f"CREATE INDEX IF NOT EXISTS idx_{tabela}_versao ON {tabela} (versao);")
+        con.execute(f"CREATE INDEX IF NOT EXISTS idx_{tabela}_atualizado ON {tabela} (atualizado_em);")
+
+        conta = f"UPDATE versoes SET atual = atual + 1 WHERE tabela = '{tabela}';"
+        versao = f"(SELECT atual FROM versoes WHERE tabela = '{tabela}')"
+        con.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS {tabela}_versao_ai AFTER INSERT ON {tabela} BEGIN
+                {conta}
+                UPDATE {tabela} SET criado_em = COALESCE(NEW.criado_em, {_AGORA}), atualizado_em = {_AGORA},
+                                    versao = {versao}
+                 WHERE id = NEW.id;
+            END
         """)
-        con.execute("""
-            CREATE TABLE IF NOT EXISTS usuarios (
-                id INTEGER PRIMARY KEY,
-                nome TEXT,
-                sobrenome TEXT,
-                endereco TEXT,
-                email TEXT,
-                telefone TEXT
-            )
+        # o próprio carimbo muda versao: o WHEN impede que ele conte como outra mudança
+        con.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS {tabela}_versao_au AFTER UPDATE ON {tabela}
+            WHEN NEW.versao IS OLD.versao BEGIN
+                {conta}
+                UPDATE {tabela} SET atualizado_em = {_AGORA}, versao = {versao} WHERE id = NEW.id;
+            END
         """)
-        con.execute("""
-            CREATE TABLE IF NOT EXISTS emprestimos (
-                id INTEGER PRIMARY KEY,
-                id_livro INTEGER,
-                id_usuario INTEGER,
-                data_emprestimo TEXT,
-                data_devolucao TEXT,
-                FOREIGN KEY(id_livro) REFERENCES livros(id),
-                FOREIGN KEY(id_usuario) REFERENCES usuarios(id)
-            )
+        con.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS {tabela}_versao_ad AFTER DELETE ON {tabela} BEGIN
+                {conta}
+                INSERT INTO removidos (tabela, versao, id, removido_em) VALUES ('{tabela}', {versao}, OLD.id, {_AGORA});
+            END
         """)
 
-        # Migrações necessárias pro app
-        # livros: quantidade, disponivel
-        _add_coluna_se_nao_existir(con, "livros", "quantidade", "INTEGER DEFAULT 1")
-        _add_coluna_se_nao_existir(con, "livros", "disponivel", "INTEGER DEFAULT 1")
+def _m010_indice_prevista(con: sqlite3.Connection):
+    # A m005 removeu o índice de data_prevista pensando só nos atrasados (status='open').
+    # A lista de todos os empréstimos ordena por data_prevista sem filtrar status:
+    # sem este índice cada página vira SCAN + B-TREE temporária da tabela inteira.
+    con.execute("CREATE INDEX IF NOT EXISTS idx_emprestimos_prevista ON emprestimos (data_prevista, id);")
 
-        # emprestimos: data_prevista, status
-        _add_coluna_se_nao_existir(con, "emprestimos", "data_prevista", "TEXT")
-        _add_coluna_se_nao_existir(con, "emprestimos", "status", "TEXT DEFAULT 'open'")
+def _m011_versoes_dependentes(con: sqlite3.Connection):
+    # A linha de empréstimo mostra o nome do usuário e o título do livro (JOIN):
+    # renomear um deles muda essas linhas, então elas ganham uma versão nova.
+    # Carimbar versao direto não reaciona emprestimos_versao_au (o WHEN dele).
+    # podado/podado_em marcam até onde as lápides já foram apagadas (prune_changes).
+    conta = "UPDATE versoes SET atual = atual + 1 WHERE tabela = 'emprestimos';"
+    versao = "(SELECT atual FROM versoes WHERE tabela = 'emprestimos')"
+    for tabela, colunas, fk in (("usuarios", ("nome", "sobrenome"), "id_usuario"), ("livros", ("titulo",), "id_livro")):
+        mudou = " OR ".join(f"NEW.{c} IS NOT OLD.{c}" for c in colunas)
+        con.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS {tabela}_versao_emprestimos AFTER UPDATE OF {", ".join(colunas)} ON {tabela}
+            WHEN {mudou} BEGIN
+                {conta}
+                UPDATE emprestimos SET atualizado_em = {_AGORA}, versao = {versao} WHERE {fk} = NEW.id;
+            END
+        """)
+    con.execute("ALTER TABLE versoes ADD COLUMN podado INTEGER NOT NULL DEFAULT 0;")
+    con.execute("ALTER TABLE versoes ADD COLUMN podado_em TEXT;")
 
-_init_and_migrate()
+_MIGRACOES = [
+    _m001_tabelas_base,
+    _m002_indices,
+    _m003_busca_textual,
+    _m004_disponibilidade_por_gatilho,
+    _m005_indice_atrasos,
+    _m006_politicas,
+    _m007_estatisticas,
+    _m008_indices_ordenacao,
+    _m009_versoes,
+    _m010_indice_prevista,
+    _m011_versoes_dependentes,
+]
+SCHEMA_VERSION = len(_MIGRACOES)
+
+def schema_version() -> int:
+    with _conn() as con:
+        return con.execute("PRAGMA user_version;").fetchone()[0]
+
+def _init_and_migrate():
+    # conexão direta do pool, não _conn(): isto roda de dentro do primeiro _conn()
+    con = _pool.acquire()
+    try:
+        _aplicar_journal_mode(con)
+        if con.execute("PRAGMA user_version;").fetchone()[0] >= SCHEMA_VERSION:
+            return
+        # Uma transação só: ou todas as migrações pendentes entram, ou nenhuma.
+        # IMMEDIATE pega o lock de escrita já, então dois processos abrindo ao
+        # mesmo tempo não migram em dobro: o segundo espera e relê a versão.
+        con.execute("BEGIN IMMEDIATE;")
+        versao = con.execute("PRAGMA user_version;").fetchone()[0]
+        for migracao in _MIGRACOES[versao:]:
+            migracao(con)
+        con.execute(f"PRAGMA user_version = {SCHEMA_VERSION};")
+        con.commit()
+    finally:
+        _pool.release(con)  # desfaz a transação se alguma migração falhou
+
+_esquema_pronto = False
+_esquema_lock = threading.Lock()
+
+def migrate() -> None:
+    """
+    Aplica as migrações pendentes, uma vez por processo. Não roda na importação
+    do módulo: o primeiro acesso ao banco chama esta função (a interface abre
+    a janela antes e o disco só é tocado na thread de trabalho).
+    """
+    global _esquema_pronto
+    if _esquema_pronto:
+        return
+    with _esquema_lock:
+        if not _esquema_pronto:
+            _init_and_migrate()
+            _esquema_pronto = True
 
 # =========================
 # Helpers
@@ -120,47 +963,254 @@ _init_and_migrate()
 def _today_str() -> str:
     return date.today().isoformat()
 
-def _expected_from(loan_date: str, days: int = 7) -> str:
-    try:
-        d = datetime.strptime(loan_date, "%Y-%m-%d").date()
-    except Exception:
-        d = date.today()
-    return (d + timedelta(days=days)).isoformat()
+def _data_base(as_of) -> date:
+    """as_of em texto ISO ou date; None = hoje."""
+    return date.fromisoformat(as_of) if isinstance(as_of, str) else (as_of or date.today())
+
+# =========================
+# Tipos das linhas devolvidas
+# =========================
+# namedtuples (sem __dict__): continuam sendo tuplas na ordem documentada, então
+# índice, fatia, desempacotamento, pickle e JSON seguem iguais; ganham acesso
+# por nome. O SELECT já traz as colunas nessa ordem e a row_factory do cursor
+# monta o registro direto da tupla lida pelo sqlite3, sem sqlite3.Row nem cópia.
+User = namedtuple("User", "id first_name last_name address email phone created_at updated_at")
+Book = namedtuple("Book", "id title author publisher year isbn quantity available created_at updated_at")
+Loan = namedtuple("Loan", "id user_id user_name book_id book_title loan_date expected_date return_date status")
+
+def _fabrica(tipo):
+    novo = tuple.__new__
+    return lambda _cursor, linha: novo(tipo, linha)
+
+_FABRICAS = {tipo: _fabrica(tipo) for tipo in (User, Book, Loan)}
+
+def _cursor(con: sqlite3.Connection, tipo) -> sqlite3.Cursor:
+    """Cursor cujas linhas saem como `tipo` (User, Book ou Loan)."""
+    cur = con.cursor()
+    cur.row_factory = _FABRICAS[tipo]
+    return cur
+
+# =========================
+# Ordenação e filtros das listas paginadas
+# =========================
+# Só as colunas destas listas brancas entram em ORDER BY/WHERE (nunca texto do usuário).
+# coluna pública -> (expressão SQL, tipo, ordenável); tipos de filtro:
+#   "texto":   prefixo sem distinguir maiúsculas (LIKE 'x%', índice COLLATE NOCASE)
+#   "nome":    como "texto", sobre "nome sobrenome" (como a lista mostra) ou só o sobrenome;
+#              a expressão é o par (nome, sobrenome) e não usa índice
+#   "prefixo": prefixo exato ('2025-03' = março de 2025; ISBN, e-mail)
+#   "numero":  igualdade com inteiro
+#   "exato":   igualdade com o texto
+# LIKE e NOCASE do SQLite só igualam maiúsculas ASCII: acentos não são dobrados
+# ('jose' não acha 'José', 'é' não acha 'É'); a caixa Buscar (FTS5) ignora acentos.
+class _Lista:
+    def __init__(self, origem: str, id_col: str, tipo, colunas: Dict[str, Tuple[Any, str, bool]]):
+        self.origem = origem      # FROM para ler a chave de ordenação de uma linha
+        self.id_col = id_col
+        self.tipo = tipo          # tipo das linhas da página
+        self.colunas = colunas
+
+_LISTA_USUARIOS = _Lista("usuarios", "id", User, {
+    "id": ("id", "numero", True),
+    "first_name": ("nome", "texto", True),
+    "last_name": ("sobrenome", "texto", True),
+    "email": ("email", "prefixo", True),
+})
+_LISTA_LIVROS = _Lista("livros", "id", Book, {
+    "id": ("id", "numero", True),
+    "title": ("titulo", "texto", True),
+    "author": ("autor", "texto", True),
+    "publisher": ("editora", "texto", True),
+    "year": ("ano_publicacao", "numero", True),
+    "isbn": ("isbn", "prefixo", True),
+})
+_LISTA_EMPRESTIMOS = _Lista("emprestimos e", "e.id", Loan, {
+    "id": ("e.id", "numero", True),
+    "user_id": ("e.id_usuario", "numero", False),
+    "user_name": (("u.nome", "u.sobrenome"), "nome", False),
+    "book_id": ("e.id_livro", "numero", False),
+    "book_title": ("l.titulo", "texto", False),
+    "loan_date": ("e.data_emprestimo", "prefixo", True),
+    "expected_date": ("e.data_prevista", "prefixo", True),
+    "status": ("e.status", "exato", False),
+})
+
+def _escapar_like(valor: str) -> str:
+    return valor.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+def _filtros(lista: _Lista, filters) -> Tuple[List[str], List[Any]]:
+    """filters: dict ou pares (coluna, valor); valores vazios são ignorados."""
+    conds: List[str] = []
+    params: List[Any] = []
+    itens = filters.items() if isinstance(filters, dict) else (filters or ())
+    for nome, valor in itens:
+        valor = "" if valor is None else str(valor).strip()
+        if not valor:
+            continue
+        if nome not in lista.colunas:
+            raise ValueError(f"Coluna inválida para filtro: {nome}")
+        col, tipo, _ = lista.colunas[nome]
+        if tipo == "numero":
+            try:
+                params.append(int(valor))
+            except ValueError:
+                raise ValueError(f"Filtro inválido para {nome}: {valor}") from None
+            conds.append(f"{col} = ?")
+        elif tipo == "texto":
+            conds.append(f"{col} LIKE ? ESCAPE '\\'")
+            params.append(_escapar_like(valor) + "%")
+        elif tipo == "nome":
+            nome_col, sobrenome_col = col
+            conds.append(f"({nome_col} || ' ' || {sobrenome_col} LIKE ? ESCAPE '\\'"
+                         f" OR {sobrenome_col} LIKE ? ESCAPE '\\')")
+            params += [_escapar_like(valor) + "%"] * 2
+        elif tipo == "prefixo":
+            # faixa [valor, valor + maior caractere): usa o índice comum da coluna
+            conds.append(f"{col} >= ? AND {col} < ?")
+            params += [valor, valor + "\U0010ffff"]
+        else:
+            conds.append(f"{col} = ?")
+            params.append(valor)
+    return conds, params
+
+def _pagina(con: sqlite3.Connection, lista: _Lista, consulta, conds: List[str], params: List[Any],
+            after_id: Optional[int], limit: int, offset: int, sort: str, desc: bool) -> List[tuple]:
+    """
+    Uma página ordenada por (sort, id). consulta(where, order) -> SQL sem LIMIT.
+
+    Com after_id, segue por chave composta a partir daquela linha:
+    sort <= v AND (sort < v OR id < after_id) (invertido em ordem crescente), que o
+    SQLite resolve como faixa no índice da coluna. Linhas com sort NULL ficam no fim
+    em ordem decrescente e no começo em ordem crescente, e são lidas à parte.
+    """
+    if sort not in lista.colunas or not lista.colunas[sort][2]:
+        raise ValueError(f"Coluna inválida para ordenação: {sort}")
+    col, tipo, _ = lista.colunas[sort]
+    expr = f"{col} COLLATE NOCASE" if tipo == "texto" else col
+    idc = lista.id_col
+    direcao, comp = ("DESC", "<") if desc else ("ASC", ">")
+    order = f"{expr} {direcao}" if col == idc else f"{expr} {direcao}, {idc} {direcao}"
+
+    def ler(extra: List[str], extra_params: List[Any], n: int, pular: int = 0) -> List[tuple]:
+        todas = conds + extra
+        where = ("WHERE " + " AND ".join(todas)) if todas else ""
+        sql = consulta(where, order) + " LIMIT ? OFFSET ?"
+        return _cursor(con, lista.tipo).execute(sql, params + extra_params + [n, pular]).fetchall()
+
+    if after_id is None:
+        return ler([], [], limit, offset)
+    if col == idc:
+        return ler([f"{idc} {comp} ?"], [after_id], limit)
+
+    ancora = con.execute(f"SELECT {col} FROM {lista.origem} WHERE {idc} = ?", (after_id,)).fetchone()
+    if ancora is None:
+        return []  # a linha sumiu: quem pediu relê a lista
+    v = ancora[0]
+    if v is None:
+        rows = ler([f"{col} IS NULL", f"{idc} {comp} ?"], [after_id], limit)
+        if not desc and len(rows) < limit:
+            rows += ler([f"{col} IS NOT NULL"], [], limit - len(rows))
+        return rows
+    rows = ler([f"{expr} {comp}= ?", f"({expr} {comp} ? OR {idc} {comp} ?)"], [v, v, after_id], limit)
+    if desc and len(rows) < limit:
+        rows += ler([f"{col} IS NULL"], [], limit - len(rows))
+    return rows
+
+def _contar(con: sqlite3.Connection, origem: str, conds: List[str], params: List[Any]) -> int:
+    where = ("WHERE " + " AND ".join(conds)) if conds else ""
+    return con.execute(f"SELECT COUNT(*) FROM {origem} {where}", params).fetchone()[0]
+
+# =========================
+# SQL compartilhado (também usado por check_query_plans)
+# =========================
+_SQL_ABERTO_POR_USUARIO = (
+    "SELECT 1 FROM emprestimos WHERE id_usuario=? AND (status IS NULL OR status!='closed') LIMIT 1"
+)
+_SQL_ABERTO_POR_LIVRO = (
+    "SELECT 1 FROM emprestimos WHERE id_livro=? AND (status IS NULL OR status!='closed') LIMIT 1"
+)
+
+def _sql_list_loans(where: str = "", order: str = "DESC", order_by: Optional[str] = None) -> str:
+    return f"""
+            SELECT
+                e.id                               AS id,
+                u.id                               AS user_id,
+                (u.nome || ' ' || u.sobrenome)     AS user_name,
+                l.id                               AS book_id,
+                l.titulo                           AS book_title,
+                e.data_emprestimo                  AS loan_date,
+                e.data_prevista                    AS expected_date,
+                e.data_devolucao                   AS return_date,
+                e.status                           AS status
+            FROM emprestimos e
+            JOIN usuarios u ON u.id = e.id_usuario
+            JOIN livros    l ON l.id = e.id_livro
+            {where}
+            ORDER BY {order_by or "e.id " + order}
+        """
 
 # =========================
 # USUÁRIOS
 # =========================
-def insert_user(first_name: str, last_name: str, address: str, email: str, phone: str) -> None:
+def insert_user(first_name: str, last_name: str, address: str, email: str, phone: str) -> User:
     with _conn() as con:
-        con.execute("""
+        cur = con.execute("""
             INSERT INTO usuarios (nome, sobrenome, endereco, email, telefone)
             VALUES (?, ?, ?, ?, ?)
         """, (first_name, last_name, address, email, phone))
+        _changed("usuarios")
+        return _get_user(con, cur.lastrowid)
 
-def list_users() -> List[tuple]:
+_SQL_LIST_USERS = """
+    SELECT id, nome, sobrenome, endereco, email, telefone, criado_em AS created_at, atualizado_em AS updated_at
+    FROM usuarios
+    {where}
+    ORDER BY {order}
+    {limit}
+"""
+
+@_cached("usuarios")
+def list_users() -> List[User]:
     with _conn() as con:
-        rows = con.execute("""
-            SELECT id, nome, sobrenome, endereco, email, telefone
-            FROM usuarios
-            ORDER BY id DESC
-        """).fetchall()
-        # Tuplas na ordem esperada pelo app:
-        # (id, first_name, last_name, address, email, phone, created_at)
-        return [(r["id"], r["nome"], r["sobrenome"], r["endereco"], r["email"], r["telefone"], None) for r in rows]
+        return _cursor(con, User).execute(_SQL_LIST_USERS.format(where="", order="id DESC", limit="")).fetchall()
+
+@_cached("usuarios")
+def list_users_page(after_id: Optional[int] = None, limit: int = PAGE_SIZE, offset: int = 0,
+                    sort: str = "id", desc: bool = True, filters=None) -> List[User]:
+    # Paginação por chave: a próxima página começa depois da linha after_id na ordem pedida.
+    conds, params = _filtros(_LISTA_USUARIOS, filters)
+    consulta = lambda where, order: _SQL_LIST_USERS.format(where=where, order=order, limit="")
+    with _conn() as con:
+        return _pagina(con, _LISTA_USUARIOS, consulta, conds, params, after_id, limit, offset, sort, desc)
+
+@_cached("usuarios")
+def count_users(filters=None) -> int:
+    conds, params = _filtros(_LISTA_USUARIOS, filters)
+    with _conn() as con:
+        return _contar(con, "usuarios", conds, params)
+
+def _get_user(con: sqlite3.Connection, user_id: int) -> Optional[User]:
+    return _cursor(con, User).execute(_SQL_LIST_USERS.format(where="WHERE id=?", order="id", limit=""), (user_id,)).fetchone()
+
+def get_user(user_id: int) -> Optional[User]:
+    with _conn() as con:
+        return _get_user(con, user_id)
 
-def update_user(user_id: int, first_name: str, last_name: str, address: str, email: str, phone: str) -> None:
+def update_user(user_id: int, first_name: str, last_name: str, address: str, email: str, phone: str) -> Optional[User]:
     with _conn() as con:
         con.execute("""
             UPDATE usuarios
                SET nome=?, sobrenome=?, endereco=?, email=?, telefone=?
              WHERE id=?
         """, (first_name, last_name, address, email, phone, user_id))
+        _changed("usuarios")
+        return _get_user(con, user_id)
 
 def delete_user(user_id: int) -> None:
     with _conn() as con:
         # se houver empréstimo em aberto, bloqueia
         aberto = con.execute(
-            "SELECT 1 FROM emprestimos WHERE id_usuario=? AND (status IS NULL OR status!='closed') LIMIT 1",
+            _SQL_ABERTO_POR_USUARIO,
             (user_id,)
         ).fetchone()
         if aberto:
@@ -169,52 +1219,84 @@ def delete_user(user_id: int) -> None:
         # apaga histórico (fechados) e depois o usuário
         con.execute("DELETE FROM emprestimos WHERE id_usuario=?", (user_id,))
         con.execute("DELETE FROM usuarios WHERE id=?", (user_id,))
+        _changed("usuarios", "emprestimos")
 
 # =========================
 # LIVROS
 # =========================
-def insert_book(title: str, author: str, publisher: str, year: int, isbn: str, quantity: int) -> None:
+def insert_book(title: str, author: str, publisher: str, year: int, isbn: str, quantity: int) -> Book:
     qtd = int(quantity)
     with _conn() as con:
-        con.execute("""
+        cur = con.execute("""
             INSERT INTO livros (titulo, autor, editora, ano_publicacao, isbn, quantidade, disponivel)
             VALUES (?, ?, ?, ?, ?, ?, ?)
         """, (title, author, publisher, int(year), isbn, qtd, qtd))
+        _changed("livros")
+        return _get_book(con, cur.lastrowid)
 
-def list_books() -> List[tuple]:
+_SQL_LIST_BOOKS = """
+    SELECT id, titulo, autor, editora, ano_publicacao, isbn, quantidade, disponivel,
+           criado_em AS created_at, atualizado_em AS updated_at
+    FROM livros
+    {where}
+    ORDER BY {order}
+    {limit}
+"""
+
+@_cached("livros")
+def list_books() -> List[Book]:
     with _conn() as con:
-        rows = con.execute("""
-            SELECT id, titulo, autor, editora, ano_publicacao, isbn, quantidade, disponivel
-            FROM livros
-            ORDER BY id DESC
-        """).fetchall()
-        # Tuplas na ordem esperada:
-        # (id, title, author, publisher, year, isbn, quantity, available, created_at)
-        return [(r["id"], r["titulo"], r["autor"], r["editora"], r["ano_publicacao"], r["isbn"], r["quantidade"], r["disponivel"], None)
-                for r in rows]
+        return _cursor(con, Book).execute(_SQL_LIST_BOOKS.format(where="", order="id DESC", limit="")).fetchall()
 
-def update_book(book_id: int, title: str, author: str, publisher: str, year: int, isbn: str, quantity: int) -> None:
+@_cached("livros")
+def list_books_page(after_id: Optional[int] = None, limit: int = PAGE_SIZE, offset: int = 0,
+                    sort: str = "id", desc: bool = True, filters=None) -> List[Book]:
+    conds, params = _filtros(_LISTA_LIVROS, filters)
+    consulta = lambda where, order: _SQL_LIST_BOOKS.format(where=where, order=order, limit="")
     with _conn() as con:
-        cur = con.execute("SELECT quantidade, disponivel FROM livros WHERE id=?", (book_id,))
-        row = cur.fetchone()
-        if row is None:
-            return
-        old_qtd, old_avail = int(row["quantidade"]), int(row["disponivel"])
-        new_qtd = int(quantity)
-        delta = new_qtd - old_qtd
-        new_avail = max(0, old_avail + delta)  # tenta manter consistência
-        con.execute("""
+        return _pagina(con, _LISTA_LIVROS, consulta, conds, params, after_id, limit, offset, sort, desc)
+
+@_cached("livros")
+def count_books(filters=None) -> int:
+    conds, params = _filtros(_LISTA_LIVROS, filters)
+    with _conn() as con:
+        return _contar(con, "livros", conds, params)
+
+def _get_book(con: sqlite3.Connection, book_id: int) -> Optional[Book]:
+    return _cursor(con, Book).execute(_SQL_LIST_BOOKS.format(where="WHERE id=?", order="id", limit=""), (book_id,)).fetchone()
+
+def get_book(book_id: int) -> Optional[Book]:
+    with _conn() as con:
+        return _get_book(con, book_id)
+
+def update_book(book_id: int, title: str, author: str, publisher: str, year: int, isbn: str, quantity: int) -> Optional[Book]:
+    with _conn() as con:
+        # disponivel acompanha a quantidade pelo gatilho livros_disp_quantidade;
+        # só não dá para ter menos exemplares do que os emprestados agora.
+        # Lock de escrita antes da contagem: um empréstimo de outro balcão não
+        # entra entre ela e o UPDATE (disponivel ficaria negativo)
+        _begin(con)
+        abertos = con.execute(
+            "SELECT COUNT(*) FROM emprestimos WHERE id_livro=? AND (status IS NULL OR status!='closed')",
+            (book_id,)
+        ).fetchone()[0]
+        if int(quantity) < abertos:
+            raise ValueError(f"Quantidade menor que o número de exemplares emprestados ({abertos})")
+        cur = con.execute("""
             UPDATE livros
-               SET titulo=?, autor=?, editora=?, ano_publicacao=?, isbn=?, quantidade=?, disponivel=?
+               SET titulo=?, autor=?, editora=?, ano_publicacao=?, isbn=?, quantidade=?
              WHERE id=?
-        """, (title, author, publisher, int(year), isbn, new_qtd, new_avail, book_id))
-
+        """, (title, author, publisher, int(year), isbn, int(quantity), book_id))
+        if cur.rowcount == 0:
+            return None
+        _changed("livros")
+        return _get_book(con, book_id)
 
 def delete_book(book_id: int) -> None:
     with _conn() as con:
         # se houver empréstimo em aberto, bloqueia
         aberto = con.execute(
-            "SELECT 1 FROM emprestimos WHERE id_livro=? AND (status IS NULL OR status!='closed') LIMIT 1",
+            _SQL_ABERTO_POR_LIVRO,
             (book_id,)
         ).fetchone()
         if aberto:
@@ -223,88 +1305,718 @@ def delete_book(book_id: int) -> None:
         # apaga histórico (fechados) e depois o livro
         con.execute("DELETE FROM emprestimos WHERE id_livro=?", (book_id,))
         con.execute("DELETE FROM livros WHERE id=?", (book_id,))
+        _changed("livros", "emprestimos")
+
+# =========================
+# POLÍTICAS DE EMPRÉSTIMO
+# =========================
+# politicas(tipo_usuario, categoria) -> prazo, limite de empréstimos abertos e
+# de renovações; '*' vale para qualquer tipo/categoria. A tabela inteira é lida
+# uma vez para um dict (e relida só quando muda, pelo cache de leitura).
+POLITICA_PADRAO = (7, None, 0)  # (dias, max_emprestimos, max_renovacoes) se nem ('*', '*') existir
+
+@_cached("politicas")
+def _policies() -> Dict[Tuple[str, str], Tuple[int, Optional[int], int]]:
+    with _conn() as con:
+        rows = con.execute(
+            "SELECT tipo_usuario, categoria, dias, max_emprestimos, max_renovacoes FROM politicas"
+        ).fetchall()
+        return {(r[0], r[1]): (r[2], r[3], r[4]) for r in rows}
+
+def _policy_for(policies, user_type: str, category: str) -> Tuple[int, Optional[int], int]:
+    # do mais específico ao mais genérico
+    for chave in ((user_type, category), (user_type, "*"), ("*", category), ("*", "*")):
+        p = policies.get(chave)
+        if p is not None:
+            return p
+    return POLITICA_PADRAO
+
+def list_policies() -> List[tuple]:
+    return sorted((k + v) for k, v in _policies().items())
+
+def set_policy(user_type: str, category: str, days: int, max_loans: Optional[int] = None, max_renewals: int = 0) -> None:
+    with _conn() as con:
+        con.execute("""
+            INSERT INTO politicas (tipo_usuario, categoria, dias, max_emprestimos, max_renovacoes)
+            VALUES (?, ?, ?, ?, ?)
+            ON CONFLICT (tipo_usuario, categoria) DO UPDATE
+               SET dias=excluded.dias, max_emprestimos=excluded.max_emprestimos, max_renovacoes=excluded.max_renovacoes
+        """, (user_type or "*", category or "*", int(days), max_loans, int(max_renewals)))
+        _changed("politicas")
+
+def delete_policy(user_type: str, category: str) -> None:
+    with _conn() as con:
+        con.execute("DELETE FROM politicas WHERE tipo_usuario=? AND categoria=?", (user_type, category))
+        _changed("politicas")
+
+def set_user_type(user_id: int, user_type: str) -> None:
+    with _conn() as con:
+        con.execute("UPDATE usuarios SET tipo=? WHERE id=?", (user_type, user_id))
+        _changed("usuarios")
+
+def set_book_category(book_id: int, category: str) -> None:
+    with _conn() as con:
+        con.execute("UPDATE livros SET categoria=? WHERE id=?", (category, book_id))
+        _changed("livros")
+
+@functools.lru_cache(maxsize=4096)
+def _due_date(start: str, days: int) -> str:
+    # poucas datas distintas por dia de balcão: cada (data, prazo) é calculado uma vez
+    try:
+        d = date.fromisoformat(start)
+    except ValueError:
+        d = date.today()
+    return (d + timedelta(days=days)).isoformat()
 
 # =========================
 # EMPRÉSTIMOS
 # =========================
-def _book_is_available(con: sqlite3.Connection, book_id: int) -> bool:
-    row = con.execute("SELECT disponivel FROM livros WHERE id=?", (book_id,)).fetchone()
-    return row is not None and int(row["disponivel"]) > 0
+def _checkout(con: sqlite3.Connection, policies, user_id: int, book_id: int, ld: str, rd: Optional[str]) -> int:
+    """Cria o empréstimo se o usuário existe, há exemplar e a política permite; levanta ValueError sem gravar nada."""
+    # uma leitura traz tudo o que a política precisa; com o lock de escrita já
+    # tomado (BEGIN IMMEDIATE), nada muda entre ela e o INSERT
+    r = con.execute("""
+        SELECT u.tipo, l.categoria, COALESCE(l.disponivel, 0) AS disponivel,
+               (SELECT COUNT(*) FROM emprestimos e
+                 WHERE e.id_usuario = u.id AND (e.status IS NULL OR e.status != 'closed')) AS abertos
+          FROM (SELECT ? AS uid, ? AS bid) AS p
+          LEFT JOIN usuarios u ON u.id = p.uid
+          LEFT JOIN livros   l ON l.id = p.bid
+    """, (user_id, book_id)).fetchone()
+    if r["tipo"] is None:
+        raise ValueError("Usuário inexistente")
+    if r["categoria"] is None:
+        raise ValueError("Livro inexistente")
+    if r["disponivel"] <= 0:
+        raise ValueError("Livro indisponível para empréstimo")
+
+    dias, max_emprestimos, _ = _policy_for(policies, r["tipo"], r["categoria"])
+    if max_emprestimos is not None and r["abertos"] >= max_emprestimos:
+        raise ValueError(f"Usuário já tem {r['abertos']} empréstimos em aberto (limite {max_emprestimos})")
 
-def insert_loan(user_id: int, book_id: int, loan_date: Optional[str], return_date: Optional[str]) -> None:
+    # o gatilho emprestimos_disp_ai dá a baixa em disponivel
+    cur = con.execute("""
+        INSERT INTO emprestimos (id_livro, id_usuario, data_emprestimo, data_devolucao, data_prevista, status)
+        VALUES (?, ?, ?, ?, ?, 'open')
+    """, (book_id, user_id, ld, rd, _due_date(ld, dias)))
+    return cur.lastrowid
+
+def insert_loan(user_id: int, book_id: int, loan_date: Optional[str], return_date: Optional[str]) -> Loan:
     ld = (loan_date or _today_str())
-    expected = _expected_from(ld, days=7)
-    rd = return_date  # normalmente None ao emprestar
+    policies = _policies()  # fora da transação: vem do cache em memória
 
     with _conn() as con:
-        # valida usuário/livro
-        u = con.execute("SELECT id FROM usuarios WHERE id=?", (user_id,)).fetchone()
-        if u is None:
-            raise ValueError("Usuário inexistente")
-        b = con.execute("SELECT id FROM livros WHERE id=?", (book_id,)).fetchone()
-        if b is None:
-            raise ValueError("Livro inexistente")
-        if not _book_is_available(con, book_id):
-            raise ValueError("Livro indisponível para empréstimo")
+        # IMMEDIATE pega o lock de escrita antes de qualquer leitura: duas mesas
+        # disputando o último exemplar são serializadas aqui, não depois da checagem.
+        _begin(con)
+        loan_id = _checkout(con, policies, user_id, book_id, ld, return_date)
+        _changed("emprestimos", "livros")
+        return _get_loan(con, loan_id)
 
-        con.execute("""
-            INSERT INTO emprestimos (id_livro, id_usuario, data_emprestimo, data_devolucao, data_prevista, status)
-            VALUES (?, ?, ?, ?, ?, 'open')
-        """, (book_id, user_id, ld, rd, expected))
+def insert_loans(user_id: int, book_ids: Iterable[int], loan_date: Optional[str]) -> List[Tuple[Optional[Loan], Optional[str]]]:
+    """
+    Empresta vários livros ao mesmo usuário numa transação só.
+    Resultado por livro, na ordem de book_ids: (empréstimo criado, None) ou (None, motivo).
+    Um livro recusado não impede os demais.
+    """
+    ld = (loan_date or _today_str())
+    policies = _policies()
+    out: List[Tuple[Optional[Loan], Optional[str]]] = []
+
+    with _conn() as con:
+        _begin(con)
+        for book_id in book_ids:
+            try:
+                loan_id = _checkout(con, policies, user_id, book_id, ld, None)
+            except ValueError as e:
+                out.append((None, str(e)))
+            else:
+                out.append((_get_loan(con, loan_id), None))
+        if any(loan for loan, _ in out):
+            _changed("emprestimos", "livros")
+    return out
 
-        # decrementa disponibilidade
-        con.execute("UPDATE livros SET disponivel = disponivel - 1 WHERE id=? AND disponivel > 0", (book_id,))
+def renew_loan(loan_id: int, renew_date: Optional[str] = None) -> Loan:
+    """
+    Renova um empréstimo aberto: novo prazo = prazo da política contado a partir
+    da data prevista atual (ou de renew_date, se já passou dela).
+    """
+    rd = (renew_date or _today_str())
+    policies = _policies()
+    with _conn() as con:
+        _begin(con)
+        r = con.execute("""
+            SELECT e.status, e.data_prevista, e.renovacoes, u.tipo, l.categoria
+              FROM emprestimos e
+              JOIN usuarios u ON u.id = e.id_usuario
+              JOIN livros   l ON l.id = e.id_livro
+             WHERE e.id=?
+        """, (loan_id,)).fetchone()
+        if r is None:
+            raise ValueError("Empréstimo inexistente")
+        if r["status"] == "closed":
+            raise ValueError("Empréstimo já devolvido")
+
+        dias, _, max_renovacoes = _policy_for(policies, r["tipo"], r["categoria"])
+        if r["renovacoes"] >= max_renovacoes:
+            raise ValueError(f"Limite de renovações atingido ({max_renovacoes})")
 
-def list_loans(open_only: bool = False) -> List[tuple]:
+        inicio = max(r["data_prevista"] or rd, rd)  # datas ISO: comparar texto = comparar datas
+        con.execute(
+            "UPDATE emprestimos SET data_prevista=?, renovacoes=renovacoes+1 WHERE id=?",
+            (_due_date(inicio, dias), loan_id),
+        )
+        _changed("emprestimos")
+        return _get_loan(con, loan_id)
+
+@_cached("emprestimos", "usuarios", "livros")
+def list_loans(open_only: bool = False) -> List[Loan]:
     with _conn() as con:
         where = "WHERE e.status='open'" if open_only else ""
-        rows = con.execute(f"""
-            SELECT
-                e.id                               AS id,
-                u.id                               AS user_id,
-                (u.nome || ' ' || u.sobrenome)     AS user_name,
-                l.id                               AS book_id,
-                l.titulo                           AS book_title,
-                e.data_emprestimo                  AS loan_date,
-                e.data_prevista                    AS expected_date,
-                e.data_devolucao                   AS return_date,
-                e.status                           AS status
-            FROM emprestimos e
-            JOIN usuarios u ON u.id = e.id_usuario
-            JOIN livros    l ON l.id = e.id_livro
-            {where}
-            ORDER BY e.id DESC
-        """).fetchall()
+        return _cursor(con, Loan).execute(_sql_list_loans(where)).fetchall()
 
-        # tuplas na ordem esperada
-        out = []
-        for r in rows:
-            out.append((
-                r["id"],
-                r["user_id"],
-                r["user_name"],
-                r["book_id"],
-                r["book_title"],
-                r["loan_date"],
-                r["expected_date"],
-                r["return_date"],
-                r["status"],
-            ))
-        return out
+@_cached("emprestimos", "usuarios", "livros")
+def list_loans_page(after_id: Optional[int] = None, limit: int = PAGE_SIZE, open_only: bool = False,
+                    offset: int = 0, sort: str = "id", desc: bool = True, filters=None) -> List[Loan]:
+    conds, params = _filtros(_LISTA_EMPRESTIMOS, filters)
+    if open_only:
+        conds.insert(0, "e.status='open'")
+    consulta = lambda where, order: _sql_list_loans(where, order_by=order)
+    with _conn() as con:
+        return _pagina(con, _LISTA_EMPRESTIMOS, consulta, conds, params, after_id, limit, offset, sort, desc)
 
-def close_loan(loan_id: int, return_date: Optional[str]) -> None:
-    rd = (return_date or _today_str())
+@_cached("emprestimos", "usuarios", "livros")
+def count_loans(open_only: bool = False, filters=None) -> int:
+    conds, params = _filtros(_LISTA_EMPRESTIMOS, filters)
+    if open_only:
+        conds.insert(0, "e.status='open'")
+    # nome do usuário / título do livro só entram com filtro: sem ele, conta só emprestimos
+    juncoes = " JOIN usuarios u ON u.id = e.id_usuario JOIN livros l ON l.id = e.id_livro" if params else ""
     with _conn() as con:
-        loan = con.execute("SELECT id, id_livro, status FROM emprestimos WHERE id=?", (loan_id,)).fetchone()
-        if loan is None:
+        return _contar(con, "emprestimos e" + juncoes, conds, params)
+
+def _get_loan(con: sqlite3.Connection, loan_id: int) -> Optional[Loan]:
+    return _cursor(con, Loan).execute(_sql_list_loans("WHERE e.id=?"), (loan_id,)).fetchone()
+
+def get_loan(loan_id: int) -> Optional[Loan]:
+    with _conn() as con:
+        return _get_loan(con, loan_id)
+
+def _checkin(con: sqlite3.Connection, loan_id: int, rd: str) -> bool:
+    """Fecha o empréstimo (o gatilho devolve o exemplar); False se já estava fechado."""
+    # fecha só se ainda estiver aberto: duas devoluções simultâneas do mesmo
+    # empréstimo devolvem o exemplar uma vez só
+    cur = con.execute("""
+        UPDATE emprestimos
+           SET data_devolucao=?, status='closed'
+         WHERE id=? AND (status IS NULL OR status!='closed')
+    """, (rd, loan_id))
+    if cur.rowcount == 0:
+        if con.execute("SELECT 1 FROM emprestimos WHERE id=?", (loan_id,)).fetchone() is None:
             raise ValueError("Empréstimo inexistente")
-        if loan["status"] == "closed":
-            return  # idempotente
+        return False
+    return True
 
-        con.execute("""
-            UPDATE emprestimos
-               SET data_devolucao=?, status='closed'
-             WHERE id=?
-        """, (rd, loan_id))
+def close_loan(loan_id: int, return_date: Optional[str]) -> Loan:
+    rd = (return_date or _today_str())
+    with _conn() as con:
+        _begin(con)
+        if _checkin(con, loan_id, rd):
+            _changed("emprestimos", "livros")
+        return _get_loan(con, loan_id)  # já fechado: idempotente
+
+def close_loans(loan_ids: Iterable[int], return_date: Optional[str]) -> List[Tuple[Optional[Loan], Optional[str]]]:
+    """
+    Fecha vários empréstimos numa transação só.
+    Resultado por empréstimo, na ordem de loan_ids: (empréstimo fechado, None) ou (None, motivo).
+    Um empréstimo que já estava fechado (outra mesa devolveu antes) é recusado, não repetido.
+    """
+    rd = (return_date or _today_str())
+    out: List[Tuple[Optional[Loan], Optional[str]]] = []
 
-        con.execute("UPDATE livros SET disponivel = disponivel + 1 WHERE id=?", (loan["id_livro"],))
+    with _conn() as con:
+        _begin(con)
+        fechou = False
+        for loan_id in loan_ids:
+            try:
+                if not _checkin(con, loan_id, rd):
+                    raise ValueError("Empréstimo já devolvido")
+            except ValueError as e:
+                out.append((None, str(e)))
+            else:
+                fechou = True
+                out.append((_get_loan(con, loan_id), None))
+        if fechou:
+            _changed("emprestimos", "livros")
+    return out
+
+EXPORT_BATCH_SIZE = 5000
+
+def iter_loans(start: Optional[str] = None, end: Optional[str] = None, status: Optional[str] = None,
+               after_id: Optional[int] = None, batch_size: int = EXPORT_BATCH_SIZE) -> Iterator[Loan]:
+    """
+    Percorre os empréstimos em ordem crescente de id, com a mesma tupla de list_loans,
+    lendo o cursor em blocos de batch_size (memória constante, sem cache).
+    start/end filtram data_emprestimo (AAAA-MM-DD, inclusivos); status = 'open' ou 'closed';
+    after_id retoma depois do último id já processado.
+    """
+    conds: List[str] = []
+    params: List[Any] = []
+    if after_id is not None:
+        conds.append("e.id > ?")
+        params.append(after_id)
+    if start:
+        conds.append("e.data_emprestimo >= ?")
+        params.append(start)
+    if end:
+        conds.append("e.data_emprestimo <= ?")
+        params.append(end)
+    if status:
+        conds.append("e.status = ?")
+        params.append(status)
+    where = ("WHERE " + " AND ".join(conds)) if conds else ""
+    return _iter_cursor(Loan, _sql_list_loans(where, order="ASC"), params, batch_size)
+
+def iter_users(after_id: Optional[int] = None, batch_size: int = EXPORT_BATCH_SIZE) -> Iterator[User]:
+    """Todos os usuários em ordem crescente de id, lidos em blocos (como iter_loans)."""
+    where, params = ("WHERE id > ?", [after_id]) if after_id is not None else ("", [])
+    return _iter_cursor(User, _SQL_LIST_USERS.format(where=where, order="id", limit=""), params, batch_size)
+
+def iter_books(after_id: Optional[int] = None, batch_size: int = EXPORT_BATCH_SIZE) -> Iterator[Book]:
+    """Todos os livros em ordem crescente de id, lidos em blocos (como iter_loans)."""
+    where, params = ("WHERE id > ?", [after_id]) if after_id is not None else ("", [])
+    return _iter_cursor(Book, _SQL_LIST_BOOKS.format(where=where, order="id", limit=""), params, batch_size)
+
+def _iter_cursor(tipo, sql: str, params: List[Any], batch_size: int) -> Iterator[tuple]:
+    # conexão direta do pool, não _conn(): o gerador fica suspenso entre os yields
+    # e pode até ser retomado por outra thread, e _conn() marca a thread como
+    # dentro de uma transação enquanto estiver aberto
+    migrate()
+    con = _pool.acquire()
+    try:
+        cur = _cursor(con, tipo).execute(sql, params)
+        while True:
+            rows = cur.fetchmany(batch_size)
+            if not rows:
+                break
+            yield from rows
+    finally:
+        _pool.release(con)
+
+# =========================
+# MUDANÇAS (feed por versão)
+# =========================
+# tabela pública -> (tabela, tipo da linha, SELECT por versão, SELECT por instante)
+_FEED = {
+    "users": ("usuarios", User,
+              _SQL_LIST_USERS.format(where="WHERE versao > ?", order="versao", limit=""),
+              _SQL_LIST_USERS.format(where="WHERE atualizado_em > ?", order="versao", limit="")),
+    "books": ("livros", Book,
+              _SQL_LIST_BOOKS.format(where="WHERE versao > ?", order="versao", limit=""),
+              _SQL_LIST_BOOKS.format(where="WHERE atualizado_em > ?", order="versao", limit="")),
+    "loans": ("emprestimos", Loan,
+              _sql_list_loans("WHERE e.versao > ?", order_by="e.versao"),
+              _sql_list_loans("WHERE e.atualizado_em > ?", order_by="e.versao")),
+}
+
+def _instante(valor) -> str:
+    """datetime (UTC se não tiver fuso), date ou texto ISO -> texto comparável com atualizado_em."""
+    if isinstance(valor, str):
+        try:
+            valor = datetime.fromisoformat(valor.strip().replace("Z", "+00:00"))
+        except ValueError:
+            raise ValueError(f"Instante inválido: {valor}") from None
+    if isinstance(valor, datetime):
+        if valor.tzinfo is not None:
+            valor = valor.astimezone(timezone.utc).replace(tzinfo=None)
+        return valor.isoformat(sep=" ", timespec="milliseconds")
+    if isinstance(valor, date):
+        return valor.isoformat()
+    raise ValueError("since deve ser uma versão (int) ou um instante (datetime, date ou texto ISO)")
+
+def current_version(table: str) -> int:
+    if table not in _FEED:
+        raise ValueError(f"Tabela inválida: {table}")
+    with _conn() as con:
+        return con.execute("SELECT atual FROM versoes WHERE tabela=?", (_FEED[table][0],)).fetchone()[0]
+
+def changes_since(table: str, since=0) -> Tuple[int, List[tuple], List[int]]:
+    """
+    O que mudou em table ('users', 'books' ou 'loans') depois de since:
+    (versão atual, linhas inseridas/alteradas em ordem de mudança, ids excluídos).
+
+    since: a versão devolvida pela chamada anterior (0 = tudo) ou um instante
+    UTC (datetime, date ou 'AAAA-MM-DD[ HH:MM:SS]'). Pela versão nada se perde
+    nem se repete; pelo relógio, mudanças no mesmo milissegundo do instante
+    ficam de fora, então depois da primeira chamada prefira a versão.
+
+    Se since é anterior a lápides já apagadas por prune_changes, as exclusões
+    desse intervalo não podem mais ser informadas: ValueError, e o cliente
+    relê a tabela inteira (since=0).
+    """
+    if table not in _FEED:
+        raise ValueError(f"Tabela inválida: {table}")
+    tabela, tipo, por_versao, por_instante = _FEED[table]
+    if isinstance(since, int) and not isinstance(since, bool):
+        sql, marco = por_versao, since
+        sql_removidos = "SELECT id FROM removidos WHERE tabela=? AND versao > ? ORDER BY versao"
+    else:
+        sql, marco = por_instante, _instante(since)
+        sql_removidos = "SELECT id FROM removidos WHERE tabela=? AND removido_em > ? ORDER BY versao"
+    with _conn() as con:
+        if not con.in_transaction:
+            con.execute("BEGIN")  # um instantâneo só: versão, linhas e lápides coerentes entre si
+        versao, podado, podado_em = con.execute(
+            "SELECT atual, podado, podado_em FROM versoes WHERE tabela=?", (tabela,)).fetchone()
+        # since=0 é releitura completa: não depende das lápides
+        if isinstance(marco, int):
+            perdido = 0 < marco < podado
+        else:
+            perdido = podado_em is not None and marco < podado_em
+        if perdido:
+            raise ValueError("Mudanças anteriores já descartadas: releia a tabela inteira")
+        linhas = _cursor(con, tipo).execute(sql, (marco,)).fetchall()
+        removidos = [r[0] for r in con.execute(sql_removidos, (tabela, marco))]
+        return versao, linhas, removidos
+
+def prune_changes(table: str, up_to_version: int) -> int:
+    """
+    Apaga as lápides de exclusão de table com versão <= up_to_version (removidos
+    só cresce). Quem ainda pede changes_since de antes delas recebe ValueError.
+    Devolve quantas foram apagadas.
+    """
+    if table not in _FEED:
+        raise ValueError(f"Tabela inválida: {table}")
+    tabela = _FEED[table][0]
+    with _conn() as con:
+        _begin(con)
+        versao, instante = con.execute(
+            "SELECT MAX(versao), MAX(removido_em) FROM removidos WHERE tabela=? AND versao <= ?",
+            (tabela, up_to_version)).fetchone()
+        if versao is None:
+            return 0
+        n = con.execute("DELETE FROM removidos WHERE tabela=? AND versao <= ?", (tabela, versao)).rowcount
+        con.execute("UPDATE versoes SET podado = MAX(podado, ?), podado_em = MAX(COALESCE(podado_em, ''), ?) WHERE tabela=?",
+                    (versao, instante, tabela))
+        return n
+
+# =========================
+# ATRASOS
+# =========================
+# Vencidos = abertos com data_prevista até (as_of - min_days_late). O índice
+# (status, data_prevista) entrega exatamente essa faixa, já na ordem de data.
+_SQL_ATRASADOS = """
+    SELECT
+        e.id                                                   AS id,
+        u.id                                                   AS user_id,
+        (u.nome || ' ' || u.sobrenome)                         AS user_name,
+        l.id                                                   AS book_id,
+        l.titulo                                               AS book_title,
+        e.data_emprestimo                                      AS loan_date,
+        e.data_prevista                                        AS expected_date,
+        CAST(julianday(:as_of) - julianday(e.data_prevista) AS INTEGER) AS days_late
+    FROM emprestimos e
+    JOIN usuarios u ON u.id = e.id_usuario
+    JOIN livros    l ON l.id = e.id_livro
+    WHERE e.status = 'open' AND e.data_prevista <= :limite
+"""
+
+def _params_atraso(as_of, min_days_late: int) -> Dict[str, str]:
+    d = _data_base(as_of)
+    return {"as_of": d.isoformat(), "limite": (d - timedelta(days=max(0, int(min_days_late)))).isoformat()}
+
+@_ate_hoje
+@_cached("emprestimos", "usuarios", "livros")
+def list_overdue(as_of=None, min_days_late: int = 1) -> List[tuple]:
+    """Empréstimos abertos com pelo menos min_days_late dias de atraso em as_of, do mais atrasado ao menos."""
+    with _conn() as con:
+        rows = con.execute(_SQL_ATRASADOS + " ORDER BY e.data_prevista, e.id", _params_atraso(as_of, min_days_late)).fetchall()
+        return [tuple(r) for r in rows]
+
+@_ate_hoje
+@_cached("emprestimos", "usuarios")
+def overdue_by_user(as_of=None, min_days_late: int = 1) -> List[tuple]:
+    with _conn() as con:
+        rows = con.execute(f"""
+            SELECT a.user_id, a.user_name, u.email, u.telefone, COUNT(*) AS loans, MAX(a.days_late) AS max_days_late
+              FROM ({_SQL_ATRASADOS}) AS a
+              JOIN usuarios u ON u.id = a.user_id
+             GROUP BY a.user_id
+             ORDER BY loans DESC, max_days_late DESC
+        """, _params_atraso(as_of, min_days_late)).fetchall()
+        return [tuple(r) for r in rows]
+
+@_ate_hoje
+@_cached("emprestimos", "livros")
+def overdue_by_book(as_of=None, min_days_late: int = 1) -> List[tuple]:
+    with _conn() as con:
+        rows = con.execute(f"""
+            SELECT a.book_id, a.book_title, COUNT(*) AS loans, MAX(a.days_late) AS max_days_late
+              FROM ({_SQL_ATRASADOS}) AS a
+             GROUP BY a.book_id
+             ORDER BY loans DESC, max_days_late DESC
+        """, _params_atraso(as_of, min_days_late)).fetchall()
+        return [tuple(r) for r in rows]
+
+# =========================
+# PAINEL (estatísticas)
+# =========================
+# Tudo sai das tabelas estat_* (mantidas por gatilhos), nunca de uma varredura de emprestimos.
+@_cached("emprestimos", "livros")
+def top_books(limit: int = 10) -> List[tuple]:
+    """-> [(book_id, title, loans)] dos livros mais emprestados"""
+    with _conn() as con:
+        rows = con.execute("""
+            SELECT s.id_livro, l.titulo, s.emprestimos
+              FROM estat_livros s
+              JOIN livros l ON l.id = s.id_livro
+             WHERE s.emprestimos > 0
+             ORDER BY s.emprestimos DESC
+             LIMIT ?
+        """, (limit,)).fetchall()
+        return [tuple(r) for r in rows]
+
+@_cached("emprestimos", "usuarios")
+def top_users(limit: int = 10) -> List[tuple]:
+    """-> [(user_id, name, loans)] dos usuários que mais pegaram livros"""
+    with _conn() as con:
+        rows = con.execute("""
+            SELECT s.id_usuario, (u.nome || ' ' || u.sobrenome), s.emprestimos
+              FROM estat_usuarios s
+              JOIN usuarios u ON u.id = s.id_usuario
+             WHERE s.emprestimos > 0
+             ORDER BY s.emprestimos DESC
+             LIMIT ?
+        """, (limit,)).fetchall()
+        return [tuple(r) for r in rows]
+
+@_ate_hoje
+@_cached("emprestimos")
+def loans_per_day(days: int = 30, as_of=None) -> List[tuple]:
+    """-> [(dia, loans, returns)] dos últimos `days` dias até as_of (só dias com movimento)"""
+    fim = _data_base(as_of)
+    inicio = fim - timedelta(days=max(1, int(days)) - 1)
+    with _conn() as con:
+        rows = con.execute("""
+            SELECT dia, emprestimos, devolucoes FROM estat_dias
+             WHERE dia BETWEEN ? AND ? AND (emprestimos > 0 OR devolucoes > 0)
+             ORDER BY dia
+        """, (inicio.isoformat(), fim.isoformat())).fetchall()
+        return [tuple(r) for r in rows]
+
+@_ate_hoje
+@_cached("emprestimos")
+def loans_per_month(months: int = 12, as_of=None) -> List[tuple]:
+    """-> [('AAAA-MM', loans, returns)] dos últimos `months` meses até as_of"""
+    fim = _data_base(as_of)
+    ano, mes = divmod(fim.year * 12 + fim.month - 1 - (max(1, int(months)) - 1), 12)
+    inicio = f"{ano:04d}-{mes + 1:02d}-01"
+    with _conn() as con:
+        rows = con.execute("""
+            SELECT substr(dia, 1, 7) AS mes, SUM(emprestimos), SUM(devolucoes) FROM estat_dias
+             WHERE dia >= ? AND dia <= ?
+             GROUP BY mes
+             ORDER BY mes
+        """, (inicio, fim.isoformat())).fetchall()
+        return [tuple(r) for r in rows]
+
+@_cached("emprestimos", "livros")
+def utilization() -> Tuple[int, int, float]:
+    """-> (exemplares no acervo, exemplares emprestados agora, fração emprestada)"""
+    with _conn() as con:
+        r = con.execute("SELECT exemplares, emprestados FROM estat_geral WHERE id = 1").fetchone()
+        exemplares, emprestados = (r[0], r[1]) if r else (0, 0)
+        return exemplares, emprestados, (emprestados / exemplares if exemplares else 0.0)
+
+def rebuild_stats() -> None:
+    """Recalcula as tabelas de resumo do painel a partir do histórico (raramente necessário)."""
+    with _conn() as con:
+        _begin(con)
+        _reconstruir_estatisticas(con)
+        _changed("emprestimos", "livros", "usuarios")
+
+# =========================
+# BUSCA (FTS5)
+# =========================
+# Pesos do bm25 por coluna: título/nome contam mais que editora/e-mail.
+_PESOS_LIVROS = "bm25(livros_fts, 10.0, 5.0, 1.0, 2.0)"     # titulo, autor, editora, isbn
+_PESOS_USUARIOS = "bm25(usuarios_fts, 5.0, 5.0, 1.0)"      # nome, sobrenome, email
+
+def _fts_query(text: str) -> str:
+    # Cada palavra vira um prefixo entre aspas ("mach"* acha "Machado"), então
+    # o que o operador digita nunca é interpretado como sintaxe do FTS5.
+    termos = re.findall(r"\w+", text or "")
+    return " ".join(f'"{t}"*' for t in termos)
+
+@_cached("livros")
+def search_books(query: str, limit: int = 50, offset: int = 0) -> List[Book]:
+    match = _fts_query(query)
+    if not match:
+        return []
+    with _conn() as con:
+        return _cursor(con, Book).execute(f"""
+            SELECT l.id, l.titulo, l.autor, l.editora, l.ano_publicacao, l.isbn, l.quantidade, l.disponivel,
+                   l.criado_em, l.atualizado_em
+            FROM livros_fts
+            JOIN livros l ON l.id = livros_fts.rowid
+            WHERE livros_fts MATCH ?
+            ORDER BY {_PESOS_LIVROS}
+            LIMIT ? OFFSET ?
+        """, (match, limit, offset)).fetchall()
+
+@_cached("usuarios")
+def search_users(query: str, limit: int = 50, offset: int = 0) -> List[User]:
+    match = _fts_query(query)
+    if not match:
+        return []
+    with _conn() as con:
+        return _cursor(con, User).execute(f"""
+            SELECT u.id, u.nome, u.sobrenome, u.endereco, u.email, u.telefone, u.criado_em, u.atualizado_em
+            FROM usuarios_fts
+            JOIN usuarios u ON u.id = usuarios_fts.rowid
+            WHERE usuarios_fts MATCH ?
+            ORDER BY {_PESOS_USUARIOS}
+            LIMIT ? OFFSET ?
+        """, (match, limit, offset)).fetchall()
+
+# =========================
+# IMPORTAÇÃO EM LOTE
+# =========================
+BULK_BATCH_SIZE = 1000
+
+_CAMPOS_USUARIO = ("first_name", "last_name", "address", "email", "phone")
+_CAMPOS_LIVRO = ("title", "author", "publisher", "year", "isbn", "quantity")
+
+def _bulk_insert(rows: Iterable[Any], campos: Tuple[str, ...], validar, sql: str, tabela: str,
+                 batch_size: int, on_reject) -> int:
+    """
+    Valida cada linha (tupla na ordem de insert_* ou dict com as chaves de `campos`)
+    e grava as aceitas com executemany em lotes de batch_size, tudo numa única
+    transação: ou o arquivo inteiro entra, ou nada entra.
+    on_reject(n, motivo, linha) recebe as recusadas (n = posição, a partir de 1).
+    """
+    batch_size = max(1, int(batch_size))
+    total = 0
+    with _conn() as con:
+        _begin(con)
+        lote: List[tuple] = []
+        for n, row in enumerate(rows, 1):
+            try:
+                if isinstance(row, dict):
+                    valores = [row.get(c) for c in campos]
+                elif isinstance(row, (list, tuple)):
+                    valores = list(row)
+                    if len(valores) != len(campos):
+                        raise ValueError(f"Esperados {len(campos)} campos, recebidos {len(valores)}")
+                else:
+                    raise ValueError("Registro não é objeto nem lista")
+                lote.append(validar(*valores))
+            except (ValueError, TypeError) as e:
+                # TypeError: valor de tipo inesperado (lista num campo, ...); recusa a linha, não o lote
+                if on_reject is not None:
+                    on_reject(n, str(e), row)
+                continue
+            if len(lote) >= batch_size:
+                con.executemany(sql, lote)
+                total += len(lote)
+                lote.clear()
+        if lote:
+            con.executemany(sql, lote)
+            total += len(lote)
+        if total:
+            _changed(tabela)
+    return total
+
+def _linha_livro(title, author, publisher, year, isbn, quantity) -> tuple:
+    livro = validar_livro(title, author, publisher, year, isbn, quantity)
+    return livro + (livro[-1],)  # disponivel começa igual à quantidade
+
+def bulk_insert_users(rows: Iterable[Any], batch_size: int = BULK_BATCH_SIZE, on_reject=None) -> int:
+    return _bulk_insert(
+        rows, _CAMPOS_USUARIO, validar_usuario,
+        "INSERT INTO usuarios (nome, sobrenome, endereco, email, telefone) VALUES (?, ?, ?, ?, ?)",
+        "usuarios", batch_size, on_reject,
+    )
+
+def bulk_insert_books(rows: Iterable[Any], batch_size: int = BULK_BATCH_SIZE, on_reject=None) -> int:
+    return _bulk_insert(
+        rows, _CAMPOS_LIVRO, _linha_livro,
+        "INSERT INTO livros (titulo, autor, editora, ano_publicacao, isbn, quantidade, disponivel) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?)",
+        "livros", batch_size, on_reject,
+    )
+
+# =========================
+# DIAGNÓSTICO
+# =========================
+# consulta quente -> (SQL, parâmetros de exemplo, índice que deve aparecer no plano)
+_CONSULTAS_QUENTES = {
+    "list_loans(open_only=True)": (_sql_list_loans("WHERE e.status='open'"), (), "idx_emprestimos_status_prevista"),
+    "delete_user (empréstimo aberto)": (_SQL_ABERTO_POR_USUARIO, (0,), "idx_emprestimos_usuario"),
+    "delete_book (empréstimo aberto)": (_SQL_ABERTO_POR_LIVRO, (0,), "idx_emprestimos_livro"),
+    "list_overdue": (
+        _SQL_ATRASADOS + " ORDER BY e.data_prevista, e.id", {"as_of": "2000-01-01", "limite": "2000-01-01"},
+        "idx_emprestimos_status_prevista (status=? AND data_prevista<?)",
+    ),
+    "list_books_page(sort='author')": (
+        _SQL_LIST_BOOKS.format(
+            where="WHERE autor COLLATE NOCASE <= ? AND (autor COLLATE NOCASE < ? OR id < ?)",
+            order="autor COLLATE NOCASE DESC, id DESC", limit="LIMIT 200",
+        ),
+        ("", "", 0), "idx_livros_autor (autor<?)",
+    ),
+    "list_books_page(filters={'author': ...})": (
+        _SQL_LIST_BOOKS.format(where="WHERE autor LIKE ? ESCAPE '\\'", order="id DESC", limit="LIMIT 200"),
+        ("a%",), "idx_livros_autor (autor>? AND autor<?)",
+    ),
+    "list_loans_page(sort='expected_date')": (
+        _sql_list_loans(order_by="e.data_prevista DESC, e.id DESC") + " LIMIT 200", (), "idx_emprestimos_prevista",
+    ),
+    "list_loans_page(sort='expected_date', after_id)": (
+        _sql_list_loans("WHERE e.data_prevista <= ? AND (e.data_prevista < ? OR e.id < ?)",
+                        order_by="e.data_prevista DESC, e.id DESC") + " LIMIT 200",
+        ("", "", 0), "idx_emprestimos_prevista (data_prevista<?)",
+    ),
+    "list_loans_page(sort='loan_date')": (
+        _sql_list_loans(order_by="e.data_emprestimo DESC, e.id DESC") + " LIMIT 200", (), "idx_emprestimos_data",
+    ),
+    "changes_since('books', versao)": (_FEED["books"][2], (0,), "idx_livros_versao"),
+    "changes_since('loans', versao)": (_FEED["loans"][2], (0,), "idx_emprestimos_versao"),
+    "livro por ISBN": ("SELECT id FROM livros WHERE isbn=?", ("",), "idx_livros_isbn"),
+    "usuário por e-mail": ("SELECT id FROM usuarios WHERE email=?", ("",), "idx_usuarios_email"),
+}
+
+def check_query_plans() -> Dict[str, Optional[str]]:
+    """
+    Roda EXPLAIN QUERY PLAN nas consultas quentes.
+    Retorna {consulta: problema}; problema é None quando o índice esperado é usado.
+    """
+    out: Dict[str, Optional[str]] = {}
+    with _conn() as con:
+        for nome, (sql, params, indice) in _CONSULTAS_QUENTES.items():
+            plano = [r["detail"] for r in con.execute("EXPLAIN QUERY PLAN " + sql, params)]
+            if any(indice in passo for passo in plano):
+                out[nome] = None
+            else:
+                out[nome] = f"não usa {indice}: " + " | ".join(plano)
+    return out
+
+def check_availability(repair: bool = False) -> List[Tuple[int, str, int, int, int]]:
+    """
+    Confere livros.disponivel contra quantidade - empréstimos abertos, para todos
+    os livros numa consulta só. Retorna as divergências
+    (id, título, quantidade, disponivel, esperado); com repair=True também as corrige.
+    """
+    with _conn() as con:
+        if repair:
+            _begin(con)
+        rows = con.execute(f"""
+            SELECT * FROM ({_SQL_DISPONIBILIDADE}) AS d
+             WHERE d.disponivel IS NOT d.esperado
+             ORDER BY d.id
+        """).fetchall()
+        out = [(r["id"], r["titulo"], r["quantidade"], r["disponivel"], r["esperado"]) for r in rows]
+        if repair and out:
+            _corrigir_disponibilidade(con)
+            _changed("livros")
+        return out
@@ -0,0 +1,377 @@
+# -*- coding: utf-8 -*-
+"""
+view_async.py — Fachada asyncio para as funções do view.py.
+
+Mesmos nomes, parâmetros e tuplas de retorno do view; cada função é uma
+corrotina que não bloqueia o event loop:
+
+- Leituras (list_*, get_*, count_*, search_*, atrasos, painel) rodam num pool
+  de threads leitoras (READERS), em paralelo, usando o pool de conexões e o
+  cache de leitura do view.
+- Escritas vão para uma fila atendida por UMA thread escritora. Ela junta as
+  escritas que chegaram enquanto a anterior gravava (até MAX_GROUP) e roda
+  todas numa transação só, com um commit (um fsync) por grupo. Cada escrita
+  roda num SAVEPOINT (_conn aninhado do view): se uma falhar, só ela é
+  desfeita e só a corrotina dela recebe a exceção; as outras do grupo seguem.
+  O resultado só é entregue depois do commit do grupo.
+
+Uso:
+    import view_async as db
+
+    async def main():
+        livros = await db.list_books_page(limit=50)
+        emprestimo = await db.insert_loan(1, livros[0][0], None, None)
+        async for linha in db.iter_loans(status="open"):
+            ...
+        db.close()
+
+Funções:
+- todas as de view.py listadas em __all__, com a mesma assinatura
+- iter_loans(...) -> async iterator[tuple]  (lê em blocos no pool de leitura)
+- stats() -> dict  (writes, groups, max_group, failed)
+- close() -> None  (espera as escritas na fila e encerra as threads; chamado ao sair)
+"""
+
+import asyncio
+import atexit
+import functools
+import itertools
+import os
+import queue
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, AsyncIterator, Dict, Iterable, List, Optional, Tuple
+
+import view
+
+# Threads leitoras (cada uma usa uma conexão do pool do view por vez)
+READERS = int(os.environ.get("BIBLIOTECA_ASYNC_READERS", str(max(2, view.POOL_SIZE))))
+# Máximo de escritas por transação do escritor
+MAX_GROUP = int(os.environ.get("BIBLIOTECA_ASYNC_GROUP", "64"))
+
+# =========================
+# Escritor único + leitores
+# =========================
+class _Executor:
+    """
+    - read(fn, ...): roda fn numa thread leitora.
+    - write(fn, ...): enfileira fn para a thread escritora; o Future resolve após o commit.
+    - close(): processa o que já está na fila e encerra as threads.
+    """
+
+    def __init__(self, readers: int, max_group: int):
+        self.max_group = max(1, max_group)
+        self._readers = ThreadPoolExecutor(max_workers=max(1, readers), thread_name_prefix="view-leitor")
+        self._fila: "queue.Queue[Optional[Tuple[Future, Any]]]" = queue.Queue()
+        self._lock = threading.Lock()
+        self._closed = False
+        self.writes = self.groups = self.max_group_seen = self.failed = 0
+        self._writer = threading.Thread(target=self._loop, name="view-escritor", daemon=True)
+        self._writer.start()
+
+    def read(self, fn, *args, **kwargs) -> Future:
+        return self._readers.submit(fn, *args, **kwargs)
+
+    def write(self, fn, *args, **kwargs) -> Future:
+        fut: Future = Future()
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("view_async encerrado")
+            self._fila.put((fut, functools.partial(fn, *args, **kwargs)))
+        return fut
+
+    def _loop(self) -> None:
+        while True:
+            item = self._fila.get()
+            if item is None:
+                return
+            grupo = [item]
+            # o que chegou enquanto o grupo anterior gravava entra no mesmo commit
+            while len(grupo) < self.max_group:
+                try:
+                    item = self._fila.get_nowait()
+                except queue.Empty:
+                    break
+                if item is None:
+                    self._fila.put(None)  # encerra depois deste grupo
+                    break
+                grupo.append(item)
+            self._gravar(grupo)
+
+    def _gravar(self, grupo: List[Tuple[Future, Any]]) -> None:
+        grupo = [(fut, fn) for fut, fn in grupo if fut.set_running_or_notify_cancel()]
+        if not grupo:
+            return
+        resultados = []
+        try:
+            with view._conn() as con:
+                view._begin(con)
+                for fut, fn in grupo:
+                    try:
+                        resultados.append((fut, fn(), None))
+                    except Exception as e:  # _conn aninhado já desfez o SAVEPOINT
+                        resultados.append((fut, None, e))
+        except Exception as e:
+            # o commit falhou: nada do grupo foi gravado
+            for fut, _ in grupo:
+                fut.set_exception(e)
+            self.failed += len(grupo)
+            return
+
+        self.writes += len(grupo)
+        self.groups += 1
+        self.max_group_seen = max(self.max_group_seen, len(grupo))
+        for fut, valor, erro in resultados:
+            if erro is None:
+                fut.set_result(valor)
+            else:
+                self.failed += 1
+                fut.set_exception(erro)
+
+    def stats(self) -> Dict[str, int]:
+        return {"writes": self.writes, "groups": self.groups,
+                "max_group": self.max_group_seen, "failed": self.failed}
+
+    def close(self) -> None:
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._fila.put(None)
+        self._writer.join()
+        self._readers.shutdown(wait=True)
+
+_executor: Optional[_Executor] = None
+_executor_lock = threading.Lock()
+
+def _get_executor() -> _Executor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = _Executor(READERS, MAX_GROUP)
+        return _executor
+
+async def _read(fn, *args, **kwargs):
+    return await asyncio.wrap_future(_get_executor().read(fn, *args, **kwargs))
+
+async def _write(fn, *args, **kwargs):
+    return await asyncio.wrap_future(_get_executor().write(fn, *args, **kwargs))
+
+def stats() -> Dict[str, int]:
+    return _get_executor().stats()
+
+def close() -> None:
+    """Grava o que está na fila e encerra as threads (um novo uso as recria)."""
+    global _executor
+    with _executor_lock:
+        ex, _executor = _executor, None
+    if ex is not None:
+        ex.close()
+
+# antes do view: o escritor ainda precisa do pool de conexões ao encerrar
+atexit.register(close)
+
+# =========================
+# USUÁRIOS
+# =========================
+async def insert_user(first_name: str, last_name: str, address: str, email: str, phone: str) -> tuple:
+    return await _write(view.insert_user, first_name, last_name, address, email, phone)
+
+async def list_users() -> List[tuple]:
+    return await _read(view.list_users)
+
+async def list_users_page(after_id: Optional[int] = None, limit: int = view.PAGE_SIZE, offset: int = 0,
+                          sort: str = "id", desc: bool = True, filters: Optional[dict] = None) -> List[tuple]:
+    return await _read(view.list_users_page, after_id, limit, offset, sort, desc, filters)
+
+async def count_users(filters: Optional[dict] = None) -> int:
+    return await _read(view.count_users, filters)
+
+async def get_user(user_id: int) -> Optional[tuple]:
+    return await _read(view.get_user, user_id)
+
+async def update_user(user_id: int, first_name: str, last_name: str, address: str, email: str, phone: str) -> Optional[tuple]:
+    return await _write(view.update_user, user_id, first_name, last_name, address, email, phone)
+
+async def delete_user(user_id: int) -> None:
+    return await _write(view.delete_user, user_id)
+
+# =========================
+# LIVROS
+# =========================
+async def insert_book(title: str, author: str, publisher: str, year: int, isbn: str, quantity: int) -> tuple:
+    return await _write(view.insert_book, title, author, publisher, year, isbn, quantity)
+
+async def list_books() -> List[tuple]:
+    return await _read(view.list_books)
+
+async def list_books_page(after_id: Optional[int] = None, limit: int = view.PAGE_SIZE, offset: int = 0,
+                          sort: str = "id", desc: bool = True, filters: Optional[dict] = None) -> List[tuple]:
+    return await _read(view.list_books_page, after_id, limit, offset, sort, desc, filters)
+
+async def count_books(filters: Optional[dict] = None) -> int:
+    return await _read(view.count_books, filters)
+
+async def get_book(book_id: int) -> Optional[tuple]:
+    return await _read(view.get_book, book_id)
+
+async def update_book(book_id: int, title: str, author: str, publisher: str, year: int, isbn: str, quantity: int) -> Optional[tuple]:
+    return await _write(view.update_book, book_id, title, author, publisher, year, isbn, quantity)
+
+async def delete_book(book_id: int) -> None:
+    return await _write(view.delete_book, book_id)
+
+# =========================
+# POLÍTICAS
+# =========================
+async def list_policies() -> List[tuple]:
+    return await _read(view.list_policies)
+
+async def set_policy(user_type: str, category: str, days: int, max_loans: Optional[int] = None, max_renewals: int = 0) -> None:
+    return await _write(view.set_policy, user_type, category, days, max_loans, max_renewals)
+
+async def delete_policy(user_type: str, category: str) -> None:
+    return await _write(view.delete_policy, user_type, category)
+
+async def set_user_type(user_id: int, user_type: str) -> None:
+    return await _write(view.set_user_type, user_id, user_type)
+
+async def set_book_category(book_id: int, category: str) -> None:
+    return await _write(view.set_book_category, book_id, category)
+
+# =========================
+# EMPRÉSTIMOS
+# =========================
+async def insert_loan(user_id: int, book_id: int, loan_date: Optional[str], return_date: Optional[str]) -> tuple:
+    return await _write(view.insert_loan, user_id, book_id, loan_date, return_date)
+
+async def insert_loans(user_id: int, book_ids: Iterable[int], loan_date: Optional[str]) -> List[Tuple[Optional[tuple], Optional[str]]]:
+    return await _write(view.insert_loans, user_id, list(book_ids), loan_date)
+
+async def renew_loan(loan_id: int, renew_date: Optional[str] = None) -> tuple:
+    return await _write(view.renew_loan, loan_id, renew_date)
+
+async def list_loans(open_only: bool = False) -> List[tuple]:
+    return await _read(view.list_loans, open_only)
+
+async def list_loans_page(after_id: Optional[int] = None, limit: int = view.PAGE_SIZE, open_only: bool = False,
+                          offset: int = 0, sort: str = "id", desc: bool = True,
+                          filters: Optional[dict] = None) -> List[tuple]:
+    return await _read(view.list_loans_page, after_id, limit, open_only, offset, sort, desc, filters)
+
+async def count_loans(open_only: bool = False, filters: Optional[dict] = None) -> int:
+    return await _read(view.count_loans, open_only, filters)
+
+async def get_loan(loan_id: int) -> Optional[tuple]:
+    return await _read(view.get_loan, loan_id)
+
+async def close_loan(loan_id: int, return_date: Optional[str]) -> tuple:
+    return await _write(view.close_loan, loan_id, return_date)
+
+async def close_loans(loan_ids: Iterable[int], return_date: Optional[str]) -> List[Tuple[Optional[tuple], Optional[str]]]:
+    return await _write(view.close_loans, list(loan_ids), return_date)
+
+async def iter_loans(start: Optional[str] = None, end: Optional[str] = None, status: Optional[str] = None,
+                     after_id: Optional[int] = None, batch_size: int = view.EXPORT_BATCH_SIZE) -> AsyncIterator[tuple]:
+    linhas = view.iter_loans(start, end, status, after_id, batch_size)
+    try:
+        while True:
+            bloco = await _read(lambda: list(itertools.islice(linhas, batch_size)))
+            if not bloco:
+                return
+            for row in bloco:
+                yield row
+    finally:
+        # devolve a conexão ao pool mesmo se quem iterava parou no meio
+        await _read(linhas.close)
+
+# =========================
+# MUDANÇAS
+# =========================
+async def current_version(table: str) -> int:
+    return await _read(view.current_version, table)
+
+async def changes_since(table: str, since=0) -> Tuple[int, List[tuple], List[int]]:
+    return await _read(view.changes_since, table, since)
+
+async def prune_changes(table: str, up_to_version: int) -> int:
+    return await _write(view.prune_changes, table, up_to_version)
+
+# =========================
+# ATRASOS
+# =========================
+async def list_overdue(as_of=None, min_days_late: int = 1) -> List[tuple]:
+    return await _read(view.list_overdue, as_of, min_days_late)
+
+async def overdue_by_user(as_of=None, min_days_late: int = 1) -> List[tuple]:
+    return await _read(view.overdue_by_user, as_of, min_days_late)
+
+async def overdue_by_book(as_of=None, min_days_late: int = 1) -> List[tuple]:
+    return await _read(view.overdue_by_book, as_of, min_days_late)
+
+# =========================
+# PAINEL
+# =========================
+async def top_books(limit: int = 10) -> List[tuple]:
+    return await _read(view.top_books, limit)
+
+async def top_users(limit: int = 10) -> List[tuple]:
+    return await _read(view.top_users, limit)
+
+async def loans_per_day(days: int = 30, as_of=None) -> List[tuple]:
+    return await _read(view.loans_per_day, days, as_of)
+
+async def loans_per_month(months: int = 12, as_of=None) -> List[tuple]:
+    return await _read(view.loans_per_month, months, as_of)
+
+async def utilization() -> Tuple[int, int, float]:
+    return await _read(view.utilization)
+
+async def rebuild_stats() -> None:
+    return await _write(view.rebuild_stats)
+
+# =========================
+# BUSCA
+# =========================
+async def search_books(query: str, limit: int = 50, offset: int = 0) -> List[tuple]:
+    return await _read(view.search_books, query, limit, offset)
+
+async def search_users(query: str, limit: int = 50, offset: int = 0) -> List[tuple]:
+    return await _read(view.search_users, query, limit, offset)
+
+# =========================
+# IMPORTAÇÃO EM LOTE
+# =========================
+# on_reject é chamado na thread escritora
+async def bulk_insert_users(rows: Iterable[Any], batch_size: int = view.BULK_BATCH_SIZE, on_reject=None) -> int:
+    return await _write(view.bulk_insert_users, rows, batch_size, on_reject)
+
+async def bulk_insert_books(rows: Iterable[Any], batch_size: int = view.BULK_BATCH_SIZE, on_reject=None) -> int:
+    return await _write(view.bulk_insert_books, rows, batch_size, on_reject)
+
+# =========================
+# CACHE / DIAGNÓSTICO
+# =========================
+async def data_version() -> int:
+    return await _read(view.data_version)
+
+async def check_query_plans() -> Dict[str, Optional[str]]:
+    return await _read(view.check_query_plans)
+
+async def check_availability(repair: bool = False) -> List[Tuple[int, str, int, int, int]]:
+    if repair:
+        return await _write(view.check_availability, True)
+    return await _read(view.check_availability, False)
+
+__all__ = [
+    "insert_user", "list_users", "list_users_page", "count_users", "get_user", "update_user", "delete_user",
+    "insert_book", "list_books", "list_books_page", "count_books", "get_book", "update_book", "delete_book",
+    "list_policies", "set_policy", "delete_policy", "set_user_type", "set_book_category",
+    "insert_loan", "insert_loans", "renew_loan", "list_loans", "list_loans_page", "count_loans",
+    "get_loan", "close_loan", "close_loans", "iter_loans", "current_version", "changes_since",
+    "prune_changes",
+    "list_overdue", "overdue_by_user", "overdue_by_book",
+    "top_books", "top_users", "loans_per_day", "loans_per_month", "utilization", "rebuild_stats",
+    "search_books", "search_users", "bulk_insert_users", "bulk_insert_books",
+    "data_version", "check_query_plans", "check_availability", "stats", "close",
+]